@@ -0,0 +1,281 @@
+import os
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class BarrierError(Error):
+    """Raised when the barrier server cannot be reached or refuses a request"""
+
+
+def get_node_names(data):
+    """
+    Gets the names of all the nodes that take part in the iteration barrier. These are the same
+    names that have a row in the :code:`sync` table of the database.
+
+    :param data: the data of the intermediate yaml
+    :return: list of node names
+    """
+    names = []
+    if "plcs" in data:
+        for plc in data["plcs"]:
+            names.append(plc["name"])
+    names.append("scada")
+    if "network_attacks" in data:
+        for attacker in data["network_attacks"]:
+            names.append(attacker["name"])
+    if "network_events" in data:
+        for event in data["network_events"]:
+            names.append(event["name"])
+    return names
+
+
+def get_barrier_client(data, name):
+    """
+    Creates a :class:`BarrierClient` for a node when the experiment uses the socket barrier.
+
+    :param data: the data of the intermediate yaml
+    :param name: the name of the node, as in the :code:`sync` table
+    :return: a barrier client, or None if synchronization goes through the database
+    """
+    if data.get("sync_mode", "database") != "socket":
+        return None
+    return BarrierClient(data["sync_path"], name)
+
+
+class BarrierServer:
+    """
+    Iteration barrier run by the physical process. It replaces polling the :code:`sync` table
+    of the database: every node has a sync flag that follows the same 0, 1, 2, 3 protocol,
+    but nodes block on a unix domain socket until their flag reaches the requested phase.
+
+    The unix socket lives in the filesystem, so it can be reached from every Mininet node
+    without generating any traffic on the emulated network.
+
+    :param socket_path: path of the unix domain socket to listen on
+    :param names: names of the nodes taking part in the barrier
+    """
+
+    def __init__(self, socket_path, names):
+        self.socket_path = str(socket_path)
+        self.flags = dict.fromkeys(names, 0)
+        self.condition = threading.Condition()
+        self.running = False
+        self.server = None
+        self.server_thread = None
+
+    def start(self):
+        """Starts listening for nodes on the unix domain socket in a background thread."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self.server = _ThreadingUnixServer(self.socket_path, _BarrierRequestHandler)
+        self.server.barrier = self
+        os.chmod(self.socket_path, 0o777)
+
+        self.running = True
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+
+    def stop(self):
+        """Stops the server and wakes up every node that is still waiting."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def set_flag(self, name, flag):
+        """
+        Sets the sync flag of a node.
+
+        :param name: name of the node
+        :param flag: new flag of the node
+        :raise BarrierError: when the node is not part of the barrier
+        """
+        with self.condition:
+            if name not in self.flags:
+                raise BarrierError("Node {name} is not part of the barrier".format(name=name))
+            self.flags[name] = flag
+            self.condition.notify_all()
+
+    def get_flag(self, name):
+        """
+        Gets the sync flag of a node.
+
+        :param name: name of the node
+        :raise BarrierError: when the node is not part of the barrier
+        """
+        with self.condition:
+            if name not in self.flags:
+                raise BarrierError("Node {name} is not part of the barrier".format(name=name))
+            return self.flags[name]
+
+    def wait_flag(self, name, flag, timeout=None):
+        """
+        Blocks until the sync flag of a node equals flag.
+
+        :param name: name of the node
+        :param flag: flag to wait for
+        :param timeout: (Default value = None) maximum time in seconds to wait
+        :return: True if the flag was reached, False on a timeout
+        :raise BarrierError: when the node is not part of the barrier or the server stops
+        """
+        with self.condition:
+            if name not in self.flags:
+                raise BarrierError("Node {name} is not part of the barrier".format(name=name))
+            self.condition.wait_for(lambda: self.flags[name] == flag or not self.running, timeout)
+            if not self.running:
+                raise BarrierError("Barrier server stopped")
+            return self.flags[name] == flag
+
+    def wait_all(self, flag):
+        """
+        Blocks until every node reported the given flag. This is the blocking counterpart of
+        checking that no row of the :code:`sync` table has a different flag.
+
+        :param flag: flag to wait for
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: not self.running or all(value == flag for value in self.flags.values()))
+
+    def release(self, flag):
+        """
+        Sets the sync flag of every node to flag, waking up the nodes waiting for that phase.
+
+        :param flag: the phase to release
+        """
+        with self.condition:
+            for name in self.flags:
+                self.flags[name] = flag
+            self.condition.notify_all()
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    barrier = None
+
+
+class _BarrierRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handles the line based protocol of one connected node. Supported requests are
+    :code:`SET name flag`, :code:`GET name` and :code:`WAIT name flag [timeout]`.
+    """
+
+    def handle(self):
+        barrier = self.server.barrier
+        for line in self.rfile:
+            words = line.decode().split()
+            if not words:
+                continue
+            try:
+                if words[0] == "SET":
+                    barrier.set_flag(words[1], int(words[2]))
+                    reply = "OK"
+                elif words[0] == "GET":
+                    reply = str(barrier.get_flag(words[1]))
+                elif words[0] == "WAIT":
+                    timeout = float(words[3]) if len(words) > 3 else None
+                    reply = "OK" if barrier.wait_flag(words[1], int(words[2]), timeout) else "TIMEOUT"
+                else:
+                    reply = "ERR unknown request " + words[0]
+            except (BarrierError, IndexError, ValueError) as exc:
+                reply = "ERR " + str(exc)
+            self.wfile.write((reply + "\n").encode())
+
+
+class BarrierClient:
+    """
+    Connection of a node to the :class:`BarrierServer` of the physical process. The connection
+    is opened lazily and retried until the physical process is listening.
+
+    :param socket_path: path of the unix domain socket of the barrier
+    :param name: name of the node, as in the :code:`sync` table
+    """
+
+    CONNECT_SLEEP = 0.05
+    """Time in seconds to wait before retrying to connect to the barrier"""
+
+    def __init__(self, socket_path, name):
+        self.socket_path = str(socket_path)
+        self.name = name
+        self.lock = threading.Lock()
+        self.sock = None
+        self.file = None
+
+    def connect(self):
+        """Connects to the barrier server, waiting until it is available."""
+        while self.sock is None:
+            if Path(self.socket_path).exists():
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.connect(self.socket_path)
+                    self.sock = sock
+                    self.file = sock.makefile('rb')
+                    return
+                except OSError:
+                    sock.close()
+            time.sleep(self.CONNECT_SLEEP)
+
+    def close(self):
+        """Closes the connection to the barrier server."""
+        with self.lock:
+            if self.sock:
+                self.file.close()
+                self.sock.close()
+                self.sock = None
+                self.file = None
+
+    def request(self, line):
+        """
+        Sends a request to the barrier server and returns its reply.
+
+        :param line: the request line, without a newline
+        :raise BarrierError: when the server closed the connection or refused the request
+        """
+        with self.lock:
+            self.connect()
+            self.sock.sendall((line + "\n").encode())
+            reply = self.file.readline().decode().strip()
+        if not reply:
+            self.close()
+            raise BarrierError("Barrier server closed the connection")
+        if reply.startswith("ERR"):
+            raise BarrierError(reply[4:])
+        return reply
+
+    def set(self, flag):
+        """
+        Sets the sync flag of this node.
+
+        :param flag: the new flag
+        """
+        self.request("SET {name} {flag}".format(name=self.name, flag=int(flag)))
+
+    def get(self):
+        """Gets the sync flag of this node."""
+        return int(self.request("GET {name}".format(name=self.name)))
+
+    def wait(self, flag, timeout=None):
+        """
+        Blocks until the physical process releases the given phase for this node.
+
+        :param flag: the flag to wait for
+        :param timeout: (Default value = None) maximum time in seconds to wait
+        :return: True if the flag was reached, False on a timeout
+        """
+        line = "WAIT {name} {flag}".format(name=self.name, flag=int(flag))
+        if timeout is not None:
+            line += " {timeout}".format(timeout=timeout)
+        return self.request(line) == "OK"
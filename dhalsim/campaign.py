@@ -0,0 +1,223 @@
+import copy
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import yaml
+
+from dhalsim.checkpoint import get_checkpoint_path
+from dhalsim.parser.config_parser import ConfigParser
+from dhalsim.py3_logger import get_logger
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class CampaignError(Error):
+    """Raised when the scenarios of a campaign cannot share a prefix"""
+
+
+class BranchError(Error):
+    """Raised when the simulation of a scenario does not end successfully"""
+
+
+BRANCH_KEYS = ('config_path', 'output_path', 'db_path', 'sync_path', 'tag_table_path', 'start_time',
+               'iterations', 'network_attacks')
+"""Keys of the intermediate yaml that may differ between the scenarios of a campaign"""
+
+
+def get_fork_iteration(data):
+    """
+    Gets the last iteration at which no attack of a scenario has started, so the scenario can be
+    branched from a snapshot of that iteration. Attacks triggered by a sensor value can start at
+    any iteration.
+
+    :param data: the data of the intermediate yaml of the scenario
+    :return: the iteration
+    """
+    triggers = [attack['trigger'] for plc in data.get('plcs', []) for attack in plc.get('attacks', [])]
+    triggers += [attack['trigger'] for attack in data.get('network_attacks', [])]
+
+    fork = data['iterations']
+    for trigger in triggers:
+        fork = min(fork, trigger['start'] if trigger['type'].lower() == 'time' else 0)
+    return fork
+
+
+def get_shared_data(data):
+    """
+    Gets the part of the intermediate yaml of a scenario that has to be equal in all scenarios
+    of a campaign: everything except the attacks and the paths of the scenario.
+
+    :param data: the data of the intermediate yaml of the scenario
+    :return: a copy of the data without attacks and paths
+    """
+    shared = {key: value for key, value in data.items() if key not in BRANCH_KEYS}
+    shared['plcs'] = [{key: value for key, value in plc.items() if key != 'attacks'}
+                      for plc in data.get('plcs', [])]
+    return shared
+
+
+def run_branch(runner, intermediate_yaml_path):
+    """
+    Runs one simulation of a campaign, in a worker process. A simulation that exits with an error
+    raises :class:`BranchError`, so it only fails its own scenario.
+
+    :param runner: the :class:`~dhalsim.command_line.Runner` of the scenario
+    :param intermediate_yaml_path: the intermediate yaml of the simulation
+    :raise BranchError: when the simulation exits with an error
+    """
+    try:
+        runner.run_simulation(intermediate_yaml_path)
+    except SystemExit as exc:
+        if exc.code:
+            raise BranchError("exited with {code}".format(code=exc.code))
+
+    if runner.automatic_run and runner.automatic_run.returncode:
+        raise BranchError("exited with {code}".format(code=runner.automatic_run.returncode))
+
+
+class Campaign:
+    """
+    Runs a campaign of scenarios that only differ in their attacks. The iterations before the
+    first attack of any scenario are simulated once, without attacks, and a checkpoint of the
+    last of them is written. Every scenario then continues from that checkpoint, with the ground
+    truth rows of the shared prefix copied in front of its own.
+
+    Scenarios run in up to :code:`jobs` worker processes in headless mode. A networked run needs
+    Mininet for itself, so networked scenarios run one after the other.
+
+    :param runners: one :class:`~dhalsim.command_line.Runner` for every scenario
+    :param jobs: (Default value = 1) amount of scenarios to run at the same time
+    """
+
+    def __init__(self, runners, jobs=1):
+        self.runners = runners
+        self.jobs = jobs
+        self.headless = all(runner.headless for runner in runners)
+        self.logger = None
+
+    def generate_intermediate_yaml(self, runner):
+        """
+        Generates the intermediate yaml of a scenario.
+
+        :param runner: the :class:`~dhalsim.command_line.Runner` of the scenario
+        :return: the path to the yaml file
+        :raise CampaignError: when the scenario is in batch mode
+        """
+        config_parser = ConfigParser(runner.config_file)
+        if config_parser.batch_mode:
+            raise CampaignError("{config} is in batch mode, campaigns need single simulations".format(
+                config=runner.config_file))
+        return config_parser.generate_intermediate_yaml()
+
+    @staticmethod
+    def write_prefix_yaml(data, fork, directory):
+        """
+        Writes the intermediate yaml of the shared prefix: the first scenario without attacks,
+        running until the fork iteration and writing a checkpoint there.
+
+        :param data: the data of the intermediate yaml of the first scenario
+        :param fork: the fork iteration
+        :param directory: directory for the files of the prefix
+        :return: the path to the yaml file
+        """
+        prefix = copy.deepcopy(data)
+        for plc in prefix['plcs']:
+            plc.pop('attacks', None)
+        prefix['network_attacks'] = []
+        prefix['iterations'] = fork
+        prefix['checkpoint_interval'] = fork
+        prefix['output_path'] = os.path.join(directory, 'output')
+        prefix['db_path'] = os.path.join(directory, 'dhalsim.sqlite')
+        prefix['sync_path'] = os.path.join(directory, 'dhalsim_sync.sock')
+        prefix['tag_table_path'] = os.path.join(directory, 'dhalsim_tags.bin')
+        # The rows of the prefix are copied into the ground truth of every scenario
+        prefix['ground_truth_format'] = 'csv'
+        prefix.pop('ground_truth_compression', None)
+        prefix.pop('resume', None)
+
+        path = Path(directory) / 'intermediate.yaml'
+        with path.open(mode='w') as file:
+            yaml.safe_dump(prefix, file)
+        return path
+
+    def run(self):
+        """Simulates the shared prefix and then all scenarios from it."""
+        yaml_paths = [self.generate_intermediate_yaml(runner) for runner in self.runners]
+        scenarios = []
+        for yaml_path in yaml_paths:
+            with yaml_path.open() as file:
+                scenarios.append(yaml.safe_load(file))
+        self.logger = get_logger(scenarios[0]['log_level'])
+
+        shared = get_shared_data(scenarios[0])
+        for runner, data in zip(self.runners[1:], scenarios[1:]):
+            if get_shared_data(data) != shared:
+                raise CampaignError("{config} differs from {first} in more than its attacks".format(
+                    config=runner.config_file, first=self.runners[0].config_file))
+
+        fork = min(get_fork_iteration(data) for data in scenarios)
+        prefix_directory = None
+        try:
+            if fork > 0:
+                self.logger.info("Simulating the shared prefix of {n} scenarios until iteration {fork}.".format(
+                    n=len(scenarios), fork=fork))
+                prefix_directory = tempfile.mkdtemp(prefix='dhalsim_campaign_')
+                prefix_yaml = self.write_prefix_yaml(scenarios[0], fork, prefix_directory)
+                run_branch(self.runners[0], prefix_yaml)
+
+                with prefix_yaml.open() as file:
+                    prefix = yaml.safe_load(file)
+                for yaml_path, data in zip(yaml_paths, scenarios):
+                    data['fork'] = {'checkpoint': str(get_checkpoint_path(prefix)),
+                                    'ground_truth': os.path.join(prefix['output_path'], 'ground_truth.csv')}
+                    with yaml_path.open(mode='w') as file:
+                        yaml.safe_dump(data, file)
+            else:
+                self.logger.warning("An attack starts at the first iteration, the scenarios share no prefix.")
+
+            failed = self.run_branches(yaml_paths)
+        finally:
+            if prefix_directory:
+                shutil.rmtree(prefix_directory, ignore_errors=True)
+
+        if failed:
+            self.logger.error("{n} out of {total} scenarios failed: {scenarios}".format(
+                n=len(failed), total=len(yaml_paths),
+                scenarios=", ".join(str(self.runners[index].config_file) for index in failed)))
+            sys.exit(1)
+
+    def run_branches(self, yaml_paths):
+        """
+        Runs the scenarios, in parallel worker processes in headless mode. A scenario that fails
+        is logged and the other scenarios continue.
+
+        :param yaml_paths: the intermediate yaml of every scenario
+        :return: the indices of the scenarios that failed
+        """
+        failed = []
+        if not self.headless or self.jobs <= 1:
+            for index, (runner, yaml_path) in enumerate(zip(self.runners, yaml_paths)):
+                try:
+                    run_branch(runner, yaml_path)
+                except Exception as exc:
+                    self.logger.error("Scenario {config} failed: {exc}".format(config=runner.config_file, exc=exc))
+                    failed.append(index)
+            return failed
+
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [executor.submit(run_branch, runner, yaml_path)
+                       for runner, yaml_path in zip(self.runners, yaml_paths)]
+            for index, future in enumerate(futures):
+                try:
+                    future.result()
+                except Exception as exc:
+                    self.logger.error("Scenario {config} failed: {exc}".format(
+                        config=self.runners[index].config_file, exc=exc))
+                    failed.append(index)
+        return failed
@@ -0,0 +1,65 @@
+import gzip
+import os
+import pickle
+from pathlib import Path
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class CheckpointError(Error):
+    """Raised when a checkpoint cannot be read"""
+
+
+VERSION = 2
+"""Version of the checkpoint format, checkpoints of another version are not read"""
+
+
+def get_checkpoint_path(data):
+    """
+    Gets the path of the checkpoint of an experiment, in its output folder.
+
+    :param data: the data of the intermediate yaml
+    :return: the path of the checkpoint
+    """
+    return Path(data['output_path']) / 'checkpoint.pkl.gz'
+
+
+def write_checkpoint(path, state):
+    """
+    Writes a checkpoint. The checkpoint is written next to the previous one and then replaces it,
+    so a crash while writing keeps the previous checkpoint.
+
+    :param path: path of the checkpoint
+    :param state: dictionary with the state to save, anything that can be pickled
+    """
+    path = Path(path)
+    temporary_path = path.with_name(path.name + '.tmp')
+    with gzip.open(str(temporary_path), mode='wb', compresslevel=1) as file:
+        pickle.dump({'version': VERSION, 'state': state}, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(str(temporary_path), str(path))
+
+
+def read_checkpoint(path):
+    """
+    Reads a checkpoint written by :func:`write_checkpoint`.
+
+    :param path: path of the checkpoint
+    :return: the saved state
+    :raise CheckpointError: when there is no checkpoint or it cannot be read
+    """
+    path = Path(path)
+    if not path.is_file():
+        raise CheckpointError("No checkpoint found at {path}".format(path=path))
+
+    try:
+        with gzip.open(str(path), mode='rb') as file:
+            checkpoint = pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError) as exc:
+        raise CheckpointError("Cannot read checkpoint {path}: {exc}".format(path=path, exc=exc))
+
+    if checkpoint.get('version') != VERSION:
+        raise CheckpointError("Checkpoint {path} has version {version}, expected {expected}".format(
+            path=path, version=checkpoint.get('version'), expected=VERSION))
+    return checkpoint['state']
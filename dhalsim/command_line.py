@@ -4,13 +4,25 @@ import signal
 import subprocess
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import yaml
 
+from dhalsim.campaign import Campaign
+from dhalsim.headless import HeadlessPlant
 from dhalsim.init_database import DatabaseInitializer
 from dhalsim.parser.config_parser import ConfigParser
 from dhalsim.parser.file_generator import InputFilesCopier
+from dhalsim.py3_logger import get_logger
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class BatchError(Error):
+    """Raised when a batch simulation does not end successfully"""
 
 
 def is_valid_file(parser, arg):
@@ -20,10 +32,32 @@ def is_valid_file(parser, arg):
         return arg
 
 
+def run_batch(runner, intermediate_yaml_path):
+    """
+    Runs one batch simulation, in a worker process. A simulation that exits with an error raises
+    :class:`BatchError`, so it only fails this batch.
+
+    :param runner: the :class:`Runner` of the batches
+    :param intermediate_yaml_path: the intermediate yaml of the batch
+    :raise BatchError: when the simulation exits with an error
+    """
+    try:
+        runner.run_simulation(intermediate_yaml_path, clean=False)
+    except SystemExit as exc:
+        if exc.code:
+            raise BatchError("exited with {code}".format(code=exc.code))
+
+    if runner.automatic_run and runner.automatic_run.returncode:
+        raise BatchError("exited with {code}".format(code=runner.automatic_run.returncode))
+
+
 class Runner():
-    def __init__(self, config_file, output_folder):
+    def __init__(self, config_file, output_folder, headless=False, resume=False, jobs=1):
         self.config_file = config_file
         self.output_folder = output_folder
+        self.headless = headless
+        self.resume = resume
+        self.jobs = jobs
 
         signal.signal(signal.SIGINT, self.sigint_handler)
         signal.signal(signal.SIGTERM, self.sigint_handler)
@@ -31,32 +65,79 @@ class Runner():
         self.automatic_run = None
 
     def sigint_handler(self, sig, frame):
-        os.kill(self.automatic_run.pid, signal.SIGTERM)
+        if self.automatic_run:
+            os.kill(self.automatic_run.pid, signal.SIGTERM)
         time.sleep(0.3)
         sys.exit(0)
 
     def run(self):
         config_parser = ConfigParser(self.config_file)
+        config_parser.resume = self.resume
 
         if config_parser.batch_mode:
-            # If in batch mode, generate all intermediate yamls and simulate one by one
+            # If in batch mode, generate all intermediate yamls and simulate one by one,
+            # or in up to jobs worker processes
+            parallel = self.jobs > 1 and config_parser.batch_simulations > 1
             yaml_paths = []
             for batch_index in range(config_parser.batch_simulations):
                 config_parser.batch_index = batch_index
+                if parallel and not self.headless:
+                    config_parser.network_index = batch_index + 1
                 yaml_paths.append(config_parser.generate_intermediate_yaml())
-            for yaml_path in yaml_paths:
-                self.run_simulation(yaml_path)
+
+            if parallel:
+                self.run_batches(yaml_paths, get_logger(config_parser.data['log_level']))
+            else:
+                for yaml_path in yaml_paths:
+                    self.run_simulation(yaml_path)
 
         else:
             # Else generate the one we need and run the simulation
             intermediate_yaml_path = config_parser.generate_intermediate_yaml()
             self.run_simulation(intermediate_yaml_path)
 
-    def run_simulation(self, intermediate_yaml_path):
-
+    def run_batches(self, yaml_paths, logger):
+        """
+        Runs the batch simulations in up to :code:`jobs` worker processes. Every batch has its own
+        database, output folder and, for a networked run, its own Mininet network. A batch that
+        fails is logged and the other batches continue.
+
+        :param yaml_paths: the intermediate yaml of every batch
+        :param logger: logger to report failed batches to
+        """
+        if not self.headless:
+            # Cleaning up Mininet would tear down the networks of running batches, so it is done once
+            self.clean_network()
+
+        failed = []
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [executor.submit(run_batch, self, yaml_path) for yaml_path in yaml_paths]
+            for batch_index, future in enumerate(futures):
+                try:
+                    future.result()
+                except Exception as exc:
+                    logger.error("Batch {index} failed: {exc}".format(index=batch_index, exc=exc))
+                    failed.append(batch_index)
+
+        if failed:
+            logger.error("{n} out of {total} batches failed: {batches}".format(
+                n=len(failed), total=len(yaml_paths), batches=failed))
+            sys.exit(1)
+
+    @staticmethod
+    def clean_network():
+        """Ends the ENIP servers and cleans up the Mininet network left behind by a previous run."""
         subprocess.run(["sudo", "pkill - f - u", "root", "python -m cpppo.server.enip"])
         subprocess.run(["sudo", "mn", "-c"])
 
+    def run_simulation(self, intermediate_yaml_path, clean=True):
+        if self.headless:
+            self.run_headless(intermediate_yaml_path)
+            return
+
+        if clean:
+            self.clean_network()
+
         InputFilesCopier(self.config_file, intermediate_yaml_path).copy_input_files()
 
         db_initializer = DatabaseInitializer(intermediate_yaml_path)
@@ -68,21 +149,49 @@ class Runner():
             ["python3", str(automatic_run_path), str(intermediate_yaml_path)])
         self.automatic_run.wait()
 
+    def run_headless(self, intermediate_yaml_path):
+        """
+        Runs the physical process and the control logic of the PLCs in this process, without
+        Mininet and without the database.
+        """
+        InputFilesCopier(self.config_file, intermediate_yaml_path).copy_input_files()
+
+        # In batch mode, the input files are copied next to the output folders of the batches
+        with intermediate_yaml_path.open(mode='r') as file:
+            os.makedirs(yaml.safe_load(file)['output_path'], exist_ok=True)
+
+        HeadlessPlant(intermediate_yaml_path).main()
+
 def main():
     parser = argparse.ArgumentParser(description='Executes DHALSIM based on a config file')
-    parser.add_argument(dest="config_file",
-                        help="config file and its path", metavar="FILE",
+    parser.add_argument(dest="config_files", nargs='+',
+                        help="config file and its path, several with --campaign", metavar="FILE",
                         type=lambda x: is_valid_file(parser, x))
     parser.add_argument('-o', '--output', dest='output_folder', metavar="FOLDER",
                         help='folder where output files will be saved', type=str)
+    parser.add_argument('--headless', dest='headless', action='store_true',
+                        help='run the PLC control logic in the physical process, without network')
+    parser.add_argument('--resume', dest='resume', action='store_true',
+                        help='continue the experiment from its latest checkpoint')
+    parser.add_argument('--campaign', dest='campaign', action='store_true',
+                        help='run scenarios that only differ in their attacks from a shared prefix')
+    parser.add_argument('-j', '--jobs', dest='jobs', metavar="N", type=int, default=1,
+                        help='amount of batches or headless campaign scenarios to run at the same time')
 
     args = parser.parse_args()
 
-    config_file = Path(args.config_file)
+    if len(args.config_files) > 1 and not args.campaign:
+        parser.error("several config files can only be given with --campaign")
+
     output_folder = Path(args.output_folder if args.output_folder else "output")
 
-    runner = Runner(config_file, output_folder)
-    runner.run()
+    runners = [Runner(Path(config_file), output_folder, args.headless, args.resume, args.jobs)
+               for config_file in args.config_files]
+
+    if args.campaign:
+        Campaign(runners, args.jobs).run()
+    else:
+        runners[0].run()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,231 @@
+import random
+import sqlite3
+import threading
+import time
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class DatabaseError(Error):
+    """Raised when not being able to connect to the database"""
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_database_client(db_path, logger, tries=None):
+    """
+    Gets the :class:`DatabaseClient` of this process for a database, creating it on first use.
+    All the objects of a process that query the same database share its connections.
+
+    :param db_path: path of the SQLite database
+    :param logger: logger used to report failed queries
+    :param tries: (Default value = None) amount of times a query will be tried,
+       :code:`DatabaseClient.DB_TRIES` when not given
+    :return: the database client
+    """
+    with _clients_lock:
+        client = _clients.get(str(db_path))
+        if client is None:
+            client = DatabaseClient(db_path, logger, tries or DatabaseClient.DB_TRIES)
+            _clients[str(db_path)] = client
+        return client
+
+
+class DatabaseClient:
+    """
+    SQLite client shared by the physical process and all the nodes of an experiment.
+
+    Every thread of the process keeps one long lived connection to the database, so the cost of
+    opening a connection is paid once instead of on every query, and the prepared statements
+    cached by that connection are reused between iterations. Connections use WAL journaling and
+    :code:`synchronous=NORMAL`, so readers do not block the writer and commits do not wait for an
+    fsync of the rollback journal.
+
+    :param db_path: path of the SQLite database
+    :param logger: logger used to report failed queries
+    :param tries: (Default value = :code:`DB_TRIES`) amount of times a query will be tried
+    :param sleep_time: (Default value = None) time in seconds to wait before retrying a query,
+       a random value between 0.01 and 0.1 when not given
+    """
+
+    DB_TRIES = 10
+    """Amount of times a db query will retry on a exception"""
+
+    BUSY_TIMEOUT = 5.0
+    """Time in seconds SQLite waits for a lock before raising an exception"""
+
+    CACHED_STATEMENTS = 256
+    """Amount of prepared statements cached by every connection"""
+
+    def __init__(self, db_path, logger, tries=DB_TRIES, sleep_time=None):
+        self.db_path = str(db_path)
+        self.logger = logger
+        self.tries = tries
+        self.sleep_time = sleep_time if sleep_time is not None else random.uniform(0.01, 0.1)
+
+        self.local = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
+
+        self.queries = 0
+        self.retries = 0
+        self.lock_waits = 0
+        self.counters_lock = threading.Lock()
+
+    def connection(self):
+        """
+        Gets the connection of the calling thread, opening it on first use.
+
+        :return: the :code:`sqlite3.Connection` of this thread
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT,
+                                   cached_statements=self.CACHED_STATEMENTS)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            except sqlite3.OperationalError:
+                conn.close()
+                raise
+            self.local.conn = conn
+            with self.connections_lock:
+                self.connections.append(conn)
+        return conn
+
+    def close(self):
+        """Closes the connections of all threads."""
+        with self.connections_lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+        self.local = threading.local()
+
+    def stats(self):
+        """
+        Gets the counters of this client.
+
+        :return: dictionary with the amount of queries, retries and lock waits
+        """
+        with self.counters_lock:
+            return {'queries': self.queries, 'retries': self.retries, 'lock_waits': self.lock_waits}
+
+    def run(self, function):
+        """
+        Runs function with the connection of this thread.
+        On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`tries` tries.
+        Before it retries, it will sleep for :code:`sleep_time` seconds.
+
+        :param function: function receiving a :code:`sqlite3.Connection`
+        :return: the return value of function
+        :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
+           :code:`tries` tries.
+        """
+        for i in range(self.tries):
+            try:
+                result = function(self.connection())
+                with self.counters_lock:
+                    self.queries += 1
+                return result
+            except sqlite3.OperationalError as exc:
+                with self.counters_lock:
+                    self.retries += 1
+                    if 'locked' in str(exc) or 'busy' in str(exc):
+                        self.lock_waits += 1
+                self.logger.info(
+                    "Failed to connect to db with exception {exc}. Trying {i} more times.".format(
+                        exc=exc, i=self.tries - i - 1))
+                time.sleep(self.sleep_time)
+
+        self.logger.error("Failed to connect to db. Tried {i} times.".format(i=self.tries))
+        raise DatabaseError("Failed to execute db query in database")
+
+    def query(self, query, parameters=()):
+        """
+        Executes a read query.
+
+        :param query: the SQL query to execute
+        :param parameters: (Default value = ()) the parameters of the query
+        :return: the first column of the first row of the result
+        """
+        return self.run(lambda conn: conn.execute(query, parameters).fetchone()[0])
+
+    def fetchall(self, query, parameters=()):
+        """
+        Executes a read query.
+
+        :param query: the SQL query to execute
+        :param parameters: (Default value = ()) the parameters of the query
+        :return: all the rows of the result
+        """
+        return self.run(lambda conn: conn.execute(query, parameters).fetchall())
+
+    def execute(self, query, parameters=()):
+        """
+        Executes a write query in its own transaction.
+
+        :param query: the SQL query to execute
+        :param parameters: (Default value = ()) the parameters of the query
+        """
+        def write(conn):
+            with conn:
+                conn.execute(query, parameters)
+
+        self.run(write)
+
+    def executemany(self, query, parameters):
+        """
+        Executes a write query once for every parameter tuple, in a single transaction.
+
+        :param query: the SQL query to execute
+        :param parameters: iterable of parameter tuples
+        """
+        parameters = list(parameters)
+
+        def write(conn):
+            with conn:
+                conn.executemany(query, parameters)
+
+        self.run(write)
+
+    def transaction(self, statements):
+        """
+        Executes several write queries in a single transaction, so readers see either all or
+        none of their changes.
+
+        :param statements: list of (query, parameters) pairs, where parameters is an iterable of
+           parameter tuples the query is executed with
+        """
+        statements = [(query, list(parameters)) for query, parameters in statements]
+
+        def write(conn):
+            with conn:
+                for query, parameters in statements:
+                    conn.executemany(query, parameters)
+
+        self.run(write)
+
+    def db_query(self, query, write=False, parameters=None):
+        """
+        Execute a query on the database, the way the nodes of DHALSIM query it.
+
+        :param query: The SQL query to execute in the db
+        :type query: str
+
+        :param write: Boolean flag to indicate if this query will write into the database
+
+        :param parameters: The parameters to put in the query. This must be a tuple.
+
+        :return: the first column of the first row for a read query, None for a write query
+
+        :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
+           :code:`tries` tries.
+        """
+        if write:
+            self.execute(query, parameters or ())
+        else:
+            return self.query(query, parameters or ())
@@ -0,0 +1,99 @@
+import ctypes
+
+import numpy as np
+
+from dhalsim.hydraulics.state import HydraulicState
+
+EN_PRESSURE = 11
+"""EPANET node parameter code of the pressure, which is the water level for a tank"""
+
+EN_FLOW = 8
+"""EPANET link parameter code of the flow"""
+
+EN_STATUS = 11
+"""EPANET link parameter code of the current status"""
+
+EN_NODECOUNT = 0
+"""EPANET component code of the amount of nodes"""
+
+EN_LINKCOUNT = 2
+"""EPANET component code of the amount of links"""
+
+EN_PATTERNSTART = 4
+"""EPANET time parameter code of the time at which the demand patterns start"""
+
+
+class EpynetState(HydraulicState):
+    """
+    Reads the hydraulic state of an epynet water network into numpy arrays, straight from the
+    EPANET toolkit instead of going through the per element results of epynet. The toolkit
+    indices of the requested elements are resolved once.
+
+    When the EPANET library exports the array getters :code:`ENgetnodevalues` and
+    :code:`ENgetlinkvalues` (EPANET 2.3), every parameter is read with one call and the requested
+    elements are taken from the result. Otherwise only the requested elements are read, one
+    toolkit call each.
+
+    :param wn: the epynet water network, its :code:`ep` attribute is the EPANET toolkit
+    :param tanks: names of the tanks
+    :param junctions: names of the junctions
+    :param pumps: names of the pumps
+    :param valves: names of the valves
+    """
+
+    def __init__(self, wn, tanks, junctions, pumps, valves):
+        super(EpynetState, self).__init__(tanks, junctions, pumps, valves)
+        links = list(pumps) + list(valves)
+        self.ep = wn.ep
+        lib = getattr(self.ep, '_lib', None)
+
+        # Tanks first, then junctions
+        self.node_indices = np.array([self.ep.ENgetnodeindex(name) for name in list(tanks) + list(junctions)],
+                                     dtype=np.intc)
+        self.tank_count = len(tanks)
+        self.link_indices = np.array([self.ep.ENgetlinkindex(name) for name in links], dtype=np.intc)
+
+        self.get_node_values = getattr(lib, 'ENgetnodevalues', None)
+        self.get_link_values = getattr(lib, 'ENgetlinkvalues', None)
+        if self.get_node_values and self.get_link_values:
+            self.node_buffer = (ctypes.c_float * self.ep.ENgetcount(EN_NODECOUNT))()
+            self.link_buffer = (ctypes.c_float * self.ep.ENgetcount(EN_LINKCOUNT))()
+
+    @property
+    def bulk(self):
+        """Whether the array getters of the toolkit are used."""
+        return self.get_node_values is not None and self.get_link_values is not None
+
+    def node_values(self, code, indices):
+        """
+        Reads a parameter of several nodes.
+
+        :param code: EPANET node parameter code
+        :param indices: toolkit indices of the nodes, starting at 1
+        :return: numpy array of values
+        """
+        if self.bulk:
+            self.get_node_values(code, self.node_buffer)
+            return np.frombuffer(self.node_buffer, dtype=np.float32)[indices - 1]
+        return np.array([self.ep.ENgetnodevalue(int(index), code) for index in indices], dtype=np.float64)
+
+    def link_values(self, code, indices):
+        """
+        Reads a parameter of several links.
+
+        :param code: EPANET link parameter code
+        :param indices: toolkit indices of the links, starting at 1
+        :return: numpy array of values
+        """
+        if self.bulk:
+            self.get_link_values(code, self.link_buffer)
+            return np.frombuffer(self.link_buffer, dtype=np.float32)[indices - 1]
+        return np.array([self.ep.ENgetlinkvalue(int(index), code) for index in indices], dtype=np.float64)
+
+    def update(self):
+        """Reads the tank levels, junction pressures, link flows and link statuses of the last step."""
+        pressures = self.node_values(EN_PRESSURE, self.node_indices)
+        self.tank_levels[:] = pressures[:self.tank_count]
+        self.junction_pressures[:] = pressures[self.tank_count:]
+        self.flows[:] = self.link_values(EN_FLOW, self.link_indices)
+        self.statuses[:] = self.link_values(EN_STATUS, self.link_indices)
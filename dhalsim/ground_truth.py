@@ -0,0 +1,396 @@
+import csv
+import gzip
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class GroundTruthError(Error):
+    """Raised when the ground truth cannot be written in the requested format"""
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_ns(timestamp):
+    """
+    Converts a naive datetime to nanoseconds since the epoch, keeping its wall clock time.
+
+    :param timestamp: the datetime to convert
+    :return: the timestamp as an int
+    """
+    return (timestamp - EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def from_epoch_ns(timestamp):
+    """
+    Converts nanoseconds since the epoch back to a naive datetime.
+
+    :param timestamp: the timestamp as an int
+    :return: the datetime, with microsecond precision
+    """
+    return EPOCH + timedelta(microseconds=int(timestamp) // 1000)
+
+
+def get_ground_truth_writer(data, header, int_columns=(), resume=None):
+    """
+    Creates the writer of the ground truth file of an experiment, in the format configured in the
+    intermediate yaml.
+
+    When resuming from a checkpoint, a file that can be appended to is truncated to its size at
+    the checkpoint and continued. Otherwise the rows after the checkpoint are written to a new
+    file, :code:`ground_truth_resumed_<iteration>`.
+
+    :param data: the data of the intermediate yaml
+    :param header: the names of the columns
+    :param int_columns: (Default value = ()) names of the columns holding integers, like statuses
+    :param resume: (Default value = None) dictionary with the :code:`iteration` of a checkpoint and
+       the :code:`offset`, the size of the ground truth file at that iteration
+    :return: a :class:`GroundTruthWriter`
+    """
+    writer_class = WRITERS[data.get('ground_truth_format', 'csv')]
+    compression = data.get('ground_truth_compression')
+    flush_interval = data.get('ground_truth_flush_interval', data.get('saving_interval'))
+    extension = writer_class.extension(compression)
+
+    path = Path(data['output_path']) / ('ground_truth' + extension)
+    offset = None
+    if resume is not None:
+        if writer_class.appendable(compression) and resume['offset'] is not None:
+            offset = resume['offset']
+        else:
+            path = path.with_name('ground_truth_resumed_{iteration}{extension}'.format(
+                iteration=resume['iteration'], extension=extension))
+    return writer_class(path, header, compression, flush_interval, int_columns, offset)
+
+
+def _import_pyarrow():
+    """Imports pyarrow, which is only needed for the columnar formats."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise GroundTruthError("Writing the ground truth as parquet or arrow requires pyarrow, "
+                               "install it with 'pip install pyarrow'")
+    return pyarrow
+
+
+class ResultsBuffer:
+    """
+    Preallocated block of ground truth rows. The first two columns of the header, the iteration
+    and the timestamp, are stored as int64 (the timestamp in nanoseconds since the epoch), all
+    other columns in a 2-D float64 array. The array is column major, so every column of the
+    filled rows is a contiguous slice that can be handed to a writer without copying.
+
+    :param header: the names of the columns
+    :param rows: amount of rows in the block
+    """
+
+    def __init__(self, header, rows):
+        self.header = list(header)
+        self.iterations = np.zeros(rows, dtype=np.int64)
+        self.timestamps = np.zeros(rows, dtype=np.int64)
+        self.values = np.zeros((rows, len(self.header) - 2), dtype=np.float64, order='F')
+        self.size = 0
+
+    @property
+    def full(self):
+        """Whether all rows of the block are used."""
+        return self.size == len(self.iterations)
+
+    def new_row(self, iteration, timestamp):
+        """
+        Takes the next row of the block.
+
+        :param iteration: the iteration of the row
+        :param timestamp: the time of the row, as a datetime or in nanoseconds since the epoch
+        :return: view on the values of the row, to be filled by slice assignment
+        """
+        if isinstance(timestamp, datetime):
+            timestamp = to_epoch_ns(timestamp)
+        self.iterations[self.size] = iteration
+        self.timestamps[self.size] = timestamp
+        row = self.values[self.size]
+        self.size += 1
+        return row
+
+    def clear(self):
+        """Marks all rows as unused, the memory of the block is reused."""
+        self.size = 0
+
+
+class GroundTruthWriter:
+    """
+    Append only writer of the ground truth of an experiment. Rows are filled in a preallocated
+    :class:`ResultsBuffer` of :code:`flush_interval` rows, which is written to the file when it is
+    full, so the file never has to be rewritten and memory use does not grow with the length of
+    the experiment.
+
+    :param path: path of the file to write
+    :param header: the names of the columns
+    :param compression: (Default value = None) compression codec, one of :code:`COMPRESSIONS`
+    :param flush_interval: (Default value = None) amount of rows after which the buffer is written
+       to the file, :code:`FLUSH_INTERVAL` when not given
+    :param int_columns: (Default value = ()) names of the columns holding integers
+    :param offset: (Default value = None) size of an existing file to continue, see
+       :meth:`appendable`. The file is truncated to it and the header is not written again
+    """
+
+    FLUSH_INTERVAL = 1000
+    """Default amount of rows after which the buffer is written to the file"""
+
+    MAX_BUFFERED_ROWS = 10000
+    """Maximum amount of rows kept in memory, regardless of the flush interval"""
+
+    COMPRESSIONS = ()
+    """Compression codecs supported by this format"""
+
+    EXTENSION = ''
+    """Extension of the file written by this format"""
+
+    def __init__(self, path, header, compression=None, flush_interval=None, int_columns=(), offset=None):
+        if compression is not None and compression not in self.COMPRESSIONS:
+            raise GroundTruthError("Compression {compression} is not supported by {format}".format(
+                compression=compression, format=type(self).__name__))
+
+        self.path = Path(path)
+        self.header = list(header)
+        int_columns = set(int_columns)
+        self.int_columns = [i for i, name in enumerate(self.header[2:]) if name in int_columns]
+        self.compression = compression
+        self.flush_interval = min(flush_interval or self.FLUSH_INTERVAL, self.MAX_BUFFERED_ROWS)
+        self.buffer = ResultsBuffer(self.header, self.flush_interval)
+        self.rows_written = 0
+        self.closed = False
+
+        if offset is not None and not self.appendable(compression):
+            raise GroundTruthError("{format} cannot continue an existing file".format(
+                format=type(self).__name__))
+        self.offset = offset
+
+        self.open()
+
+    @classmethod
+    def extension(cls, compression=None):
+        """
+        Gets the extension of the files written by this format.
+
+        :param compression: (Default value = None) the compression codec
+        """
+        return cls.EXTENSION
+
+    @classmethod
+    def appendable(cls, compression=None):
+        """
+        Whether an unfinished file of this format can be continued.
+
+        :param compression: (Default value = None) the compression codec
+        """
+        return False
+
+    def position(self):
+        """
+        Gets the size of the file after the last flush, to continue it with the :code:`offset`
+        of a new writer.
+
+        :return: the size in bytes, or None if the file cannot be continued
+        """
+        return None
+
+    def new_row(self, iteration, timestamp):
+        """
+        Adds one row to the ground truth, writing the buffer first when it is full.
+
+        :param iteration: the iteration of the row
+        :param timestamp: the time of the row, as a datetime or in nanoseconds since the epoch
+        :return: view on the values of the row, all columns of the header except the first two
+        """
+        if self.buffer.full:
+            self.flush()
+        return self.buffer.new_row(iteration, timestamp)
+
+    def append(self, row):
+        """
+        Adds one row given as a list to the ground truth.
+
+        :param row: list of values, one for every column of the header
+        """
+        self.new_row(row[0], row[1])[:] = row[2:]
+
+    def flush(self):
+        """Writes the buffered rows to the file."""
+        if self.buffer.size and not self.closed:
+            self.write_block(self.buffer)
+            self.rows_written += self.buffer.size
+            self.buffer.clear()
+
+    def close(self):
+        """Writes the buffered rows and closes the file. Closing twice does nothing."""
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        self.close_file()
+
+    def open(self):
+        """Opens the file and writes the header."""
+        raise NotImplementedError
+
+    def write_block(self, buffer):
+        """
+        Writes the filled rows of a buffer to the file.
+
+        :param buffer: the :class:`ResultsBuffer`
+        """
+        raise NotImplementedError
+
+    def close_file(self):
+        """Closes the file."""
+        raise NotImplementedError
+
+
+class CsvWriter(GroundTruthWriter):
+    """Writes the ground truth as a csv file, optionally compressed with gzip."""
+
+    COMPRESSIONS = ('gzip',)
+    EXTENSION = '.csv'
+
+    @classmethod
+    def extension(cls, compression=None):
+        return cls.EXTENSION + ('.gz' if compression == 'gzip' else '')
+
+    @classmethod
+    def appendable(cls, compression=None):
+        # A gzip stream cut at a flush has no trailer, so only plain files can be continued
+        return compression is None
+
+    def position(self):
+        return self.file.tell()
+
+    def open(self):
+        if self.compression == 'gzip':
+            self.file = gzip.open(str(self.path), mode='wt', newline='')
+        elif self.offset is not None:
+            self.file = self.path.open(mode='r+', newline='')
+            self.file.truncate(self.offset)
+            self.file.seek(self.offset)
+        else:
+            self.file = self.path.open(mode='w', newline='')
+        self.writer = csv.writer(self.file)
+        if self.offset is None:
+            self.writer.writerow(self.header)
+        self.file.flush()
+
+    def write_block(self, buffer):
+        values = buffer.values[:buffer.size].tolist()
+        for i, row in enumerate(values):
+            for column in self.int_columns:
+                row[column] = int(row[column])
+            self.writer.writerow([int(buffer.iterations[i]), from_epoch_ns(buffer.timestamps[i])] + row)
+        self.file.flush()
+
+    def close_file(self):
+        self.file.close()
+
+
+class ArrowTableWriter(GroundTruthWriter):
+    """
+    Base class of the columnar formats. The iteration and the integer columns are stored as int64,
+    the timestamp with nanosecond precision and all the other columns as float64. Float columns
+    are passed to pyarrow without copying.
+    """
+
+    def open(self):
+        self.pa = _import_pyarrow()
+        fields = [self.pa.field(self.header[0], self.pa.int64()),
+                  self.pa.field(self.header[1], self.pa.timestamp('ns'))]
+        int_columns = set(self.int_columns)
+        for i, name in enumerate(self.header[2:]):
+            fields.append(self.pa.field(name, self.pa.int64() if i in int_columns else self.pa.float64()))
+        self.schema = self.pa.schema(fields)
+        self.writer = self.open_writer()
+
+    def open_writer(self):
+        """Opens the pyarrow writer of the file."""
+        raise NotImplementedError
+
+    def to_table(self, buffer):
+        """
+        Converts the filled rows of a buffer to a pyarrow table with the schema of this writer.
+
+        :param buffer: the :class:`ResultsBuffer`
+        """
+        size = buffer.size
+        arrays = [self.pa.array(buffer.iterations[:size]),
+                  self.pa.array(buffer.timestamps[:size].view('datetime64[ns]'))]
+        int_columns = set(self.int_columns)
+        for i in range(buffer.values.shape[1]):
+            column = buffer.values[:size, i]
+            arrays.append(self.pa.array(column.astype(np.int64) if i in int_columns else column))
+        return self.pa.Table.from_arrays(arrays, schema=self.schema)
+
+    def close_file(self):
+        self.writer.close()
+
+
+class ParquetWriter(ArrowTableWriter):
+    """Writes the ground truth as a parquet file, with one row group for every flush."""
+
+    COMPRESSIONS = ('snappy', 'gzip', 'zstd', 'lz4', 'brotli')
+    EXTENSION = '.parquet'
+
+    def open_writer(self):
+        return self.pa.parquet.ParquetWriter(str(self.path), self.schema,
+                                             compression=self.compression or 'none')
+
+    def write_block(self, buffer):
+        self.writer.write_table(self.to_table(buffer), row_group_size=buffer.size)
+
+
+class ArrowWriter(ArrowTableWriter):
+    """Writes the ground truth as an Arrow IPC file, with one record batch for every flush."""
+
+    COMPRESSIONS = ('zstd', 'lz4')
+    EXTENSION = '.arrow'
+
+    def open_writer(self):
+        options = self.pa.ipc.IpcWriteOptions(
+            compression='lz4_frame' if self.compression == 'lz4' else self.compression)
+        return self.pa.ipc.new_file(str(self.path), self.schema, options=options)
+
+    def write_block(self, buffer):
+        for batch in self.to_table(buffer).to_batches():
+            self.writer.write_batch(batch)
+
+
+WRITERS = {
+    'csv': CsvWriter,
+    'parquet': ParquetWriter,
+    'arrow': ArrowWriter,
+}
+"""Ground truth writer of every :code:`ground_truth_format`"""
+
+
+def read_ground_truth(path):
+    """
+    Reads a ground truth file written in any :code:`ground_truth_format`, the format is taken
+    from the extension.
+
+    :param path: path to the ground truth file
+    :return: pandas DataFrame with a column for every column of the header
+    """
+    path = Path(path)
+    if path.suffix == ParquetWriter.EXTENSION:
+        return _import_pyarrow().parquet.read_table(str(path)).to_pandas()
+    if path.suffix == ArrowWriter.EXTENSION:
+        with _import_pyarrow().ipc.open_file(str(path)) as reader:
+            return reader.read_all().to_pandas()
+
+    return pd.read_csv(str(path))
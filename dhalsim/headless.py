@@ -0,0 +1,314 @@
+import argparse
+import os
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from dhalsim.init_database import DatabaseInitializer
+from dhalsim.physical_process import PhysicalPlant
+from dhalsim.python2.entities.attack import create_attacks
+from dhalsim.python2.entities.control import create_controls
+from dhalsim.python2.entities.lookahead import get_lookahead, safe_horizon
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class TagDoesNotExist(Error):
+    """Raised when tag you are looking for does not exist"""
+
+
+class InvalidControlValue(Error):
+    """Raised when a control sets a value the simulator does not support"""
+
+
+class HeadlessPLC:
+    """
+    In-process stand-in for a :class:`~dhalsim.python2.generic_plc.GenericPLC`. It offers the
+    interface the controls of :mod:`dhalsim.python2.entities.control` and the device attacks of
+    :mod:`dhalsim.python2.entities.attack` use, so the same objects run against the state of a
+    :class:`HeadlessPlant` instead of a database and an ENIP server.
+
+    Like a networked PLC, it reads its own sensors and actuators straight from the plant and every
+    other tag from what the owning PLCs published at the start of the iteration.
+
+    :param plant: the :class:`HeadlessPlant` running this PLC
+    :param plc_data: the section of this PLC in the intermediate yaml
+    """
+
+    def __init__(self, plant, plc_data):
+        self.plant = plant
+        self.logger = plant.logger
+        self.name = plc_data['name']
+        self.sensors = [tag for tag in plc_data.get('sensors', []) if tag != ""]
+        self.actuators = [tag for tag in plc_data.get('actuators', []) if tag != ""]
+        self.local_tags = set(self.sensors) | set(self.actuators)
+
+        self.controls = create_controls(plc_data.get('controls', []))
+        self.attacks = create_attacks(plc_data.get('attacks', []))
+
+        self.lookahead = plant.lookahead
+        self.next_scan = 0
+        self.skipped_scans = 0
+
+    def get_tag(self, tag):
+        """
+        Get the value of a tag that is connected to this PLC or published by another PLC.
+
+        :param tag: The tag to get
+        :return: value of that tag
+        :raise: TagDoesNotExist if tag cannot be found
+        """
+        if tag in self.local_tags:
+            return self.plant.tags[tag]
+        return self.plant.get_published(tag)
+
+    def get_rate(self, tag):
+        """
+        Get the maximum change of a tag in one iteration, from the lookahead options. Tags of
+        other PLCs have no bound with noise, their values can change at every read.
+
+        :param tag: The tag to get the rate of
+        :return: the rate, or None if the tag has no bound
+        """
+        if self.plant.noise_scale != 0 and tag not in self.local_tags:
+            return None
+        return self.lookahead['rates'].get(tag)
+
+    def set_tag(self, tag, value):
+        """
+        Set a tag that is connected to this PLC to a value.
+
+        :param tag: Which tag to set
+        :param value: value to set the Tag to
+        :raise: TagDoesNotExist if tag is not connected to this plc
+        :raise: InvalidControlValue if a pump speed is set and the simulator does not support it
+        """
+        if isinstance(value, str) and value.lower() == "closed":
+            value = 0
+        elif isinstance(value, str) and value.lower() == "open":
+            value = 1
+        elif not self.plant.backend.supports_speed:
+            self.logger.error('Pump speed is not supported by the ' + self.plant.simulator + ' simulator')
+            raise InvalidControlValue(value)
+
+        if tag not in self.local_tags:
+            raise TagDoesNotExist(tag + " cannot be set from " + self.name)
+        self.plant.tags[tag] = float(value)
+
+    def get_master_clock(self):
+        """
+        Get the iteration of the physical process, as a networked PLC reads it from the database.
+
+        :return: Iteration in the physical process.
+        """
+        return self.plant.clock
+
+    def set_attack_flag(self, flag, attack_name):
+        """
+        Set the flag of an attack of this PLC, 1 while the attack is running.
+
+        :param flag: True for running to 1, False for running to 0
+        :param attack_name: The name of the attack
+        """
+        self.plant.attack_flags[self.plant.attack_index[attack_name]] = int(flag)
+
+    def scan(self):
+        """
+        Applies the controls and then the attacks of this PLC, like one main loop of a PLC. Within
+        the lookahead of the last scan they would set the same actuators, and are skipped.
+        """
+        clock = self.plant.clock
+        if clock < self.next_scan:
+            self.skipped_scans += 1
+            return
+
+        for control in self.controls:
+            control.apply(self)
+
+        for attack in self.attacks:
+            attack.apply(self)
+
+        if self.lookahead:
+            self.next_scan = clock + safe_horizon(self, clock, self.lookahead['max_steps'])
+
+
+class HeadlessPlant(PhysicalPlant):
+    """
+    Physical process that runs the control logic of the PLCs in the same process, without
+    Mininet, ENIP servers, the database or a barrier. The simulation loop, the simulator handling
+    and the ground truth are those of :class:`~dhalsim.physical_process.PhysicalPlant`; only the
+    exchange with the nodes is replaced:
+
+    * the plant state is kept in the :code:`tags` dictionary, with the initial values the
+      database would have,
+    * when the nodes would publish their state, every PLC publishes its sensors and actuators.
+      Sensors get the gaussian noise of :code:`noise_scale`, like the values a PLC serves over the
+      network,
+    * when the nodes would apply their control logic, the controls and device attacks of every
+      PLC are applied, in the order of the intermediate yaml.
+
+    Tags of other PLCs are read from what they published :code:`cache_staleness` iterations
+    before, 0 by default, which is the value a networked PLC waits for in its cache.
+
+    Network attacks and network events need the network, their ground truth columns stay 0.
+
+    :param intermediate_yaml: path to the intermediate yaml
+    """
+
+    def __init__(self, intermediate_yaml):
+        super(HeadlessPlant, self).__init__(intermediate_yaml)
+
+        self.noise_scale = self.data.get('noise_scale', 0)
+        self.random = np.random.default_rng()
+        self.lookahead = get_lookahead(self.data)
+
+        self.plcs = [HeadlessPLC(self, plc_data) for plc_data in self.data.get('plcs', [])]
+        self.owner = {}
+        for plc in self.plcs:
+            for tag in plc.sensors + plc.actuators:
+                self.owner.setdefault(tag, plc)
+        self.published_sensors = [tag for tag in self.owner if tag in self.owner[tag].sensors]
+        self.published_actuators = [tag for tag in self.owner if tag not in self.owner[tag].sensors]
+        self.published = deque(maxlen=self.data.get('cache_staleness', 0) + 1)
+
+        if self.data.get('network_attacks') or self.data.get('network_events'):
+            self.logger.warning("Network attacks and events are not run in headless mode.")
+
+    def connect_nodes(self):
+        """
+        There are no nodes to connect to, the PLCs run in this process. The tags start with the
+        values the plant table would be initialized with.
+        """
+        self.tag_table = None
+        self.barrier = None
+
+        self.tags = {name: float(value) for name, value in
+                     DatabaseInitializer(self.intermediate_yaml).get_plant_rows()}
+        self.clock = 0
+
+    def _init_what(self):
+        """The plant table is not read, tags are keyed by name only."""
+        self._what = ('name', 'pid')
+
+    def set_sync(self, flag):
+        """There are no sync flags, the PLCs run when :meth:`wait_for_nodes` is called."""
+
+    def wait_for_nodes(self, flag):
+        """
+        Runs the phase of the PLCs the physical process would wait for.
+
+        :param flag: 1 to publish the state of the PLCs, 3 to apply their control logic
+        """
+        if flag == 1:
+            self.publish()
+        elif flag == 3:
+            for plc in self.plcs:
+                plc.scan()
+
+    def publish(self):
+        """Publishes the sensors, with noise, and the actuators of all PLCs."""
+        sensors = np.array([self.tags[tag] for tag in self.published_sensors], dtype=np.float64)
+        if self.noise_scale != 0:
+            sensors += self.random.normal(0, self.noise_scale * np.abs(sensors))
+
+        published = dict(zip(self.published_sensors, sensors.tolist()))
+        published.update((tag, self.tags[tag]) for tag in self.published_actuators)
+        self.published.append(published)
+
+    def get_published(self, tag):
+        """
+        Gets a tag of another PLC, :code:`cache_staleness` iterations old while that many have
+        been published.
+
+        :param tag: the tag to get
+        :return: the published value
+        :raise: TagDoesNotExist if no PLC has the tag
+        """
+        if tag not in self.owner:
+            raise TagDoesNotExist(tag)
+        return self.published[0][tag]
+
+    def read_actuators(self):
+        """
+        Reads the status of all actuators from the tags.
+
+        :return: numpy array with the status of every actuator, in the order of :code:`actuator_names`
+        """
+        for i, name in enumerate(self.actuator_names):
+            if name in self.tags:
+                self.actuator_values[i] = self.tags[name]
+        return self.actuator_values
+
+    def read_attack_flags(self):
+        """
+        Gets the flags of all attacks, set by the device attacks of the PLCs.
+
+        :return: numpy array with the flag of every attack, in the order of the attack header
+        """
+        return self.attack_flags
+
+    def read_tables(self):
+        """
+        Gets the tags, the attack flags and the clock of the PLCs for a checkpoint.
+
+        :return: dictionary in the layout of :meth:`PhysicalPlant.read_tables`
+        """
+        return {
+            'plant': list(self.tags.items()),
+            'attack': list(zip(self.attack_names, self.attack_flags.tolist())),
+            'master_time': self.clock,
+        }
+
+    def restore_tables(self, tables):
+        """
+        Restores the tags, the attack flags and the clock of the PLCs from a checkpoint.
+
+        :param tables: dictionary with the contents of the tables
+        """
+        for name, value in tables['plant']:
+            if name in self.tags:
+                self.tags[name] = float(value)
+        for name, flag in tables['attack']:
+            if name in self.attack_index:
+                self.attack_flags[self.attack_index[name]] = int(flag)
+        self.clock = tables['master_time']
+
+    def finish(self):
+        """Logs how many scans the lookahead of the PLCs saved, and ends the simulation."""
+        if self.lookahead:
+            self.logger.info("Lookahead skipped {skipped} PLC scans".format(
+                skipped=sum(plc.skipped_scans for plc in self.plcs)))
+        super(HeadlessPlant, self).finish()
+
+    def write_plant_state(self):
+        """
+        Stores the plant state collected by the update methods in the tags, and the master time
+        in the clock of the PLCs. Names without a tag are skipped.
+        """
+        for name, value in self.plant_state.items():
+            if name in self.tags:
+                self.tags[name] = value
+        self.clock = self.master_time
+        self.plant_state = {}
+
+
+def is_valid_file(test_parser, arg):
+    if not os.path.exists(arg):
+        test_parser.error(arg + " does not exist.")
+    else:
+        return arg
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the simulation and the PLCs in one process')
+    parser.add_argument(dest="intermediate_yaml",
+                        help="intermediate yaml file", metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+
+    args = parser.parse_args()
+
+    simulation = HeadlessPlant(Path(args.intermediate_yaml))
+    simulation.main()
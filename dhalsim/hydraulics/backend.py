@@ -0,0 +1,191 @@
+import importlib
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class UnsupportedSimulator(Error):
+    """Raised when no backend exists for the configured simulator"""
+
+
+BACKENDS = {
+    'wntr': 'dhalsim.hydraulics.wntr_backend.WntrBackend',
+    'epynet': 'dhalsim.hydraulics.epynet_backend.EpynetBackend',
+    'epanet': 'dhalsim.hydraulics.epanet_backend.EpanetBackend',
+    'surrogate': 'dhalsim.hydraulics.surrogate_backend.SurrogateBackend',
+}
+"""Class of the backend of every simulator, imported when the simulator is used"""
+
+
+def get_backend_class(simulator):
+    """
+    Gets the backend class of a simulator. The module of the backend is only imported here, so
+    the solver libraries of the other backends do not have to be installed.
+
+    :param simulator: name of the simulator, a key of :data:`BACKENDS`
+    :return: a subclass of :class:`HydraulicBackend`
+    :raise UnsupportedSimulator: when there is no backend for the simulator
+    """
+    if simulator not in BACKENDS:
+        raise UnsupportedSimulator("Supported simulators are " + ", ".join(BACKENDS))
+    module_name, class_name = BACKENDS[simulator].rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class HydraulicBackend:
+    """
+    Interface between the physical process and a hydraulic solver. The physical process only
+    talks to the solver through these methods, so a new solver is added with one subclass and
+    an entry in :data:`BACKENDS`.
+
+    A backend loads the network of an EPANET inp file in its constructor, and sets:
+
+    * :code:`wn`, the network object of the solver,
+    * :code:`tank_list`, :code:`junction_list`, :code:`pump_list` and :code:`valve_list`, the
+      names of the elements,
+    * :code:`simulation_step` and :code:`duration`, the hydraulic timestep and the duration of the
+      inp file in seconds.
+
+    :meth:`prepare` then sets up the simulation: the actuators the PLCs control and
+    :code:`state`, a :class:`~dhalsim.hydraulics.state.HydraulicState` with numpy arrays
+    :code:`tank_levels`, :code:`junction_pressures`, :code:`flows` and :code:`statuses` (pumps
+    first, then valves), views :code:`pump_flows`, :code:`pump_statuses`, :code:`valve_flows` and
+    :code:`valve_statuses` on the link arrays, and a :code:`junction_indices(names)` method.
+    :meth:`read_state` updates those arrays in place after a step.
+
+    :param inp_file: path to the EPANET inp file
+    :param logger: logger of the physical process
+    :param options: (Default value = None) the options of the simulator in the configuration
+       file, the section named after it
+    """
+
+    name = None
+    """Name of the simulator in the configuration file"""
+
+    supports_speed = False
+    """Whether actuators accept a pump speed besides open and closed"""
+
+    initial_iteration = 0
+    """Iteration of the initial state in the ground truth, the first step ends the next one"""
+
+    def __init__(self, inp_file, logger, options=None):
+        self.inp_file = str(inp_file)
+        self.logger = logger
+        self.options = options or {}
+
+        self.wn = None
+        self.tank_list = []
+        self.junction_list = []
+        self.pump_list = []
+        self.valve_list = []
+        self.simulation_step = None
+        self.duration = None
+
+        self.state = None
+        self.actuator_names = []
+
+    def initial_actuator_states(self):
+        """
+        Gets the initial state of the pumps and valves in the inp file.
+
+        :return: list of (name, open) tuples, pumps first, then valves
+        """
+        raise NotImplementedError
+
+    def prepare(self, demand_model):
+        """
+        Sets up the simulation: puts the actuators under the control of the physical process and
+        creates :code:`state` and :code:`actuator_names`.
+
+        :param demand_model: :code:`pdd` for pressure driven demand, :code:`dd` for demand driven
+        """
+        raise NotImplementedError
+
+    def set_initial_levels(self, levels):
+        """
+        Sets the initial level of tanks.
+
+        :param levels: dictionary of tank names and levels
+        """
+        raise NotImplementedError
+
+    def set_demand_patterns(self, demands):
+        """
+        Replaces the multipliers of demand patterns.
+
+        :param demands: pandas DataFrame with a column of multipliers for every pattern
+        """
+        raise NotImplementedError
+
+    def get_actuator_values(self):
+        """
+        Gets the statuses that are applied to the actuators.
+
+        :return: numpy float array, in the order of :code:`actuator_names`
+        """
+        raise NotImplementedError
+
+    def apply_actuators(self, values):
+        """
+        Applies the statuses read from the PLCs to the actuators, for the next step. A status is
+        0 for closed, 1 for open or, when :attr:`supports_speed`, a pump speed.
+
+        :param values: numpy float array, in the order of :code:`actuator_names`
+        """
+        raise NotImplementedError
+
+    def start(self, iterations):
+        """
+        Starts the solver, before the first step.
+
+        :param iterations: amount of iterations that will be simulated
+        """
+        raise NotImplementedError
+
+    def step(self):
+        """
+        Solves the next hydraulic time. A solver may solve intermediate times, for example when
+        a tank fills up, that do not end an iteration.
+
+        :return: whether the step ended an iteration
+        """
+        raise NotImplementedError
+
+    def restart(self, simulation_time, tank_levels):
+        """
+        Restarts the solver from tank levels computed elsewhere, for example by a surrogate model,
+        after :meth:`start`. The demand patterns continue at the given simulation time and the
+        actuators are set again at the next step.
+
+        :param simulation_time: seconds since the start of the simulation
+        :param tank_levels: numpy float array, in the order of :code:`tank_list`
+        """
+        raise NotImplementedError
+
+    def read_initial_state(self):
+        """Reads the state before the first step into the arrays of :code:`state`."""
+        raise NotImplementedError
+
+    def read_state(self):
+        """Reads the state of the last step into the arrays of :code:`state`."""
+        self.state.update()
+
+    def save_state(self):
+        """
+        Gets the state of the simulation for a checkpoint.
+
+        :return: dictionary with anything that can be pickled
+        """
+        raise NotImplementedError
+
+    def restore_state(self, state):
+        """
+        Continues the simulation from the state of :meth:`save_state`, before :meth:`start`.
+
+        :param state: the saved state
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Releases the solver at the end of the simulation."""
@@ -0,0 +1,215 @@
+import sys
+
+import numpy as np
+
+from dhalsim.hydraulics.backend import HydraulicBackend
+from dhalsim.hydraulics.epanet_toolkit import EN_DURATION, EN_HYDSTEP, EN_INITSTATUS, EN_JUNCTION, \
+    EN_LINKCOUNT, EN_NODECOUNT, EN_PATTERNSTART, EN_PUMP, EN_SETTING, EN_STATUS, EN_TANK, EN_TANKLEVEL, \
+    EN_VALVE_TYPES, Error, EpanetState, EpanetToolkit
+
+
+class EpanetBackend(HydraulicBackend):
+    """
+    Backend that drives the EPANET 2.2 toolkit directly through ctypes, without a Python layer
+    per element. The controls of the inp file are deleted from the project, as they are applied
+    by the PLCs. Every step runs :code:`EN_runH` and :code:`EN_nextH`, and the state is read with
+    :class:`~dhalsim.hydraulics.epanet_toolkit.EpanetState` into preallocated arrays.
+
+    An actuator value of 0 or 1 closes or opens the link with :code:`EN_STATUS`, any other value
+    is set as :code:`EN_SETTING`, the relative speed of a pump. Only actuators whose value
+    changed are written to the toolkit.
+
+    EPANET solves intermediate hydraulic times, for example when a tank fills up. Those steps
+    do not end an iteration.
+
+    :param inp_file: path to the EPANET inp file
+    :param logger: logger of the physical process
+    :param options: (Default value = None) the options of the simulator in the configuration file
+    """
+
+    name = 'epanet'
+    supports_speed = True
+
+    def __init__(self, inp_file, logger, options=None):
+        super(EpanetBackend, self).__init__(inp_file, logger, options)
+        try:
+            self.toolkit = EpanetToolkit(self.inp_file)
+        except Error as exc:
+            self.logger.error('Error loading ' + self.inp_file + ' in EPANET: ' + str(exc) + ', aborting')
+            sys.exit(1)
+        self.wn = self.toolkit
+
+        self.simulation_step = self.toolkit.get_time_param(EN_HYDSTEP)
+        self.duration = self.toolkit.get_time_param(EN_DURATION)
+        self.pattern_start = self.toolkit.get_time_param(EN_PATTERNSTART)
+
+        for index in range(1, self.toolkit.count(EN_NODECOUNT) + 1):
+            node_type = self.toolkit.node_type(index)
+            if node_type == EN_TANK:
+                self.tank_list.append(self.toolkit.node_id(index))
+            elif node_type == EN_JUNCTION:
+                self.junction_list.append(self.toolkit.node_id(index))
+
+        for index in range(1, self.toolkit.count(EN_LINKCOUNT) + 1):
+            link_type = self.toolkit.link_type(index)
+            if link_type == EN_PUMP:
+                self.pump_list.append(self.toolkit.link_id(index))
+            elif link_type in EN_VALVE_TYPES:
+                self.valve_list.append(self.toolkit.link_id(index))
+
+        self.actuator_indices = None
+        self.actuator_values = None
+        self.applied_values = None
+        self.simulation_time = 0
+        self.end_time = None
+
+    def initial_actuator_states(self):
+        """
+        Gets the initial state of the pumps and valves in the inp file.
+
+        :return: list of (name, open) tuples, pumps first, then valves
+        """
+        return [(name, self.toolkit.get_link_value(self.toolkit.link_index(name), EN_INITSTATUS) != 0)
+                for name in self.pump_list + self.valve_list]
+
+    def prepare(self, demand_model):
+        """
+        Deletes the controls and rules of the inp file, sets the demand model and resolves the toolkit
+        indices of the actuators and of the state reader.
+
+        :param demand_model: :code:`pdd` for pressure driven demand, :code:`dd` for demand driven
+        """
+        self.toolkit.delete_controls()
+        if demand_model == 'pdd':
+            self.toolkit.use_pressure_driven_demand()
+
+        self.actuator_names = self.pump_list + self.valve_list
+        self.actuator_indices = [self.toolkit.link_index(name) for name in self.actuator_names]
+        self.actuator_values = np.array([self.toolkit.get_link_value(index, EN_INITSTATUS)
+                                         for index in self.actuator_indices], dtype=np.float64)
+        self.applied_values = np.full(len(self.actuator_names), np.nan)
+
+        self.state = EpanetState(self.toolkit, self.tank_list, self.junction_list, self.pump_list, self.valve_list)
+
+    def set_initial_levels(self, levels):
+        """
+        Sets the initial level of tanks.
+
+        :param levels: dictionary of tank names and levels
+        """
+        for tank, level in levels.items():
+            self.toolkit.set_node_value(self.toolkit.node_index(tank), EN_TANKLEVEL, level)
+
+    def set_demand_patterns(self, demands):
+        """
+        Replaces the multipliers of the demand patterns that have a column in the demands.
+
+        :param demands: pandas DataFrame with a column of multipliers for every pattern
+        """
+        for name in demands.columns:
+            try:
+                index = self.toolkit.pattern_index(str(name))
+            except Error:
+                self.logger.debug("Pattern " + str(name) + " is not in the network, skipping...")
+                continue
+            self.toolkit.set_pattern(index, demands[name].values.tolist())
+
+    def get_actuator_values(self):
+        """
+        Gets the statuses that are applied to the actuators.
+
+        :return: numpy float array, in the order of :code:`actuator_names`
+        """
+        return self.actuator_values.copy()
+
+    def apply_actuators(self, values):
+        """
+        Writes the actuators whose value changed since the last step to the toolkit.
+
+        :param values: numpy float array, in the order of :code:`actuator_names`
+        """
+        changed = np.flatnonzero(values != self.applied_values)
+        for i in changed.tolist():
+            value = float(values[i])
+            if value == 0 or value == 1:
+                self.toolkit.set_link_value(self.actuator_indices[i], EN_STATUS, value)
+            else:
+                self.toolkit.set_link_value(self.actuator_indices[i], EN_SETTING, value)
+
+        self.applied_values[changed] = values[changed]
+        self.actuator_values[:] = values
+
+    def start(self, iterations):
+        """
+        Opens the hydraulic solver for the given amount of iterations. After a restore, the demand
+        patterns continue at the saved simulation time. Opening the solver resets the links to
+        their initial status, so the first step sets every actuator again.
+
+        :param iterations: amount of iterations that will be simulated
+        """
+        self.end_time = self.simulation_time + iterations * self.simulation_step
+        self.toolkit.set_time_param(EN_DURATION, iterations * self.simulation_step)
+        if self.simulation_time:
+            self.toolkit.set_time_param(EN_PATTERNSTART, self.pattern_start + self.simulation_time)
+        self.toolkit.open_hydraulics()
+        self.applied_values[:] = np.nan
+
+    def step(self):
+        """
+        Solves the current hydraulic time and moves to the next one, which is at most one
+        hydraulic timestep later.
+
+        :return: whether the next hydraulic time starts a new iteration
+        """
+        self.toolkit.run_hydraulics()
+        internal_step = self.toolkit.next_hydraulics()
+        completed = (self.simulation_time + internal_step) // self.simulation_step > \
+            self.simulation_time // self.simulation_step
+        self.simulation_time += internal_step
+        return completed
+
+    def restart(self, simulation_time, tank_levels):
+        """
+        Closes the hydraulic solver and opens it again at the given simulation time and tank
+        levels, for the iterations that are left.
+
+        :param simulation_time: seconds since the start of the simulation
+        :param tank_levels: numpy float array, in the order of :code:`tank_list`
+        """
+        self.toolkit.close_hydraulics()
+        self.simulation_time = int(simulation_time)
+        self.set_initial_levels(dict(zip(self.tank_list, tank_levels.tolist())))
+        self.toolkit.set_time_param(EN_PATTERNSTART, self.pattern_start + self.simulation_time)
+        self.start((self.end_time - self.simulation_time) // self.simulation_step)
+
+    def read_initial_state(self):
+        """Reads the initial state. Junction pressures are not computed before the first step."""
+        self.state.update()
+        self.state.junction_pressures[:] = 0
+
+    def save_state(self):
+        """
+        Gets the tank levels, the actuators and the simulation time. The solver state lives in
+        the EPANET toolkit and cannot be saved, the simulation is restarted from these values.
+
+        :return: dictionary with the saved values
+        """
+        return {
+            'simulation_time': self.simulation_time,
+            'tank_levels': self.state.tank_levels.copy(),
+            'actuator_values': self.actuator_values.copy(),
+        }
+
+    def restore_state(self, state):
+        """
+        Sets the saved tank levels, actuators and simulation time.
+
+        :param state: the saved state
+        """
+        self.simulation_time = state['simulation_time']
+        self.set_initial_levels(dict(zip(self.tank_list, state['tank_levels'].tolist())))
+        self.actuator_values[:] = state['actuator_values']
+
+    def close(self):
+        """Closes the EPANET project."""
+        self.toolkit.close()
@@ -0,0 +1,365 @@
+import ctypes
+import ctypes.util
+import importlib.util
+import os
+import platform
+from pathlib import Path
+
+import numpy as np
+
+from dhalsim.hydraulics.state import HydraulicState
+
+EN_ELEVATION = 0
+"""EPANET node parameter code of the elevation"""
+
+EN_HEAD = 10
+"""EPANET node parameter code of the hydraulic head"""
+
+EN_PRESSURE = 11
+"""EPANET node parameter code of the pressure"""
+
+EN_TANKLEVEL = 8
+"""EPANET node parameter code of the initial water level of a tank"""
+
+EN_INITSTATUS = 4
+"""EPANET link parameter code of the initial status"""
+
+EN_SETTING = 12
+"""EPANET link parameter code of the current setting, the relative speed of a pump"""
+
+EN_FLOW = 8
+"""EPANET link parameter code of the flow"""
+
+EN_STATUS = 11
+"""EPANET link parameter code of the current status"""
+
+EN_NODECOUNT = 0
+"""EPANET component code of the amount of nodes"""
+
+EN_LINKCOUNT = 2
+"""EPANET component code of the amount of links"""
+
+EN_CONTROLCOUNT = 5
+"""EPANET component code of the amount of simple controls"""
+
+EN_RULECOUNT = 6
+"""EPANET component code of the amount of rule-based controls"""
+
+EN_DURATION = 0
+"""EPANET time parameter code of the duration"""
+
+EN_HYDSTEP = 1
+"""EPANET time parameter code of the hydraulic timestep"""
+
+EN_PATTERNSTART = 4
+"""EPANET time parameter code of the time at which the demand patterns start"""
+
+EN_JUNCTION = 0
+"""EPANET node type code of a junction"""
+
+EN_TANK = 2
+"""EPANET node type code of a tank"""
+
+EN_PUMP = 2
+"""EPANET link type code of a pump"""
+
+EN_VALVE_TYPES = (3, 4, 5, 6, 7, 8)
+"""EPANET link type codes of the PRV, PSV, PBV, FCV, TCV and GPV valves"""
+
+EN_PDA = 1
+"""EPANET demand model code of pressure driven analysis"""
+
+EN_MAXID = 31
+"""Maximum length of an EPANET element id"""
+
+LIBRARY_NAMES = ('epanet22', 'epanet2', 'epanet')
+"""Names of the EPANET 2.2 library searched on the system"""
+
+WNTR_LIBRARIES = {
+    ('Linux', 'x86_64'): 'linux-x64/libepanet22.so',
+    ('Darwin', 'x86_64'): 'darwin-x64/libepanet22.dylib',
+    ('Darwin', 'arm64'): 'darwin-arm/libepanet22.dylib',
+    ('Windows', 'AMD64'): 'windows-x64/epanet22.dll',
+}
+"""Path of the EPANET 2.2 library shipped with WNTR, per platform"""
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class EpanetError(Error):
+    """Raised when the EPANET toolkit returns an error code"""
+
+
+class LibraryNotFound(Error):
+    """Raised when no EPANET 2.2 library is found"""
+
+
+def find_library():
+    """
+    Finds the EPANET 2.2 shared library. A library installed on the system is preferred, then the
+    library that ships with WNTR, which is a dependency of DHALSIM anyway.
+
+    :return: path of the library
+    :raise LibraryNotFound: when there is no EPANET library
+    """
+    for name in LIBRARY_NAMES:
+        path = ctypes.util.find_library(name)
+        if path:
+            return path
+
+    spec = importlib.util.find_spec('wntr')
+    relative_path = WNTR_LIBRARIES.get((platform.system(), platform.machine()))
+    if spec and spec.origin and relative_path:
+        path = Path(spec.origin).parent / 'epanet' / 'libepanet' / relative_path
+        if path.is_file():
+            return str(path)
+
+    raise LibraryNotFound("No EPANET 2.2 library found, install libepanet or WNTR")
+
+
+class EpanetToolkit:
+    """
+    Thin ctypes binding of the project based API of the EPANET 2.2 toolkit. Every instance is its
+    own EPANET project, values are doubles and error codes are raised as :class:`EpanetError`.
+    EPANET warnings, codes below 100, are ignored.
+
+    :param inp_file: path to the EPANET inp file
+    :param library: (Default value = None) path of the EPANET library, found with
+       :func:`find_library` when not given
+    """
+
+    def __init__(self, inp_file, library=None):
+        self.lib = ctypes.CDLL(library or find_library())
+        self.declare_functions()
+
+        self.project = ctypes.c_void_p()
+        self.check(self.lib.EN_createproject(ctypes.byref(self.project)))
+        self.check(self.lib.EN_open(self.project, str(inp_file).encode(), os.devnull.encode(), b''))
+        self.hydraulics_open = False
+
+        self.int_value = ctypes.c_int()
+        self.long_value = ctypes.c_long()
+        self.double_value = ctypes.c_double()
+
+    def declare_functions(self):
+        """Declares the argument types of the functions that take doubles."""
+        project, c_int, c_double = ctypes.c_void_p, ctypes.c_int, ctypes.c_double
+        self.lib.EN_setnodevalue.argtypes = [project, c_int, c_int, c_double]
+        self.lib.EN_setlinkvalue.argtypes = [project, c_int, c_int, c_double]
+        self.lib.EN_setdemandmodel.argtypes = [project, c_int, c_double, c_double, c_double]
+        self.lib.EN_settimeparam.argtypes = [project, c_int, ctypes.c_long]
+
+    def check(self, error_code):
+        """
+        Raises the error of a toolkit call.
+
+        :param error_code: code returned by the toolkit
+        :raise EpanetError: when the code is an error
+        """
+        if error_code > 100:
+            message = ctypes.create_string_buffer(256)
+            self.lib.EN_geterror(error_code, message, 255)
+            raise EpanetError(message.value.decode(errors='replace'))
+
+    def count(self, code):
+        self.check(self.lib.EN_getcount(self.project, code, ctypes.byref(self.int_value)))
+        return self.int_value.value
+
+    def node_index(self, name):
+        self.check(self.lib.EN_getnodeindex(self.project, name.encode(), ctypes.byref(self.int_value)))
+        return self.int_value.value
+
+    def link_index(self, name):
+        self.check(self.lib.EN_getlinkindex(self.project, name.encode(), ctypes.byref(self.int_value)))
+        return self.int_value.value
+
+    def pattern_index(self, name):
+        self.check(self.lib.EN_getpatternindex(self.project, name.encode(), ctypes.byref(self.int_value)))
+        return self.int_value.value
+
+    def node_id(self, index):
+        name = ctypes.create_string_buffer(EN_MAXID + 1)
+        self.check(self.lib.EN_getnodeid(self.project, index, name))
+        return name.value.decode()
+
+    def link_id(self, index):
+        name = ctypes.create_string_buffer(EN_MAXID + 1)
+        self.check(self.lib.EN_getlinkid(self.project, index, name))
+        return name.value.decode()
+
+    def node_type(self, index):
+        self.check(self.lib.EN_getnodetype(self.project, index, ctypes.byref(self.int_value)))
+        return self.int_value.value
+
+    def link_type(self, index):
+        self.check(self.lib.EN_getlinktype(self.project, index, ctypes.byref(self.int_value)))
+        return self.int_value.value
+
+    def get_node_value(self, index, code):
+        self.check(self.lib.EN_getnodevalue(self.project, index, code, ctypes.byref(self.double_value)))
+        return self.double_value.value
+
+    def get_link_value(self, index, code):
+        self.check(self.lib.EN_getlinkvalue(self.project, index, code, ctypes.byref(self.double_value)))
+        return self.double_value.value
+
+    def set_node_value(self, index, code, value):
+        self.check(self.lib.EN_setnodevalue(self.project, index, code, value))
+
+    def set_link_value(self, index, code, value):
+        self.check(self.lib.EN_setlinkvalue(self.project, index, code, value))
+
+    def get_time_param(self, code):
+        self.check(self.lib.EN_gettimeparam(self.project, code, ctypes.byref(self.long_value)))
+        return self.long_value.value
+
+    def set_time_param(self, code, value):
+        self.check(self.lib.EN_settimeparam(self.project, code, int(value)))
+
+    def set_pattern(self, index, multipliers):
+        values = (ctypes.c_double * len(multipliers))(*multipliers)
+        self.check(self.lib.EN_setpattern(self.project, index, values, len(multipliers)))
+
+    def delete_controls(self):
+        """Deletes all simple and rule-based controls, they are applied by the PLCs instead."""
+        for index in range(self.count(EN_CONTROLCOUNT), 0, -1):
+            self.check(self.lib.EN_deletecontrol(self.project, index))
+        for index in range(self.count(EN_RULECOUNT), 0, -1):
+            self.check(self.lib.EN_deleterule(self.project, index))
+
+    def use_pressure_driven_demand(self):
+        """Switches to pressure driven analysis, with the pressure limits of the inp file."""
+        minimum, required, exponent = ctypes.c_double(), ctypes.c_double(), ctypes.c_double()
+        self.check(self.lib.EN_getdemandmodel(self.project, ctypes.byref(self.int_value), ctypes.byref(minimum),
+                                              ctypes.byref(required), ctypes.byref(exponent)))
+        self.check(self.lib.EN_setdemandmodel(self.project, EN_PDA, minimum.value, required.value,
+                                              exponent.value))
+
+    def open_hydraulics(self):
+        """Opens and initializes the hydraulic solver, without saving results to a file."""
+        self.check(self.lib.EN_openH(self.project))
+        self.hydraulics_open = True
+        self.check(self.lib.EN_initH(self.project, 0))
+
+    def close_hydraulics(self):
+        """Closes the hydraulic solver, the project stays open."""
+        if self.hydraulics_open:
+            self.check(self.lib.EN_closeH(self.project))
+            self.hydraulics_open = False
+
+    def run_hydraulics(self):
+        """
+        Solves the hydraulics at the current time.
+
+        :return: the current time of the hydraulic simulation in seconds
+        """
+        self.check(self.lib.EN_runH(self.project, ctypes.byref(self.long_value)))
+        return self.long_value.value
+
+    def next_hydraulics(self):
+        """
+        Moves to the next hydraulic time.
+
+        :return: seconds until the next hydraulic time, 0 at the end of the simulation
+        """
+        self.check(self.lib.EN_nextH(self.project, ctypes.byref(self.long_value)))
+        return self.long_value.value
+
+    def close(self):
+        """Closes the hydraulic solver and the project."""
+        if self.project is None:
+            return
+        if self.hydraulics_open:
+            self.lib.EN_closeH(self.project)
+            self.hydraulics_open = False
+        self.lib.EN_close(self.project)
+        self.lib.EN_deleteproject(self.project)
+        self.project = None
+
+
+class EpanetState(HydraulicState):
+    """
+    Reads the hydraulic state of an EPANET project into preallocated numpy arrays. The toolkit
+    indices and the tank elevations are resolved once.
+
+    When the EPANET library exports the array getters :code:`EN_getnodevalues` and
+    :code:`EN_getlinkvalues` (EPANET 2.3), every parameter is read with one call into a
+    preallocated buffer. Otherwise the requested elements are read one toolkit call each,
+    straight from the library.
+
+    :param toolkit: the :class:`EpanetToolkit` of the project
+    :param tanks: names of the tanks
+    :param junctions: names of the junctions
+    :param pumps: names of the pumps
+    :param valves: names of the valves
+    """
+
+    def __init__(self, toolkit, tanks, junctions, pumps, valves):
+        super(EpanetState, self).__init__(tanks, junctions, pumps, valves)
+        links = list(pumps) + list(valves)
+        self.toolkit = toolkit
+        self.tank_indices = np.array([toolkit.node_index(name) for name in tanks], dtype=np.intc)
+        self.junction_node_indices = np.array([toolkit.node_index(name) for name in junctions], dtype=np.intc)
+        self.link_indices = np.array([toolkit.link_index(name) for name in links], dtype=np.intc)
+        self.tank_elevations = np.array([toolkit.get_node_value(int(index), EN_ELEVATION)
+                                         for index in self.tank_indices], dtype=np.float64)
+
+        lib = toolkit.lib
+        self.get_node_values = getattr(lib, 'EN_getnodevalues', None)
+        self.get_link_values = getattr(lib, 'EN_getlinkvalues', None)
+        if self.bulk:
+            self.node_buffer = (ctypes.c_double * toolkit.count(EN_NODECOUNT))()
+            self.link_buffer = (ctypes.c_double * toolkit.count(EN_LINKCOUNT))()
+        self.get_node_value = lib.EN_getnodevalue
+        self.get_link_value = lib.EN_getlinkvalue
+        self.value = ctypes.c_double()
+        self.value_ref = ctypes.byref(self.value)
+
+    @property
+    def bulk(self):
+        """Whether the array getters of the toolkit are used."""
+        return self.get_node_values is not None and self.get_link_values is not None
+
+    def node_values(self, code, indices, out):
+        """
+        Reads a parameter of several nodes.
+
+        :param code: EPANET node parameter code
+        :param indices: toolkit indices of the nodes, starting at 1
+        :param out: array the values are written to
+        """
+        if self.bulk:
+            self.toolkit.check(self.get_node_values(self.toolkit.project, code, self.node_buffer))
+            out[:] = np.frombuffer(self.node_buffer, dtype=np.float64)[indices - 1]
+            return
+        project, get, value, value_ref = self.toolkit.project, self.get_node_value, self.value, self.value_ref
+        for i, index in enumerate(indices.tolist()):
+            get(project, index, code, value_ref)
+            out[i] = value.value
+
+    def link_values(self, code, indices, out):
+        """
+        Reads a parameter of several links.
+
+        :param code: EPANET link parameter code
+        :param indices: toolkit indices of the links, starting at 1
+        :param out: array the values are written to
+        """
+        if self.bulk:
+            self.toolkit.check(self.get_link_values(self.toolkit.project, code, self.link_buffer))
+            out[:] = np.frombuffer(self.link_buffer, dtype=np.float64)[indices - 1]
+            return
+        project, get, value, value_ref = self.toolkit.project, self.get_link_value, self.value, self.value_ref
+        for i, index in enumerate(indices.tolist()):
+            get(project, index, code, value_ref)
+            out[i] = value.value
+
+    def update(self):
+        """Reads the tank levels, junction pressures, link flows and link statuses of the last step."""
+        self.node_values(EN_HEAD, self.tank_indices, self.tank_levels)
+        self.tank_levels -= self.tank_elevations
+        self.node_values(EN_PRESSURE, self.junction_node_indices, self.junction_pressures)
+        self.link_values(EN_FLOW, self.link_indices, self.flows)
+        self.link_values(EN_STATUS, self.link_indices, self.statuses)
@@ -0,0 +1,206 @@
+import sys
+
+from epynet import epynetUtils
+from epynet.water_network import WaterDistributionNetwork
+import numpy as np
+
+from dhalsim.epynet_state import EN_PATTERNSTART, EpynetState
+from dhalsim.hydraulics.backend import HydraulicBackend
+
+
+def remove_controls_from_inp_file(in_file, out_file):
+    """
+    Writes a copy of an inp file without the rules of its [CONTROLS] section, which are applied
+    by the PLCs instead.
+
+    :param in_file: path of the inp file
+    :param out_file: path of the copy
+    """
+    write_out = True
+    with open(in_file) as infile, open(out_file, "w") as outfile:
+        for line in infile:
+            if write_out:
+                outfile.write(line)
+            if line.startswith('[CONTROLS]'):
+                write_out = False
+                continue
+
+            if not write_out and line.startswith('['):
+                write_out = True
+
+
+def last_value(value):
+    """Gets the last value of an epynet result series, or the value itself if it is a number."""
+    if hasattr(value, 'iloc'):
+        return value.iloc[-1] if len(value) else float('nan')
+    return value
+
+
+class EpynetBackend(HydraulicBackend):
+    """
+    Backend of the DHALSIM fork of epynet. Epynet has no way of removing the controls of a
+    network, so the network is loaded from a copy of the inp file without [CONTROLS] section.
+    The statuses of the actuators are passed to every step, as int for open or closed and as
+    float for a pump speed. The state is read with :class:`~dhalsim.epynet_state.EpynetState`.
+
+    EPANET solves intermediate hydraulic times, for example when a tank fills up. Those steps
+    do not end an iteration.
+
+    :param inp_file: path to the EPANET inp file
+    :param logger: logger of the physical process
+    :param options: (Default value = None) the options of the simulator in the configuration file
+    """
+
+    name = 'epynet'
+    supports_speed = True
+
+    def __init__(self, inp_file, logger, options=None):
+        super(EpynetBackend, self).__init__(inp_file, logger, options)
+        processed_inp_file = self.inp_file.rsplit('.', 1)[0] + '_processed.inp'
+        try:
+            remove_controls_from_inp_file(self.inp_file, processed_inp_file)
+        except IOError:
+            self.logger.error('IO Exception writing an EPANET file without [CONTROLS], aborting')
+            sys.exit(1)
+
+        self.wn = WaterDistributionNetwork(processed_inp_file)
+
+        self.simulation_step = epynetUtils.get_time_parameter(
+            self.wn, epynetUtils.get_time_param_code('EN_HYDSTEP'))[1]
+        self.duration = epynetUtils.get_time_parameter(
+            self.wn, epynetUtils.get_time_param_code('EN_DURATION'))[1]
+        self.pattern_start = epynetUtils.get_time_parameter(
+            self.wn, epynetUtils.get_time_param_code('EN_PATTERNSTART'))[1]
+
+        self.tank_list = list(self.wn.tanks.keys())
+        self.junction_list = list(self.wn.junctions.keys())
+        self.pump_list = list(self.wn.pumps.keys())
+        self.valve_list = list(self.wn.valves.keys())
+
+        self.actuator_list = None
+        self.actuator_types = []
+        self.simulation_time = 0
+
+    def get_link(self, name):
+        """Gets the epynet pump or valve of an actuator."""
+        if name in self.wn.pumps:
+            return self.wn.pumps[name]
+        return self.wn.valves[name]
+
+    def initial_actuator_states(self):
+        """
+        Gets the initial state of the pumps and valves in the inp file.
+
+        :return: list of (name, open) tuples, pumps first, then valves
+        """
+        return [(name, bool(self.get_link(name).initstatus)) for name in self.pump_list + self.valve_list]
+
+    def prepare(self, demand_model):
+        """
+        Reads the initial status of every pump and valve, and resolves the toolkit indices of the
+        state reader. The type of every status (int for open/closed, float for a pump speed) is
+        taken from its initial status.
+
+        :param demand_model: not used, the demand model is set in the inp file
+        """
+        self.actuator_names = self.pump_list + self.valve_list
+        self.actuator_list = {name: self.get_link(name).status for name in self.actuator_names}
+        self.actuator_types = [int if isinstance(status, int) else float for status in self.actuator_list.values()]
+
+        # Toolkit indices are resolved once, every step the whole state is read at once
+        self.state = EpynetState(self.wn, self.tank_list, self.junction_list, self.pump_list, self.valve_list)
+
+    def set_initial_levels(self, levels):
+        """
+        Sets the initial level of tanks.
+
+        :param levels: dictionary of tank names and levels
+        """
+        for tank, level in levels.items():
+            self.wn.tanks[tank].tanklevel = level
+
+    def set_demand_patterns(self, demands):
+        """
+        Replaces the multipliers of all demand patterns.
+
+        :param demands: pandas DataFrame with a column of multipliers for every pattern
+        """
+        for pattern in self.wn.patterns.uid:
+            self.wn.set_demand_pattern(pattern, demands[pattern].tolist())
+
+    def get_actuator_values(self):
+        """
+        Gets the statuses that are applied to the actuators.
+
+        :return: numpy float array, in the order of :code:`actuator_names`
+        """
+        return np.array([self.actuator_list[name] for name in self.actuator_names], dtype=np.float64)
+
+    def apply_actuators(self, values):
+        """
+        Sets the statuses passed to the next step.
+
+        :param values: numpy float array, in the order of :code:`actuator_names`
+        """
+        for name, actuator_type, value in zip(self.actuator_names, self.actuator_types, values.tolist()):
+            # Actuator is either OPEN/CLOSED (int) or has a pump speed setting (float)
+            self.actuator_list[name] = actuator_type(value)
+
+    def start(self, iterations):
+        """
+        Initializes the interactive EPANET simulation for the given amount of iterations. After
+        a restore, the demand patterns continue at the saved simulation time.
+
+        :param iterations: amount of iterations that will be simulated
+        """
+        self.wn.set_time_params(duration=iterations * self.simulation_step, hydraulic_step=self.simulation_step)
+        if self.simulation_time:
+            self.wn.ep.ENsettimeparam(EN_PATTERNSTART, int(self.pattern_start + self.simulation_time))
+        self.wn.init_simulation(interactive=True)
+
+    def step(self):
+        """
+        Solves the current hydraulic time and moves to the next one, which is at most one
+        hydraulic timestep later.
+
+        :return: whether the next hydraulic time starts a new iteration
+        """
+        internal_step, _ = self.wn.simulate_step(self.simulation_time, self.actuator_list)
+        completed = (self.simulation_time + internal_step) // self.simulation_step > \
+            self.simulation_time // self.simulation_step
+        self.simulation_time += internal_step
+        return completed
+
+    def read_initial_state(self):
+        """Reads the initial state from the epynet elements."""
+        self.state.tank_levels[:] = [self.wn.tanks[tank].tanklevel for tank in self.tank_list]
+        self.state.junction_pressures[:] = [last_value(self.wn.junctions[junction].pressure)
+                                            for junction in self.junction_list]
+        for i, name in enumerate(self.pump_list + self.valve_list):
+            link = self.get_link(name)
+            self.state.flows[i] = link.flow
+            self.state.statuses[i] = link.status
+
+    def save_state(self):
+        """
+        Gets the tank levels, the actuators and the simulation time. The solver state lives in
+        the EPANET toolkit and cannot be saved, the simulation is restarted from these values.
+
+        :return: dictionary with the saved values
+        """
+        return {
+            'simulation_time': self.simulation_time,
+            'tank_levels': self.state.tank_levels.copy(),
+            'actuator_list': dict(self.actuator_list),
+        }
+
+    def restore_state(self, state):
+        """
+        Sets the saved tank levels, actuators and simulation time.
+
+        :param state: the saved state
+        """
+        self.simulation_time = state['simulation_time']
+        for tank, level in zip(self.tank_list, state['tank_levels'].tolist()):
+            self.wn.tanks[tank].tanklevel = level
+        self.actuator_list.update(state['actuator_list'])
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+class HydraulicState:
+    """
+    Hydraulic state of a network in preallocated numpy arrays, in the order of the given name
+    lists: tank levels, junction pressures, and the flows and statuses of the pumps followed by
+    the valves. Every backend subclasses it with the logic to read the state from its simulator
+    in :meth:`update`.
+
+    :param tanks: names of the tanks
+    :param junctions: names of the junctions
+    :param pumps: names of the pumps
+    :param valves: names of the valves
+    """
+
+    def __init__(self, tanks, junctions, pumps, valves):
+        link_count = len(pumps) + len(valves)
+        self.junction_index = {name: i for i, name in enumerate(junctions)}
+
+        self.tank_levels = np.zeros(len(tanks), dtype=np.float64)
+        self.junction_pressures = np.zeros(len(junctions), dtype=np.float64)
+        self.flows = np.zeros(link_count, dtype=np.float64)
+        self.statuses = np.zeros(link_count, dtype=np.int64)
+
+        # Views on the pump and valve part of the link arrays
+        self.pump_flows = self.flows[:len(pumps)]
+        self.pump_statuses = self.statuses[:len(pumps)]
+        self.valve_flows = self.flows[len(pumps):]
+        self.valve_statuses = self.statuses[len(pumps):]
+
+    def junction_indices(self, names):
+        """
+        Gets the positions of junctions in :code:`junction_pressures`.
+
+        :param names: names of the junctions
+        :return: numpy array of positions
+        """
+        return np.array([self.junction_index[name] for name in names], dtype=np.intp)
+
+    def copy_from(self, state):
+        """
+        Copies the arrays of another state with the same layout.
+
+        :param state: the state to copy
+        """
+        np.copyto(self.tank_levels, state.tank_levels)
+        np.copyto(self.junction_pressures, state.junction_pressures)
+        np.copyto(self.flows, state.flows)
+        np.copyto(self.statuses, state.statuses)
+
+    def update(self):
+        """Reads the state of the last step from the simulator."""
+        raise NotImplementedError
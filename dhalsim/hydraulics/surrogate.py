@@ -0,0 +1,457 @@
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import wntr
+
+from dhalsim.ground_truth import read_ground_truth
+from dhalsim.py3_logger import get_logger
+
+MODEL_VERSION = 1
+"""Version of the model file, a model of another version has to be trained again"""
+
+LEVEL_TOLERANCE = 1e-3
+"""Distance in meters to the minimum or maximum level at which a tank counts as empty or full"""
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class SurrogateError(Error):
+    """Raised when a surrogate model cannot be trained or does not fit the network"""
+
+
+class PatternMultipliers:
+    """
+    Multipliers of the patterns of a network at a simulation time, the demand inputs of a
+    surrogate model.
+
+    :param wn: WNTR water network model of the network
+    """
+
+    def __init__(self, wn):
+        self.names = sorted(wn.pattern_name_list)
+        self.patterns = [wn.get_pattern(name) for name in self.names]
+        self.pattern_start = wn.options.time.pattern_start
+
+    def set_demand_patterns(self, demands):
+        """
+        Replaces the multipliers of the patterns that have a column in the demands.
+
+        :param demands: pandas DataFrame with a column of multipliers for every pattern
+        """
+        for name, pattern in zip(self.names, self.patterns):
+            if name in demands:
+                pattern.multipliers = demands[name].values.tolist()
+
+    def at(self, simulation_time):
+        """
+        Gets the multiplier of every pattern.
+
+        :param simulation_time: seconds since the start of the simulation
+        :return: numpy float array, in the order of :code:`names`
+        """
+        return np.array([pattern.at(self.pattern_start + simulation_time) for pattern in self.patterns],
+                        dtype=np.float64)
+
+
+class SurrogateModel:
+    """
+    Approximation of one hydraulic timestep. The inputs are the tank levels, whether every
+    actuator is open (1) or closed (0), the pattern multipliers at the start of the step and
+    whether every actuator was open in the previous step, the outputs the tank levels, the
+    junction pressures and the pump and valve flows at its end. The previous statuses matter
+    to WNTR, whose tank levels follow the flows of the previous step. Pump speeds are not
+    inputs, the ground truth only records whether a pump runs.
+
+    Every combination of open and closed actuators seen in the training data, a mode, has its
+    own ridge regression on the standardized inputs: with the links fixed, the hydraulics are
+    close to linear in the levels and the demands. Tank levels are predicted as the change over
+    the step. The envelope of a mode is the range of every input in its training samples;
+    inputs outside of it, or a mode that was not trained, have no prediction.
+
+    An empty or full tank closes its links, which changes the hydraulics as much as an
+    actuator. Samples that start or end with a tank at its minimum or maximum level are not
+    trained, and :meth:`approximate` has no prediction for them.
+
+    :param tank_names: names of the tanks, the first inputs and outputs
+    :param actuator_names: names of the pumps and valves, the next inputs, and the last inputs
+       for the previous step
+    :param pattern_names: names of the patterns, the inputs after the actuators
+    :param output_names: ground truth columns of the outputs
+    :param simulation_step: hydraulic timestep of the training data in seconds
+    :param min_levels: minimum level of every tank
+    :param max_levels: maximum level of every tank
+    """
+
+    def __init__(self, tank_names, actuator_names, pattern_names, output_names, simulation_step,
+                 min_levels, max_levels):
+        self.tank_names = list(tank_names)
+        self.actuator_names = list(actuator_names)
+        self.pattern_names = list(pattern_names)
+        self.output_names = list(output_names)
+        self.simulation_step = simulation_step
+        self.min_levels = np.asarray(min_levels, dtype=np.float64)
+        self.max_levels = np.asarray(max_levels, dtype=np.float64)
+
+        n_inputs = len(self.tank_names) + 2 * len(self.actuator_names) + len(self.pattern_names)
+        n_outputs = len(self.output_names)
+        self.modes = np.zeros((0, len(self.actuator_names)), dtype=bool)
+        self.mean = np.zeros((0, n_inputs))
+        self.scale = np.zeros((0, n_inputs))
+        self.coef = np.zeros((0, n_inputs, n_outputs))
+        self.intercept = np.zeros((0, n_outputs))
+        self.lower = np.zeros((0, n_inputs))
+        self.upper = np.zeros((0, n_inputs))
+
+    @property
+    def actuator_slice(self):
+        """Position of the actuator statuses in the inputs."""
+        return slice(len(self.tank_names), len(self.tank_names) + len(self.actuator_names))
+
+    @property
+    def pattern_slice(self):
+        """Position of the pattern multipliers in the inputs."""
+        return slice(self.actuator_slice.stop, self.actuator_slice.stop + len(self.pattern_names))
+
+    @property
+    def previous_slice(self):
+        """Position of the actuator statuses of the previous step in the inputs."""
+        return slice(self.pattern_slice.stop, self.pattern_slice.stop + len(self.actuator_names))
+
+    def at_level_limit(self, values):
+        """
+        Checks which samples have an empty or a full tank.
+
+        :param values: 2-D numpy float array of inputs or outputs, one sample per row
+        :return: numpy bool array
+        """
+        levels = values[:, :len(self.tank_names)]
+        return ((levels <= self.min_levels + LEVEL_TOLERANCE) | (levels >= self.max_levels - LEVEL_TOLERANCE)).any(axis=1)
+
+    def fit(self, inputs, targets, ridge=1e-3, min_samples=10):
+        """
+        Trains a regression for every mode with enough samples, without the samples that start
+        or end with an empty or full tank.
+
+        :param inputs: 2-D numpy float array, one sample per row
+        :param targets: 2-D numpy float array with the outputs of every sample
+        :param ridge: (Default value = 1e-3) regularization of the coefficients
+        :param min_samples: (Default value = 10) samples a mode needs to be trained
+        :raise SurrogateError: when no mode has enough samples
+        """
+        trained_samples = ~(self.at_level_limit(inputs) | self.at_level_limit(targets))
+        inputs = inputs[trained_samples]
+        targets = targets[trained_samples].copy()
+        targets[:, :len(self.tank_names)] -= inputs[:, :len(self.tank_names)]
+
+        modes, mode_of_sample = np.unique(inputs[:, self.actuator_slice] != 0, axis=0, return_inverse=True)
+        mode_of_sample = mode_of_sample.reshape(-1)
+        trained = [mode for mode in range(len(modes)) if np.count_nonzero(mode_of_sample == mode) >= min_samples]
+        if not trained:
+            raise SurrogateError("No combination of actuator statuses has {n} training samples".format(
+                n=min_samples))
+
+        self.modes = modes[trained]
+        fits = [self.fit_mode(inputs[mode_of_sample == mode], targets[mode_of_sample == mode], ridge)
+                for mode in trained]
+        self.mean, self.scale, self.coef, self.intercept, self.lower, self.upper = \
+            [np.stack(arrays) for arrays in zip(*fits)]
+
+    @staticmethod
+    def fit_mode(inputs, targets, ridge):
+        """
+        Solves the ridge regression of one mode. Inputs that are constant in the mode are
+        centered to zero and do not contribute.
+
+        :return: tuple of the input mean and scale, the coefficients, the intercept and the lower
+           and upper bound of the inputs
+        """
+        mean = inputs.mean(axis=0)
+        scale = inputs.std(axis=0)
+        scale[scale == 0] = 1
+        standardized = (inputs - mean) / scale
+        intercept = targets.mean(axis=0)
+        gram = standardized.T @ standardized + ridge * np.eye(inputs.shape[1])
+        coef = np.linalg.solve(gram, standardized.T @ (targets - intercept))
+        return mean, scale, coef, intercept, inputs.min(axis=0), inputs.max(axis=0)
+
+    def mode_index(self, inputs):
+        """
+        Gets the mode of the actuator values of the inputs.
+
+        :param inputs: numpy float array of one sample
+        :return: index of the mode, None when the mode was not trained
+        """
+        matches = np.flatnonzero((self.modes == (inputs[self.actuator_slice] != 0)).all(axis=1))
+        return int(matches[0]) if len(matches) else None
+
+    def inside(self, mode, inputs, margin=0.0):
+        """
+        Checks that inputs are in the envelope of a mode, widened by a fraction of its range.
+
+        :param mode: index of the mode
+        :param inputs: numpy float array of one sample
+        :param margin: (Default value = 0.0) fraction of the range added on both sides
+        :return: whether every input is in the envelope
+        """
+        widening = margin * (self.upper[mode] - self.lower[mode]) + 1e-9
+        return bool(np.all(inputs >= self.lower[mode] - widening) and np.all(inputs <= self.upper[mode] + widening))
+
+    def predict(self, mode, inputs):
+        """
+        Predicts the outputs of one sample.
+
+        :param mode: index of the mode
+        :param inputs: numpy float array of one sample
+        :return: numpy float array, in the order of :code:`output_names`
+        """
+        outputs = ((inputs - self.mean[mode]) / self.scale[mode]) @ self.coef[mode] + self.intercept[mode]
+        outputs[:len(self.tank_names)] += inputs[:len(self.tank_names)]
+        return outputs
+
+    def approximate(self, inputs, margin=0.0):
+        """
+        Predicts the outputs of one sample when the model covers it: its mode was trained, the
+        inputs are in the envelope and no tank is, or gets, empty or full.
+
+        :param inputs: numpy float array of one sample
+        :param margin: (Default value = 0.0) widening of the envelope, see :meth:`inside`
+        :return: numpy float array, in the order of :code:`output_names`, None when the model
+           does not cover the sample
+        """
+        mode = self.mode_index(inputs)
+        if mode is None or not self.inside(mode, inputs, margin) or self.at_level_limit(inputs[np.newaxis])[0]:
+            return None
+        outputs = self.predict(mode, inputs)
+        if self.at_level_limit(outputs[np.newaxis])[0]:
+            return None
+        return outputs
+
+    def save(self, path):
+        """
+        Writes the model to a numpy :code:`.npz` file.
+
+        :param path: path to the model file
+        """
+        with open(str(path), 'wb') as model_file:
+            np.savez(model_file, version=MODEL_VERSION, tank_names=self.tank_names,
+                     actuator_names=self.actuator_names, pattern_names=self.pattern_names,
+                     output_names=self.output_names, simulation_step=self.simulation_step,
+                     min_levels=self.min_levels, max_levels=self.max_levels,
+                     modes=self.modes, mean=self.mean, scale=self.scale, coef=self.coef,
+                     intercept=self.intercept, lower=self.lower, upper=self.upper)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a model written by :meth:`save`.
+
+        :param path: path to the model file
+        :return: the :class:`SurrogateModel`
+        :raise SurrogateError: when the file was written by another version
+        """
+        with np.load(str(path)) as arrays:
+            if int(arrays['version']) != MODEL_VERSION:
+                raise SurrogateError("Surrogate model {path} has version {version}, expected {expected}. "
+                                     "Train it again".format(path=path, version=int(arrays['version']),
+                                                             expected=MODEL_VERSION))
+            model = cls(arrays['tank_names'].tolist(), arrays['actuator_names'].tolist(),
+                        arrays['pattern_names'].tolist(), arrays['output_names'].tolist(),
+                        int(arrays['simulation_step']), arrays['min_levels'], arrays['max_levels'])
+            for name in ('modes', 'mean', 'scale', 'coef', 'intercept', 'lower', 'upper'):
+                setattr(model, name, arrays[name])
+        return model
+
+
+class SurrogateTrainer:
+    """
+    Trains a :class:`SurrogateModel` from the ground truth files of full simulations of a
+    network, and validates it on held out simulations.
+
+    A simulation is a ground truth file, with the demand patterns csv of its batch when it used
+    one. Two consecutive rows of a ground truth are a training sample: the tank levels of the
+    first row, whether the actuators are open in the second row, they were set during the step,
+    the pattern multipliers at the time of the first row and whether the actuators are open in
+    the first row are the inputs, the values of the second row the targets. The first step has
+    no previous statuses, those of the step itself are used, like the surrogate backend does.
+
+    :param inp_file: path to the EPANET inp file the simulations ran on
+    :param ridge: (Default value = 1e-3) regularization of the regressions
+    :param min_samples: (Default value = 10) samples a mode needs to be trained
+    :param margin: (Default value = 0.05) widening of the envelope in the validation
+    :param log_level: (Default value = 'info') level of the logger
+    """
+
+    def __init__(self, inp_file, ridge=1e-3, min_samples=10, margin=0.05, log_level='info'):
+        self.inp_file = str(inp_file)
+        self.ridge = ridge
+        self.min_samples = min_samples
+        self.margin = margin
+        self.logger = get_logger(log_level)
+
+        wn = wntr.network.WaterNetworkModel(self.inp_file)
+        self.wn = wn
+        self.tanks = list(wn.tank_name_list)
+        self.actuators = list(wn.pump_name_list) + list(wn.valve_name_list)
+        self.output_names = [tank + '_LEVEL' for tank in self.tanks] + \
+                            [junction + '_LEVEL' for junction in wn.junction_name_list] + \
+                            [link + '_FLOW' for link in self.actuators]
+        self.simulation_step = wn.options.time.hydraulic_timestep
+
+    def samples(self, ground_truth, demands=None):
+        """
+        Gets the training samples of one simulation.
+
+        :param ground_truth: pandas DataFrame of the ground truth
+        :param demands: (Default value = None) pandas DataFrame of the demand patterns of the
+           simulation
+        :return: tuple of the inputs and the targets, 2-D numpy float arrays
+        :raise SurrogateError: when the ground truth has no column for an element of the network
+        """
+        missing = [column for column in self.output_names + [link + '_STATUS' for link in self.actuators]
+                   if column not in ground_truth]
+        if missing:
+            raise SurrogateError("Ground truth has no column " + ", ".join(missing[:5]) +
+                                 (", ..." if len(missing) > 5 else "") + ". Was it written for this network?")
+
+        ground_truth = ground_truth.drop_duplicates('iteration', keep='last').sort_values('iteration')
+        patterns = PatternMultipliers(self.wn)
+        if demands is not None:
+            patterns.set_demand_patterns(demands)
+
+        levels = ground_truth[[tank + '_LEVEL' for tank in self.tanks]].to_numpy(dtype=np.float64)
+        statuses = (ground_truth[[link + '_STATUS' for link in self.actuators]].to_numpy() != 0).astype(np.float64)
+        multipliers = np.array([patterns.at(row * self.simulation_step) for row in range(len(ground_truth) - 1)])
+        multipliers = multipliers.reshape(len(ground_truth) - 1, len(patterns.names))
+
+        # The first step has no previous step, the statuses of the step itself are used
+        previous = np.vstack([statuses[1:2], statuses[1:-1]])
+        inputs = np.hstack([levels[:-1], statuses[1:], multipliers, previous])
+        targets = ground_truth[self.output_names].to_numpy(dtype=np.float64)[1:]
+        return inputs, targets
+
+    def new_model(self):
+        """Gets an untrained model of the network."""
+        tanks = [self.wn.get_node(tank) for tank in self.tanks]
+        return SurrogateModel(self.tanks, self.actuators, PatternMultipliers(self.wn).names, self.output_names,
+                              self.simulation_step, [tank.min_level for tank in tanks],
+                              [tank.max_level for tank in tanks])
+
+    def train(self, simulations):
+        """
+        Trains a model on the samples of all given simulations.
+
+        :param simulations: list of (ground truth, demands) tuples of DataFrames, demands may be None
+        :return: the trained :class:`SurrogateModel`
+        """
+        inputs, targets = zip(*[self.samples(ground_truth, demands) for ground_truth, demands in simulations])
+        model = self.new_model()
+        model.fit(np.vstack(inputs), np.vstack(targets), self.ridge, self.min_samples)
+        self.logger.info("Trained surrogate model on {samples} steps, {modes} combinations of actuator "
+                         "statuses".format(samples=sum(len(i) for i in inputs), modes=len(model.modes)))
+        return model
+
+    def validation_report(self, model, simulations):
+        """
+        Replays held out simulations with the model, like the surrogate backend does: from the
+        initial tank levels, every step is predicted from the predicted levels, with the actuator
+        statuses and demands of the simulation. A step outside of the envelope continues from the
+        levels of the ground truth, as the backend falls back to the solver.
+
+        :param model: the trained :class:`SurrogateModel`
+        :param simulations: list of (ground truth, demands) tuples of DataFrames, demands may be None
+        :return: tuple of a pandas DataFrame with the maximum absolute error and the root mean
+           square error of every output, over the predicted steps, and the fraction of the steps
+           that were predicted
+        """
+        n_tanks = len(model.tank_names)
+        errors = []
+        steps = 0
+        for ground_truth, demands in simulations:
+            inputs, targets = self.samples(ground_truth, demands)
+            steps += len(inputs)
+            levels = inputs[0, :n_tanks].copy()
+            for sample, target in zip(inputs, targets):
+                sample = sample.copy()
+                sample[:n_tanks] = levels
+                outputs = model.approximate(sample, self.margin)
+                if outputs is not None:
+                    errors.append(outputs - target)
+                    levels = outputs[:n_tanks]
+                else:
+                    levels = target[:n_tanks]
+
+        errors = np.abs(np.array(errors).reshape(-1, len(model.output_names)))
+        rows = []
+        for i, name in enumerate(model.output_names):
+            element, quantity = name.rsplit('_', 1)
+            quantity = {'LEVEL': 'level' if i < n_tanks else 'pressure', 'FLOW': 'flow'}[quantity]
+            column = errors[:, i]
+            rows.append({'element': element, 'quantity': quantity, 'samples': len(column),
+                         'max_abs_error': column.max() if len(column) else np.nan,
+                         'rmse': np.sqrt(np.mean(column ** 2)) if len(column) else np.nan})
+        coverage = len(errors) / steps if steps else 0.0
+        return pd.DataFrame(rows, columns=['element', 'quantity', 'samples', 'max_abs_error', 'rmse']), coverage
+
+
+def read_simulation(argument):
+    """
+    Reads a simulation given on the command line, :code:`ground_truth` or
+    :code:`ground_truth,demand_patterns.csv`.
+
+    :param argument: the command line argument
+    :return: tuple of the ground truth and the demands, None without a demand patterns file
+    """
+    ground_truth, _, demands = argument.partition(',')
+    return read_ground_truth(ground_truth), pd.read_csv(demands) if demands else None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Train a surrogate model of a network from the ground truth of full simulations')
+    parser.add_argument('--inp', required=True, help='EPANET inp file of the simulations')
+    parser.add_argument('--output', required=True, help='model file to write, a .npz file')
+    parser.add_argument('--holdout', type=int, default=1,
+                        help='amount of simulations, the last ones, held out for the validation report')
+    parser.add_argument('--ridge', type=float, default=1e-3, help='regularization of the regressions')
+    parser.add_argument('--min-samples', type=int, default=10,
+                        help='samples a combination of actuator statuses needs to be trained')
+    parser.add_argument('--envelope-margin', type=float, default=0.05,
+                        help='widening of the training envelope in the validation')
+    parser.add_argument('simulations', nargs='+', metavar='GROUND_TRUTH[,DEMANDS]',
+                        help='ground truth file of a simulation, with the demand patterns csv it used')
+    args = parser.parse_args()
+
+    if args.holdout < 0 or args.holdout >= len(args.simulations):
+        parser.error("--holdout must leave at least one simulation for training")
+
+    trainer = SurrogateTrainer(args.inp, args.ridge, args.min_samples, args.envelope_margin)
+    simulations = [read_simulation(argument) for argument in args.simulations]
+    split = len(simulations) - args.holdout
+
+    try:
+        model = trainer.train(simulations[:split])
+    except SurrogateError as exc:
+        parser.exit(1, str(exc) + "\n")
+
+    output = Path(args.output)
+    temporary_path = output.with_name(output.name + '.' + str(os.getpid()))
+    model.save(temporary_path)
+    os.replace(str(temporary_path), str(output))
+    trainer.logger.info("Surrogate model written to " + str(output))
+
+    if args.holdout:
+        report, coverage = trainer.validation_report(model, simulations[split:])
+        report_path = output.with_name(output.stem + '_validation.csv')
+        report.to_csv(str(report_path), index=False)
+        trainer.logger.info("{coverage:.0%} of the held out steps are inside the training envelope, largest "
+                            "error {error:.4f}. Report at {report}".format(
+                                coverage=coverage, error=report['max_abs_error'].max(), report=report_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import sys
+
+import numpy as np
+import wntr
+
+from dhalsim.hydraulics.backend import HydraulicBackend, get_backend_class
+from dhalsim.hydraulics.state import HydraulicState
+from dhalsim.hydraulics.surrogate import PatternMultipliers, SurrogateError, SurrogateModel
+
+
+class SurrogateBackend(HydraulicBackend):
+    """
+    Backend that predicts every iteration with a
+    :class:`~dhalsim.hydraulics.surrogate.SurrogateModel` trained on the ground truth of full
+    simulations, for approximate runs of large sweeps.
+
+    A real solver, the :code:`fallback` of the options, loads the network and solves the
+    iterations the model does not cover: tank levels or demand multipliers out of the trained
+    range, a combination of open and closed actuators the model was not trained on, or a tank
+    that is or gets empty or full. The solver is restarted from the predicted tank levels when it
+    takes over, and the model continues from the levels of the solver.
+
+    Every step ends an iteration. Junction pressures and flows are those of the model, the
+    statuses of the pumps and valves are whether they are set open.
+
+    :param inp_file: path to the EPANET inp file
+    :param logger: logger of the physical process
+    :param options: the :code:`surrogate` options of the configuration file: the :code:`model`
+       file, the :code:`fallback` simulator and the :code:`envelope_margin`
+    """
+
+    name = 'surrogate'
+
+    def __init__(self, inp_file, logger, options=None):
+        super(SurrogateBackend, self).__init__(inp_file, logger, options)
+        self.solver = get_backend_class(self.options.get('fallback', 'wntr'))(inp_file, logger)
+        self.supports_speed = self.solver.supports_speed
+        self.initial_iteration = self.solver.initial_iteration
+
+        self.wn = self.solver.wn
+        self.tank_list = self.solver.tank_list
+        self.junction_list = self.solver.junction_list
+        self.pump_list = self.solver.pump_list
+        self.valve_list = self.solver.valve_list
+        self.simulation_step = self.solver.simulation_step
+        self.duration = self.solver.duration
+
+        self.margin = self.options.get('envelope_margin', 0.05)
+        self.patterns = PatternMultipliers(wntr.network.WaterNetworkModel(self.inp_file))
+        try:
+            self.model = SurrogateModel.load(self.options['model'])
+            self.check_model()
+        except SurrogateError as exc:
+            self.logger.error(str(exc) + ', aborting')
+            sys.exit(1)
+
+        links = self.pump_list + self.valve_list
+        self.tank_order = np.array([self.tank_list.index(name) for name in self.model.tank_names])
+        outputs = {name: i for i, name in enumerate(self.model.output_names)}
+        # Positions of the outputs of the model for the tank, junction and link arrays of the state
+        self.tank_outputs = np.array([outputs[name + '_LEVEL'] for name in self.tank_list], dtype=np.int64)
+        self.junction_outputs = np.array([outputs[name + '_LEVEL'] for name in self.junction_list],
+                                         dtype=np.int64)
+        self.flow_outputs = np.array([outputs[name + '_FLOW'] for name in links], dtype=np.int64)
+
+        self.inputs = np.zeros(self.model.previous_slice.stop)
+        self.previous_inputs = np.array([links.index(name) for name in self.model.actuator_names], dtype=np.int64)
+        self.actuator_inputs = None
+        self.status_order = None
+        self.actuator_values = None
+
+        self.simulation_time = 0
+        self.solver_in_sync = True
+        self.predicted_steps = 0
+        self.solved_steps = 0
+
+    def check_model(self):
+        """
+        Checks that the model was trained on this network.
+
+        :raise SurrogateError: when the model has other tanks, actuators or patterns, misses an
+           output or has another hydraulic timestep
+        """
+        if sorted(self.model.tank_names) != sorted(self.tank_list) or \
+                sorted(self.model.actuator_names) != sorted(self.pump_list + self.valve_list):
+            raise SurrogateError("Surrogate model was trained on a network with other tanks, pumps or valves")
+        if self.model.pattern_names != self.patterns.names:
+            raise SurrogateError("Surrogate model was trained on a network with the patterns " +
+                                 ", ".join(self.model.pattern_names))
+
+        outputs = set(self.model.output_names)
+        missing = [name for name in [junction + '_LEVEL' for junction in self.junction_list] +
+                   [link + '_FLOW' for link in self.pump_list + self.valve_list] if name not in outputs]
+        if missing:
+            raise SurrogateError("Surrogate model has no output " + ", ".join(missing[:5]) +
+                                 (", ..." if len(missing) > 5 else ""))
+
+        if self.model.simulation_step != self.simulation_step:
+            raise SurrogateError("Surrogate model was trained with a hydraulic timestep of {model} s, the "
+                                 "network has {network} s".format(model=self.model.simulation_step,
+                                                                  network=self.simulation_step))
+
+    def initial_actuator_states(self):
+        """
+        Gets the initial state of the pumps and valves in the inp file.
+
+        :return: list of (name, open) tuples, pumps first, then valves
+        """
+        return self.solver.initial_actuator_states()
+
+    def prepare(self, demand_model):
+        """
+        Prepares the solver, which resolves the actuators, and creates the state arrays.
+
+        :param demand_model: :code:`pdd` for pressure driven demand, :code:`dd` for demand driven
+        """
+        self.solver.prepare(demand_model)
+        self.actuator_names = self.solver.actuator_names
+        self.actuator_values = self.solver.get_actuator_values()
+
+        # Position of every actuator input of the model, and of every link status, in actuator_names
+        self.actuator_inputs = np.array([self.actuator_names.index(name) for name in self.model.actuator_names],
+                                        dtype=np.int64)
+        self.status_order = np.array([self.actuator_names.index(name) for name in self.pump_list + self.valve_list],
+                                     dtype=np.int64)
+
+        # Filled by the predictions of the model or copied from the solver
+        self.state = HydraulicState(self.tank_list, self.junction_list, self.pump_list, self.valve_list)
+
+    def set_initial_levels(self, levels):
+        """
+        Sets the initial level of tanks.
+
+        :param levels: dictionary of tank names and levels
+        """
+        self.solver.set_initial_levels(levels)
+
+    def set_demand_patterns(self, demands):
+        """
+        Replaces the multipliers of the demand patterns in the solver and in the inputs of the model.
+
+        :param demands: pandas DataFrame with a column of multipliers for every pattern
+        """
+        self.solver.set_demand_patterns(demands)
+        self.patterns.set_demand_patterns(demands)
+
+    def get_actuator_values(self):
+        """
+        Gets the statuses that are applied to the actuators.
+
+        :return: numpy float array, in the order of :code:`actuator_names`
+        """
+        return self.actuator_values.copy()
+
+    def apply_actuators(self, values):
+        """
+        Keeps the statuses of the actuators for the next step, the solver only gets them when it
+        solves a step.
+
+        :param values: numpy float array, in the order of :code:`actuator_names`
+        """
+        self.actuator_values[:] = values
+
+    def start(self, iterations):
+        """
+        Starts the solver. After a restore, the solver starts at the beginning and is restarted
+        at the restored time before it solves a step, so it runs until the end of the simulation.
+
+        :param iterations: amount of iterations that will be simulated
+        """
+        self.solver.start(iterations + self.simulation_time // self.simulation_step)
+
+    def set_inputs(self):
+        """Fills the inputs of the model for the current state, actuators and time."""
+        self.inputs[:len(self.tank_list)] = self.state.tank_levels[self.tank_order]
+        self.inputs[self.model.actuator_slice] = self.actuator_values[self.actuator_inputs] != 0
+        self.inputs[self.model.pattern_slice] = self.patterns.at(self.simulation_time)
+        if self.simulation_time:
+            self.inputs[self.model.previous_slice] = self.state.statuses[self.previous_inputs] != 0
+        else:
+            self.inputs[self.model.previous_slice] = self.inputs[self.model.actuator_slice]
+
+    def step(self):
+        """
+        Predicts the next iteration with the model, or solves it with the solver when the inputs
+        are outside of the training envelope.
+
+        :return: True, every step ends an iteration
+        """
+        self.set_inputs()
+        outputs = self.model.approximate(self.inputs, self.margin)
+        if outputs is not None:
+            self.state.tank_levels[:] = outputs[self.tank_outputs]
+            self.state.junction_pressures[:] = outputs[self.junction_outputs]
+            self.state.flows[:] = outputs[self.flow_outputs]
+            self.state.statuses[:] = self.actuator_values[self.status_order] != 0
+            self.solver_in_sync = False
+            self.predicted_steps += 1
+        else:
+            self.logger.debug("Surrogate model does not cover the step at {time} s, solving it"
+                              .format(time=self.simulation_time))
+            if not self.solver_in_sync:
+                self.solver.restart(self.simulation_time, self.state.tank_levels.copy())
+            self.solver.apply_actuators(self.actuator_values)
+            while not self.solver.step():
+                pass
+            self.solver.read_state()
+            self.state.copy_from(self.solver.state)
+            self.solver_in_sync = True
+            self.solved_steps += 1
+
+        self.simulation_time += self.simulation_step
+        return True
+
+    def read_initial_state(self):
+        """Reads the initial state of the solver."""
+        self.solver.read_initial_state()
+        self.state.copy_from(self.solver.state)
+
+    def read_state(self):
+        """The state arrays are filled by :meth:`step`."""
+
+    def save_state(self):
+        """
+        Gets the tank levels, the actuators and the simulation time. The solver is restarted from
+        these values.
+
+        :return: dictionary with the saved values
+        """
+        return {
+            'simulation_time': self.simulation_time,
+            'tank_levels': self.state.tank_levels.copy(),
+            'actuator_values': self.actuator_values.copy(),
+        }
+
+    def restore_state(self, state):
+        """
+        Sets the saved tank levels, actuators and simulation time.
+
+        :param state: the saved state
+        """
+        self.simulation_time = state['simulation_time']
+        self.state.tank_levels[:] = state['tank_levels']
+        self.actuator_values[:] = state['actuator_values']
+        self.state.statuses[:] = self.actuator_values[self.status_order] != 0
+        self.solver_in_sync = False
+
+    def close(self):
+        """Closes the solver and logs how many iterations the model predicted."""
+        self.logger.info("Surrogate model predicted {predicted} iterations, {solved} were solved by {solver}"
+                         .format(predicted=self.predicted_steps, solved=self.solved_steps,
+                                 solver=self.solver.name))
+        self.solver.close()
@@ -0,0 +1,236 @@
+import numpy as np
+import wntr
+import wntr.network.controls as controls
+
+from dhalsim.hydraulics.backend import HydraulicBackend
+from dhalsim.wntr_state import WntrState
+
+
+class WntrBackend(HydraulicBackend):
+    """
+    Backend of the WNTR simulator. Every actuator gets a WNTR control with a condition that is
+    always true, whose action sets the status read from the PLCs. Only the controls of actuators
+    whose status changed are updated. The state is read with
+    :class:`~dhalsim.wntr_state.WntrState`.
+
+    WNTR cannot set pump speeds from the PLCs, and it registers the initial state one iteration
+    before the first step.
+
+    :param inp_file: path to the EPANET inp file
+    :param logger: logger of the physical process
+    :param options: (Default value = None) the options of the simulator in the configuration file
+    """
+
+    name = 'wntr'
+    initial_iteration = -1
+
+    def __init__(self, inp_file, logger, options=None):
+        super(WntrBackend, self).__init__(inp_file, logger, options)
+        self.wn = wntr.network.WaterNetworkModel(self.inp_file)
+
+        node_list = list(self.wn.node_name_list)
+        link_list = list(self.wn.link_name_list)
+
+        self.tank_list = self.get_node_list_by_type(node_list, 'Tank')
+        self.junction_list = self.get_node_list_by_type(node_list, 'Junction')
+        self.pump_list = self.get_link_list_by_type(link_list, 'Pump')
+        self.valve_list = self.get_link_list_by_type(link_list, 'Valve')
+
+        self.simulation_step = self.wn.options.time.hydraulic_timestep
+        self.duration = self.wn.options.time.duration
+        self.pattern_start = self.wn.options.time.pattern_start
+
+        self.control_list = []
+        self.applied_status = None
+        self.sim = None
+
+    def get_node_list_by_type(self, a_list, a_type):
+        result = []
+        for node in a_list:
+            if self.wn.get_node(node).node_type == a_type:
+                result.append(str(node))
+        return result
+
+    def get_link_list_by_type(self, a_list, a_type):
+        result = []
+        for link in a_list:
+            if self.wn.get_link(link).link_type == a_type:
+                result.append(str(link))
+        return result
+
+    def initial_actuator_states(self):
+        """
+        Gets the initial state of the pumps and valves in the inp file.
+
+        :return: list of (name, open) tuples, pumps first, then valves
+        """
+        return [(name, self.wn.get_link(name).status.value != 0) for name in self.pump_list + self.valve_list]
+
+    def prepare(self, demand_model):
+        """
+        Adds a control to every valve and pump, with the status of the inp file, and creates the
+        state reader.
+
+        :param demand_model: :code:`pdd` for pressure driven demand, :code:`dd` for demand driven
+        """
+        dummy_condition = self.dummy_condition()
+
+        self.control_list = []
+        for valve in self.valve_list:
+            self.control_list.append(self.create_control_dict(valve, dummy_condition))
+
+        for pump in self.pump_list:
+            self.control_list.append(self.create_control_dict(pump, dummy_condition))
+
+        for control in self.control_list:
+            self.add_control(control)
+
+        if demand_model == 'pdd':
+            self.wn.options.hydraulic.demand_model = 'PDD'
+
+        self.actuator_names = [control['name'] for control in self.control_list]
+        # Last status applied to every WNTR control
+        self.applied_status = np.array([control['value'] for control in self.control_list], dtype=np.int64)
+
+        # Element objects and indices are resolved once, every step the whole state is read at once
+        self.state = WntrState(self.wn, self.tank_list, self.junction_list, self.pump_list, self.valve_list)
+
+    def dummy_condition(self):
+        """Gets a condition that is always true, for the controls of the actuators."""
+        return controls.ValueCondition(self.wn.get_node(self.tank_list[0]), 'level', '>=', -1)
+
+    def create_control_dict(self, actuator, dummy_condition):
+        act_dict = dict.fromkeys(['actuator', 'parameter', 'value', 'condition', 'name', 'action'])
+        act_dict['actuator'] = self.wn.get_link(actuator)
+        act_dict['parameter'] = 'status'
+        act_dict['condition'] = dummy_condition
+        act_dict['name'] = actuator
+        if type(self.wn.get_link(actuator).status) is int:
+            act_dict['value'] = act_dict['actuator'].status
+        else:
+            act_dict['value'] = act_dict['actuator'].status.value
+        return act_dict
+
+    def add_control(self, control):
+        """Adds the WNTR control of an actuator, keeping its action in the control dictionary."""
+        control['action'] = controls.ControlAction(control['actuator'], control['parameter'],
+                                                   control['value'])
+        a_control = controls.Control(control['condition'], control['action'], name=control['name'])
+        self.wn.add_control(control['name'], a_control)
+
+    def set_initial_levels(self, levels):
+        """
+        Sets the initial level of tanks.
+
+        :param levels: dictionary of tank names and levels
+        """
+        for tank, level in levels.items():
+            self.wn.get_node(tank).init_level = level
+
+    def set_demand_patterns(self, demands):
+        """
+        Replaces the multipliers of the demand patterns that have a column in the demands.
+
+        :param demands: pandas DataFrame with a column of multipliers for every pattern
+        """
+        for name, pat in self.wn.patterns():
+            if name in demands:
+                self.logger.debug("Setting demands for " + name)
+                pat.multipliers = demands[name].values.tolist()
+            else:
+                self.logger.debug("Consumer " + name + " has no demands defined, using default...")
+
+    def get_actuator_values(self):
+        """
+        Gets the statuses that are applied to the actuators.
+
+        :return: numpy float array, in the order of :code:`actuator_names`
+        """
+        return self.applied_status.astype(np.float64)
+
+    def apply_actuators(self, values):
+        """
+        Updates the controls in WNTR of the actuators whose status changed since the last
+        iteration, by replacing them with a control that sets the new status. WNTR has no public
+        way to change the value of a control action. The controls of the other actuators are
+        left untouched.
+
+        :param values: numpy float array, in the order of :code:`actuator_names`
+        """
+        new_status = values.astype(np.int64)
+        changed = np.flatnonzero(new_status != self.applied_status)
+
+        for i in changed:
+            control = self.control_list[i]
+            control['value'] = int(new_status[i])
+            self.wn.remove_control(control['name'])
+            self.add_control(control)
+
+        self.applied_status[changed] = new_status[changed]
+
+    def start(self, iterations):
+        """
+        Creates the WNTR simulator. Every call of :meth:`step` runs one hydraulic timestep.
+
+        :param iterations: amount of iterations that will be simulated
+        """
+        self.wn.options.time.duration = self.wn.options.time.hydraulic_timestep
+        self.sim = wntr.sim.WNTRSimulator(self.wn)
+
+    def step(self):
+        """
+        Runs one hydraulic timestep.
+
+        :return: True, every step ends an iteration
+        """
+        self.sim.run_sim(convergence_error=True)
+        return True
+
+    def restart(self, simulation_time, tank_levels):
+        """
+        Resets the water network model to the given tank levels and creates a new WNTR simulator,
+        whose demand patterns start at the given simulation time. The controls of the actuators
+        keep their statuses.
+
+        :param simulation_time: seconds since the start of the simulation
+        :param tank_levels: numpy float array, in the order of :code:`tank_list`
+        """
+        self.set_initial_levels(dict(zip(self.tank_list, tank_levels.tolist())))
+        self.wn.reset_initial_values()
+        self.wn.options.time.pattern_start = self.pattern_start + int(simulation_time)
+        self.sim = wntr.sim.WNTRSimulator(self.wn)
+
+    def read_initial_state(self):
+        """Reads the initial state. Junction pressures are not computed before the first step."""
+        self.state.update()
+        # toDo: Check in wntr 0.4.2 a new way of getting the initial junction pressure
+        self.state.junction_pressures[:] = 0
+
+    def save_state(self):
+        """
+        Gets the whole water network model, including the solver state and the pattern
+        positions, and the applied statuses.
+
+        :return: dictionary with the model and the statuses
+        """
+        return {'wn': self.wn, 'applied_status': self.applied_status.copy()}
+
+    def restore_state(self, state):
+        """
+        Continues from a saved water network model. The controls of the saved model act on its
+        own links, so they are created again with the saved statuses.
+
+        :param state: the saved state
+        """
+        self.wn = state['wn']
+
+        dummy_condition = self.dummy_condition()
+        for control, status in zip(self.control_list, state['applied_status'].tolist()):
+            control['actuator'] = self.wn.get_link(control['name'])
+            control['condition'] = dummy_condition
+            control['value'] = status
+            self.wn.remove_control(control['name'])
+            self.add_control(control)
+
+        self.applied_status[:] = state['applied_status']
+        self.state = WntrState(self.wn, self.tank_list, self.junction_list, self.pump_list, self.valve_list)
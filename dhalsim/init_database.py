@@ -3,6 +3,7 @@ import os
 import sqlite3
 from pathlib import Path
 from dhalsim.py3_logger import get_logger
+from dhalsim.tag_table import TagTable
 import yaml
 import pandas as pd
 
@@ -18,10 +19,54 @@ class DatabaseInitializer:
         self.db_path.touch(exist_ok=True)
         self.logger.info("Initializing database.")
 
+    def get_plant_rows(self):
+        """
+        Gets the initial rows of the plant table: the state of the actuators and the value of the
+        sensors of all PLCs.
+
+        :return: list of (name, value) tuples
+        """
+        rows = []
+
+        if "actuators" in self.data:
+            for actuator in self.data["actuators"]:
+                initial_state = "0" if actuator["initial_state"].lower() == "closed" else "1"
+                rows.append((actuator["name"], initial_state))
+
+        # Initialize sensors, we should read EPANET file
+        if "plcs" in self.data:
+            for plc in self.data["plcs"]:
+                for sensor in plc["sensors"]:
+                    if sensor in self.data["initial_tank_values"]:
+                        # We only initialize tank levels
+                        rows.append((sensor, self.data["initial_tank_values"][sensor]))
+                    else:
+                        rows.append((sensor, 0))
+
+        return rows
+
+    def write_tag_table(self):
+        """
+        Creates the memory mapped tag table with the same tags and initial values as the plant table.
+        The position of every tag in the table is fixed here, and read by every process that opens it.
+        """
+        tags = {}
+        for name, value in self.get_plant_rows():
+            tags.setdefault(name, float(value))
+
+        TagTable.create(self.data["tag_table_path"], list(tags), list(tags.values()))
+        self.logger.debug("Created tag table with {n} tags.".format(n=len(tags)))
+
     def write(self):
+        if self.data.get("tag_backend", "sqlite") == "mmap":
+            self.write_tag_table()
+
         with sqlite3.connect(self.db_path) as conn:
             cur = conn.cursor()
 
+            # WAL journaling is stored in the database file, so every connection of the experiment uses it
+            cur.execute("PRAGMA journal_mode=WAL")
+
             cur.execute("""CREATE TABLE plant
                 (
                     name  TEXT    NOT NULL,
@@ -31,22 +76,9 @@ class DatabaseInitializer:
                 );""")
 
 
-            # Initialize actuators state in DB
-            if "actuators" in self.data:
-                for actuator in self.data["actuators"]:
-                    initial_state = "0" if actuator["initial_state"].lower() == "closed" else "1"
-                    cur.execute("INSERT INTO plant VALUES (?, 1, ?);",
-                                (actuator["name"], initial_state,))
-
-            # Initialize sensors in DB, we should read EPANET file
-            if "plcs" in self.data:
-                for plc in self.data["plcs"]:
-                    for sensor in plc["sensors"]:
-                        if sensor in self.data["initial_tank_values"]:
-                            # We only initialize tank levels into the SQlite3 DB
-                            cur.execute("INSERT INTO plant VALUES (?, 1, ?);", (sensor,self.data["initial_tank_values"][sensor]))
-                        else:
-                            cur.execute("INSERT INTO plant VALUES (?, 1, 0);", (sensor,))
+            # Initialize actuators and sensors state in DB
+            for name, value in self.get_plant_rows():
+                cur.execute("INSERT INTO plant VALUES (?, 1, ?);", (name, value,))
 
             # Creates master_time table if it does not yet exist
             cur.execute("CREATE TABLE master_time (id INTEGER PRIMARY KEY, time INTEGER)")
@@ -1,10 +1,9 @@
 import yaml
-import sqlite3
 import sys
 import signal
-import time
-import random
 
+from dhalsim.barrier import get_barrier_client
+from dhalsim.db_client import get_database_client
 from dhalsim.py3_logger import get_logger
 from pathlib import Path
 from netfilterqueue import NetfilterQueue
@@ -14,10 +13,6 @@ class Error(Exception):
     """Base class for exceptions in this module."""
 
 
-class DatabaseError(Error):
-    """Raised when not being able to connect to the database"""
-
-
 class PacketQueue(metaclass=ABCMeta):
     """
     Currently, the Netfilterqueue library in Python3 does not support running in threads, using blocking calls.
@@ -43,7 +38,8 @@ class PacketQueue(metaclass=ABCMeta):
 
         # Get the attack that we are from the intermediate YAML
         self.intermediate_attack = self.intermediate_yaml["network_attacks"][self.yaml_index]
-        self.db_sleep_time = random.uniform(0.01, 0.1)
+
+        self.barrier = get_barrier_client(self.intermediate_yaml, self.intermediate_attack["name"])
 
     def main_loop(self):
         self.logger.debug('Parent NF Class launched')
@@ -59,10 +55,8 @@ class PacketQueue(metaclass=ABCMeta):
 
     def db_query(self, query, write=False, parameters=None):
         """
-        Execute a query on the database
-        On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
-        Before it reties, it will sleep for :code:`DB_SLEEP_TIME` seconds.
-        This is necessary because of the limited concurrency in SQLite.
+        Execute a query on the database through the :class:`~dhalsim.db_client.DatabaseClient` of
+        this attack. On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
 
         :param query: The SQL query to execute in the db
         :type query: str
@@ -74,28 +68,8 @@ class PacketQueue(metaclass=ABCMeta):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
-        for i in range(self.DB_TRIES):
-            try:
-                with sqlite3.connect(self.intermediate_yaml["db_path"]) as conn:
-                    cur = conn.cursor()
-                    if parameters:
-                        cur.execute(query, parameters)
-                    else:
-                        cur.execute(query)
-                    conn.commit()
-
-                    if not write:
-                        return cur.fetchone()[0]
-                    else:
-                        return
-            except sqlite3.OperationalError as exc:
-                self.logger.info(
-                    "Failed to connect to db with exception {exc}. Trying {i} more times.".format(
-                        exc=exc, i=self.DB_TRIES - i - 1))
-                time.sleep(self.db_sleep_time)
-        self.logger.error(
-            "Failed to connect to db. Tried {i} times.".format(i=self.DB_TRIES))
-        raise DatabaseError("Failed to get master clock from database")
+        db = get_database_client(self.intermediate_yaml['db_path'], self.logger, self.DB_TRIES)
+        return db.db_query(query, write, parameters)
 
     def get_master_clock(self):
         """
@@ -1,25 +1,22 @@
-import random
 import signal
-import sqlite3
 import subprocess
 import sys
-import time
 from abc import ABCMeta, abstractmethod
 from pathlib import Path
 
 import yaml
 
+from dhalsim.barrier import BarrierError, get_barrier_client
+# DatabaseError is re-exported on purpose: the queries of this module raise it, and callers import it from here
+from dhalsim.db_client import DatabaseError, get_database_client  # noqa: F401
 from dhalsim.py3_logger import get_logger
+from dhalsim.tag_directory import get_tag_directory
 
 
 class Error(Exception):
     """Base class for exceptions in this module."""
 
 
-class DatabaseError(Error):
-    """Raised when not being able to connect to the database"""
-
-
 class SyncedAttack(metaclass=ABCMeta):
     """
     This class can be used to make an attack script.
@@ -67,6 +64,9 @@ class SyncedAttack(metaclass=ABCMeta):
         if self.intermediate_attack['target'].lower() == 'scada':
             self.intermediate_plc = self.intermediate_yaml['scada']
 
+        # Owners of the tags of all PLCs, to receive tags from
+        self.tag_directory = get_tag_directory(self.intermediate_yaml)
+
         self.attacker_ip = self.intermediate_attack['local_ip']
         self.target_plc_ip = self.intermediate_plc['local_ip']
 
@@ -77,9 +77,9 @@ class SyncedAttack(metaclass=ABCMeta):
             self.direction = 'source'
 
         self.state = 0
-        self.db_sleep_time = random.uniform(0.01, 0.1)
 
         self.sync = sync
+        self.barrier = get_barrier_client(self.intermediate_yaml, self.intermediate_attack["name"])
 
     def sigint_handler(self, sig, frame):
         """Interrupt handler for attacker being stoped"""
@@ -98,18 +98,10 @@ class SyncedAttack(metaclass=ABCMeta):
         :param tag: The tag we want to receive
         :return: The value of the tag
         """
-        target_plc = None
-
-        for plc in self.intermediate_yaml['plcs']:
-            if tag in plc['actuators'] + plc['sensors']:
-                target_plc = plc
-                break
+        address = self.tag_directory.address(tag, self.intermediate_plc.get('name'))
 
         cmd = ['/usr/bin/python3', '-m', 'cpppo.server.enip.client', '--print', '--address']
-        if target_plc['name'] == self.intermediate_plc['name']:
-            cmd.append(str(target_plc['local_ip']) + ":44818")
-        else:
-            cmd.append(str(target_plc['public_ip']) + ":44818")
+        cmd.append(str(address) + ":44818")
         cmd.append(f"{tag}:1")
 
         try:
@@ -192,10 +184,8 @@ class SyncedAttack(metaclass=ABCMeta):
 
     def db_query(self, query, write=False, parameters=None):
         """
-        Execute a query on the database
-        On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
-        Before it reties, it will sleep for :code:`DB_SLEEP_TIME` seconds.
-        This is necessary because of the limited concurrency in SQLite.
+        Execute a query on the database through the :class:`~dhalsim.db_client.DatabaseClient` of
+        this attack. On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
 
         :param query: The SQL query to execute in the db
         :type query: str
@@ -207,28 +197,8 @@ class SyncedAttack(metaclass=ABCMeta):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
-        for i in range(self.DB_TRIES):
-            try:
-                with sqlite3.connect(self.intermediate_yaml["db_path"]) as conn:
-                    cur = conn.cursor()
-                    if parameters:
-                        cur.execute(query, parameters)
-                    else:
-                        cur.execute(query)
-                    conn.commit()
-
-                    if not write:
-                        return cur.fetchone()[0]
-                    else:
-                        return
-            except sqlite3.OperationalError as exc:
-                self.logger.info(
-                    "Failed to connect to db with exception {exc}. Trying {i} more times.".format(
-                        exc=exc, i=self.DB_TRIES - i - 1))
-                time.sleep(self.db_sleep_time)
-        self.logger.error(
-            "Failed to connect to db. Tried {i} times.".format(i=self.DB_TRIES))
-        raise DatabaseError("Failed to get master clock from database")
+        db = get_database_client(self.intermediate_yaml['db_path'], self.logger, self.DB_TRIES)
+        return db.db_query(query, write, parameters)
 
     def get_master_clock(self):
         """
@@ -255,6 +225,8 @@ class SyncedAttack(metaclass=ABCMeta):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
+        if self.barrier:
+            return self.barrier.get() == flag
         res = self.db_query("SELECT flag FROM sync WHERE name IS ?", False, (self.intermediate_attack["name"],))
         return res == flag
 
@@ -271,8 +243,29 @@ class SyncedAttack(metaclass=ABCMeta):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
+        if self.barrier:
+            self.barrier.set(flag)
+            return
         self.db_query("UPDATE sync SET flag=? WHERE name IS ?", True, (int(flag), self.intermediate_attack["name"],))
 
+    def wait_sync(self, flag):
+        """
+        Wait until the sync flag of this attack equals flag. With the socket barrier this blocks
+        until the physical process releases the phase, otherwise the sync table is polled.
+        When the physical process closes the barrier, this waits for the attack to be shut down.
+
+        :param flag: flag to wait for
+        """
+        if self.barrier:
+            try:
+                self.barrier.wait(flag)
+            except BarrierError:
+                self.logger.debug("Barrier closed, waiting for shutdown.")
+                signal.pause()
+            return
+        while not self.get_sync(flag):
+            pass
+
     def set_attack_flag(self, flag):
         """
         Set a flag in the attack table. When it is 1, we know that the attack with the
@@ -289,8 +282,7 @@ class SyncedAttack(metaclass=ABCMeta):
         while True:
             # flag = 0 means a physical process finished a new iteration
             if self.sync:
-                while not self.get_sync(0):
-                    pass
+                self.wait_sync(0)
 
             # Modified for the Alessandro's concealment to work properly.
             if start_now and int(self.get_master_clock()) > 10:
@@ -322,8 +314,7 @@ class SyncedAttack(metaclass=ABCMeta):
             self.attack_step()
 
             if self.sync:
-                while not self.get_sync(2):
-                    pass
+                self.wait_sync(2)
 
                 self.set_sync(3)
 
@@ -1,3 +1,4 @@
+from dhalsim.barrier import BarrierError
 from dhalsim.network_attacks.mitm_netfilter_queue_subprocess import PacketQueue
 import argparse
 from pathlib import Path
@@ -12,6 +13,7 @@ from scapy.layers.inet import IP, TCP
 from scapy.packet import Raw
 
 from dhalsim.network_attacks.utilities import translate_payload_to_float, translate_float_to_payload
+from dhalsim.tag_directory import get_tag_directory
 
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
 from tensorflow.keras.layers import *
@@ -117,16 +119,24 @@ class UnconstrainedBlackBoxMiTMNetfilterQueue(PacketQueue):
         self.interrupt()
 
     def handle_sync(self):
+        try:
+            self.sync_loop()
+        except BarrierError:
+            self.logger.debug('Barrier closed')
+
+        self.logger.debug('Netfilter sync thread while finished')
+
+    def sync_loop(self):
         while self.sync_flag:
             # flag = 0 means a physical process finished a new iteration
-            while (not self.get_sync(0)) and self.sync_flag:
+            while (not self.wait_sync(0, self.FLAG_SYNC_UPDATE_TIME)) and self.sync_flag:
                 pass
 
             # We have to keep the same state machine as PLCs
             self.set_sync(1)
 
             # 2 is when the PLCs exchange locally their information
-            while not self.get_sync(2):
+            while not self.wait_sync(2, self.FLAG_SYNC_UPDATE_TIME):
                 pass
 
             # This is the space to handle the concealment finite state machine
@@ -169,8 +179,6 @@ class UnconstrainedBlackBoxMiTMNetfilterQueue(PacketQueue):
             # self.logger.debug('Setting attack sync in 3')
             self.set_sync(3)
 
-        self.logger.debug('Netfilter sync thread while finished')
-
     def handle_concealment(self, session, ip_payload):
         if self.ok_to_conceal: 
             if self.predicted_for_iteration == True:
@@ -212,21 +220,11 @@ class UnconstrainedBlackBoxMiTMNetfilterQueue(PacketQueue):
         return df
 
     def get_scada_tags(self):
-        aux_scada_tags = []
-        for PLC in self.intermediate_yaml['plcs']:
-
-            # We were having ordering issues by adding it as a set. Probably could be done in a more pythonic way
-            if 'sensors' in PLC:
-                    for sensor in PLC['sensors']:
-                        if sensor not in aux_scada_tags:
-                            aux_scada_tags.append(sensor)
-                            
-            if 'actuators' in PLC:
-                    for actuator in PLC['actuators']:
-                        if actuator not in aux_scada_tags:
-                            aux_scada_tags.append(actuator)
-
-        return aux_scada_tags
+        """
+        Gets the tags of all PLCs, in the order of the PLCs and their sensors and actuators.
+        :return: list of tags, without duplicates
+        """
+        return list(get_tag_directory(self.intermediate_yaml).names)
 
     # Delivers a pandas dataframe with ALL SCADA tags
     def predict_concealment_values(self):
@@ -346,6 +344,8 @@ class UnconstrainedBlackBoxMiTMNetfilterQueue(PacketQueue):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
+        if self.barrier:
+            return self.barrier.get() == flag
         res = self.db_query("SELECT flag FROM sync WHERE name IS ?", False, (self.intermediate_attack["name"],))
         return res == flag
 
@@ -362,8 +362,25 @@ class UnconstrainedBlackBoxMiTMNetfilterQueue(PacketQueue):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
+        if self.barrier:
+            self.barrier.set(flag)
+            return
         self.db_query("UPDATE sync SET flag=? WHERE name IS ?", True, (int(flag), self.intermediate_attack["name"],))
 
+    def wait_sync(self, flag, timeout):
+        """
+        Wait at most timeout seconds for the sync flag of this attack to equal flag. Without the
+        socket barrier the sync table is checked once.
+
+        :param flag: flag to wait for
+        :param timeout: maximum time in seconds to wait on the barrier
+
+        :return: True if the sync flag equals flag, False otherwise
+        """
+        if self.barrier:
+            return self.barrier.wait(flag, timeout)
+        return self.get_sync(flag)
+
     def set_attack_flag(self, flag):
         """
         Set a flag in the attack table. When it is 1, we know that the attack with the
@@ -1,14 +1,13 @@
-import random
 import signal
-import sqlite3
 import subprocess
 import sys
-import time
 from abc import ABCMeta, abstractmethod
 from pathlib import Path
 
 import yaml
 
+from dhalsim.barrier import BarrierError, get_barrier_client
+from dhalsim.db_client import get_database_client
 from dhalsim.py3_logger import get_logger
 
 
@@ -16,10 +15,6 @@ class Error(Exception):
     """Base class for exceptions in this module."""
 
 
-class DatabaseError(Error):
-    """Raised when not being able to connect to the database"""
-
-
 class UnsupportedTrigger(Error):
     """ Raised when a trigger othen that time is used with a network event"""
 
@@ -63,7 +58,8 @@ class SyncedEvent(metaclass=ABCMeta):
         self.intermediate_event = self.intermediate_yaml["network_events"][self.yaml_index]
 
         self.state = 0
-        self.db_sleep_time = random.uniform(0.01, 0.1)
+
+        self.barrier = get_barrier_client(self.intermediate_yaml, self.intermediate_event["name"])
 
     def main_loop(self):
         """
@@ -73,8 +69,7 @@ class SyncedEvent(metaclass=ABCMeta):
             self.logger.debug("Waiting for sync in 0")
 
             # flag = 0 means a physical process finished a new iteration
-            while not self.get_sync(0):
-                pass
+            self.wait_sync(0)
 
             run = self.check_trigger()
             self.set_event_flag(run)
@@ -91,8 +86,7 @@ class SyncedEvent(metaclass=ABCMeta):
 
             self.event_step()
 
-            while not self.get_sync(2):
-                pass
+            self.wait_sync(2)
 
             self.set_sync(3)
             self.logger.debug("Setting sync in 3")
@@ -105,10 +99,8 @@ class SyncedEvent(metaclass=ABCMeta):
 
     def db_query(self, query, write=False, parameters=None):
         """
-        Execute a query on the database
-        On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
-        Before it retries, it will sleep for :code:`DB_SLEEP_TIME` seconds.
-        This is necessary because of the limited concurrency in SQLite.
+        Execute a query on the database through the :class:`~dhalsim.db_client.DatabaseClient` of
+        this event. On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
 
         :param query: The SQL query to execute in the db
         :type query: str
@@ -120,28 +112,8 @@ class SyncedEvent(metaclass=ABCMeta):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
-        for i in range(self.DB_TRIES):
-            try:
-                with sqlite3.connect(self.intermediate_yaml["db_path"]) as conn:
-                    cur = conn.cursor()
-                    if parameters:
-                        cur.execute(query, parameters)
-                    else:
-                        cur.execute(query)
-                    conn.commit()
-
-                    if not write:
-                        return cur.fetchone()[0]
-                    else:
-                        return
-            except sqlite3.OperationalError as exc:
-                self.logger.info(
-                    "Failed to connect to db with exception {exc}. Trying {i} more times.".format(
-                        exc=exc, i=self.DB_TRIES - i - 1))
-                time.sleep(self.db_sleep_time)
-        self.logger.error(
-            "Failed to connect to db. Tried {i} times.".format(i=self.DB_TRIES))
-        raise DatabaseError("Failed to get master clock from database")
+        db = get_database_client(self.intermediate_yaml['db_path'], self.logger, self.DB_TRIES)
+        return db.db_query(query, write, parameters)
 
     def get_master_clock(self):
         """
@@ -192,6 +164,8 @@ class SyncedEvent(metaclass=ABCMeta):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
+        if self.barrier:
+            return self.barrier.get() == flag
         res = self.db_query("SELECT flag FROM sync WHERE name IS ?", False,  (self.intermediate_event["name"],))
         return res == flag
 
@@ -208,8 +182,29 @@ class SyncedEvent(metaclass=ABCMeta):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
+        if self.barrier:
+            self.barrier.set(flag)
+            return
         self.db_query("UPDATE sync SET flag=? WHERE name IS ?", True, (int(flag), self.intermediate_event["name"],))
 
+    def wait_sync(self, flag):
+        """
+        Wait until the sync flag of this event equals flag. With the socket barrier this blocks
+        until the physical process releases the phase, otherwise the sync table is polled.
+        When the physical process closes the barrier, this waits for the event to be shut down.
+
+        :param flag: flag to wait for
+        """
+        if self.barrier:
+            try:
+                self.barrier.wait(flag)
+            except BarrierError:
+                self.logger.debug("Barrier closed, waiting for shutdown.")
+                signal.pause()
+            return
+        while not self.get_sync(flag):
+            pass
+
     def set_event_flag(self, flag):
         """
         Set a flag in the event table. When it is 1, we know that the event with the
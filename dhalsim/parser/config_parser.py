@@ -10,6 +10,8 @@ import yaml_include
 from schema import Schema, Or, And, Use, Optional, SchemaError, Regex
 
 from dhalsim.parser.input_parser import InputParser
+from dhalsim.parser.skeletonizer import Skeletonizer
+from dhalsim.tag_directory import get_tag_directory
 
 
 class Error(Exception):
@@ -523,6 +525,15 @@ class SchemaParser:
                         Schema(lambda l: Path.is_file, error="'network_delay_data' could not be found."),
                         Schema(lambda f: f.suffix == '.csv',
                                error="Suffix of network_delay_data should be .csv")),
+                    Optional('surrogate'): {
+                        'model': And(
+                            Use(Path),
+                            Use(lambda p: config_path.absolute().parent / p),
+                            Schema(Path.is_file, error="'surrogate' 'model' could not be found."),
+                            Schema(lambda f: f.suffix == '.npz',
+                                   error="Suffix of the surrogate model should be .npz")),
+                        str: object
+                    },
                     str: object
                 }
             )
@@ -605,7 +616,71 @@ class SchemaParser:
             Optional('simulator', default='wntr'): And(
                 str,
                 Use(str.lower),
-                Or('wntr', 'epynet')),
+                Or('wntr', 'epynet', 'epanet', 'surrogate')),
+            Optional('db_on_tmpfs', default=False): bool,
+            Optional('tag_backend', default='sqlite'): And(
+                str,
+                Use(str.lower),
+                Or('sqlite', 'mmap'), error="'tag_backend' should be one of the following: "
+                                            "'sqlite' or 'mmap'."),
+            Optional('ground_truth_format', default='csv'): And(
+                str,
+                Use(str.lower),
+                Or('csv', 'parquet', 'arrow'), error="'ground_truth_format' should be one of the "
+                                                     "following: 'csv', 'parquet' or 'arrow'."),
+            Optional('ground_truth_compression'): And(
+                str,
+                Use(str.lower),
+                Or('gzip', 'snappy', 'zstd', 'lz4', 'brotli'),
+                error="'ground_truth_compression' should be one of the following: 'gzip', "
+                      "'snappy', 'zstd', 'lz4' or 'brotli'."),
+            Optional('ground_truth_flush_interval'): And(
+                int,
+                Schema(lambda i: i > 0, error="'ground_truth_flush_interval' must be positive.")),
+            Optional('sync_mode', default='socket'): And(
+                str,
+                Use(str.lower),
+                Or('socket', 'database'), error="'sync_mode' should be one of the following: "
+                                                "'socket' or 'database'."),
+            Optional('checkpoint_interval'): And(
+                int,
+                Schema(lambda i: i > 0, error="'checkpoint_interval' must be positive.")),
+            Optional('cache_staleness'): And(
+                int,
+                Schema(lambda i: i >= 0, error="'cache_staleness' must be 0 or positive.")),
+            Optional('cache_deadline'): And(
+                Use(float),
+                Schema(lambda i: i > 0, error="'cache_deadline' must be positive.")),
+            Optional('profile_phases', default=False): bool,
+            Optional('lookahead'): {
+                Optional('max_steps', default=10): And(
+                    int,
+                    Schema(lambda i: i > 0, error="'max_steps' must be positive.")),
+                Optional('rates', default={}): {
+                    str: And(
+                        Use(float),
+                        Schema(lambda r: r >= 0, error="'rates' must be 0 or positive.")),
+                },
+            },
+            Optional('skeletonize'): {
+                'pipe_diameter': And(
+                    Use(float),
+                    Schema(lambda d: d > 0, error="'pipe_diameter' must be positive.")),
+                Optional('calibration_iterations', default=24): And(
+                    int,
+                    Schema(lambda i: i > 0, error="'calibration_iterations' must be positive.")),
+            },
+            Optional('surrogate'): {
+                'model': Path,
+                Optional('fallback', default='wntr'): And(
+                    str,
+                    Use(str.lower),
+                    Or('wntr', 'epanet'), error="'fallback' should be one of the following: 'wntr' or "
+                                                "'epanet'."),
+                Optional('envelope_margin', default=0.05): And(
+                    Use(float),
+                    Schema(lambda m: m >= 0, error="'envelope_margin' must be 0 or positive.")),
+            },
         })
 
         return config_schema.validate(data)
@@ -619,10 +694,17 @@ class ConfigParser:
     :type config_path: Path
     """
 
+    TMPFS_PATH = '/dev/shm'
+    """Directory of the tmpfs used for the temporary files when :code:`db_on_tmpfs` is set"""
+
     def __init__(self, config_path: Path):
         self.batch_index = None
+        self.network_index = None
+        self.resume = False
         self.yaml_path = None
         self.db_path = None
+        self.sync_path = None
+        self.tag_table_path = None
 
         self.config_path = config_path.absolute()
 
@@ -655,6 +737,18 @@ class ConfigParser:
         :param data: The data to check
         """
         ConfigParser.not_too_many_nodes(data)
+        ConfigParser.surrogate_has_model(data)
+
+    @staticmethod
+    def surrogate_has_model(data: dict):
+        """
+        Check that the surrogate simulator has a model.
+
+        :param data: the data to check on
+        :raise MissingValueError: When the simulator is surrogate and there are no surrogate options
+        """
+        if data.get('simulator') == 'surrogate' and 'surrogate' not in data:
+            raise MissingValueError("The surrogate simulator needs a 'surrogate' section with a 'model'.")
 
     @staticmethod
     def not_too_many_nodes(data: dict):
@@ -750,13 +844,14 @@ class ConfigParser:
         :param yaml_data: The YAML data without the device attacks
         """
         if 'attacks' in self.data and 'device_attacks' in self.data['attacks']:
+            tag_directory = get_tag_directory(yaml_data)
             for device_attack in self.data['attacks']['device_attacks']:
-                for plc in yaml_data['plcs']:
-                    if device_attack['actuator'] in plc['actuators']:
-                        if 'attacks' not in plc.keys():
-                            plc['attacks'] = []
-                        plc['attacks'].append(device_attack)
-                        break
+                owner = tag_directory.actuator_owner(device_attack['actuator'])
+                if owner:
+                    plc = tag_directory.plcs[owner.name]
+                    if 'attacks' not in plc.keys():
+                        plc['attacks'] = []
+                    plc['attacks'].append(device_attack)
         return yaml_data
 
     def generate_network_attacks(self):
@@ -767,6 +862,7 @@ class ConfigParser:
         """
         if 'attacks' in self.data and 'network_attacks' in self.data['attacks']:
             network_attacks = self.data['attacks']["network_attacks"]
+            tag_directory = get_tag_directory(self.data)
             for network_attack in network_attacks:
                 # Check existence and validity of target PLC
 
@@ -780,12 +876,7 @@ class ConfigParser:
                 if target.lower() == 'scada':
                     continue
 
-                target_plc = None
-                for plc in self.data.get("plcs"):
-                    if plc['name'] == target:
-                        target_plc = plc
-                        break
-                if not target_plc:
+                if target not in tag_directory.plcs:
                     raise NoSuchPlc("PLC {plc} does not exists".format(plc=target))
 
                 if network_attack['type'] == 'server_mitm':
@@ -793,9 +884,9 @@ class ConfigParser:
                     tags = []
                     for tag in network_attack['tags']:
                         tags.append(tag['tag'])
-                    if not set(tags).issubset(set(target_plc['actuators'] + target_plc['sensors'])):
+                    if not set(tags).issubset(tag_directory.tags_of(target)):
                         raise NoSuchTag(
-                            f"PLC {target_plc['name']} does not have all the tags specified.")
+                            f"PLC {target} does not have all the tags specified.")
 
                 #todo: Checks for concealment_mitm
 
@@ -828,14 +919,31 @@ class ConfigParser:
             return network_events
         return []
 
+    def skeletonize(self):
+        """
+        Gets the reduced inp file of the network, from the cache in the :code:`skeleton` directory
+        of the output folder when it was reduced before.
+
+        :return: path to the reduced inp file
+        :rtype: Path
+        """
+        return Skeletonizer(self.data['inp_file'], self.data['plcs'], self.data['skeletonize'],
+                            self.data['output_path'] / 'skeleton', self.data['demand'],
+                            self.data['log_level']).reduce()
+
     def generate_temporary_dirs(self):
         """Generates the temporary directory and yaml/db paths"""
-        # Create temp directory and intermediate yaml files in /tmp/
-        temp_directory = tempfile.mkdtemp(prefix='dhalsim_')
+        # Create temp directory and intermediate yaml files in /tmp/, or in /dev/shm/ to keep the database in memory
+        if self.data['db_on_tmpfs'] and os.path.isdir(self.TMPFS_PATH):
+            temp_directory = tempfile.mkdtemp(prefix='dhalsim_', dir=self.TMPFS_PATH)
+        else:
+            temp_directory = tempfile.mkdtemp(prefix='dhalsim_')
         # Change read permissions in tempdir
         os.chmod(temp_directory, 0o775)
         self.yaml_path = Path(temp_directory + '/intermediate.yaml')
         self.db_path = temp_directory + '/dhalsim.sqlite'
+        self.sync_path = temp_directory + '/dhalsim_sync.sock'
+        self.tag_table_path = temp_directory + '/dhalsim_tags.bin'
 
     def generate_intermediate_yaml(self):
         """Writes the intermediate.yaml file to include all options specified in the config, the plc's and their
@@ -857,13 +965,27 @@ class ConfigParser:
         yaml_data['db_path'] = self.db_path
         yaml_data['network_topology_type'] = self.data['network_topology_type']
 
+        # Synchronization between the physical process and the nodes
+        yaml_data['sync_mode'] = self.data['sync_mode']
+        yaml_data['sync_path'] = self.sync_path
+
+        # Storage of the tag values exchanged between the physical process and the PLCs
+        yaml_data['tag_backend'] = self.data['tag_backend']
+        yaml_data['tag_table_path'] = self.tag_table_path
+
         # Simulator to be used, it can be EPANET WNTR or EPANET epynet
         yaml_data['simulator'] = self.data['simulator']
+        # Trained model of the surrogate simulator and its fallback solver
+        if 'surrogate' in self.data:
+            yaml_data['surrogate'] = dict(self.data['surrogate'], model=str(self.data['surrogate']['model']))
 
         # Add batch mode parameters
         if self.batch_mode:
             yaml_data['batch_index'] = self.batch_index
             yaml_data['batch_simulations'] = self.data['batch_simulations']
+        # Network of a batch that runs at the same time as other batches
+        if self.network_index is not None:
+            yaml_data['network_index'] = self.network_index
         # Initial physical values
         # If the user has not configured initial_tank_data, yaml_data will not have this key
         if 'initial_tank_data' in self.data:
@@ -881,15 +1003,42 @@ class ConfigParser:
         # Write intermittent saving interval to intermediate yaml
         if 'saving_interval' in self.data:
             yaml_data['saving_interval'] = self.data['saving_interval']
+        # Format of the ground truth file
+        yaml_data['ground_truth_format'] = self.data['ground_truth_format']
+        if 'ground_truth_compression' in self.data:
+            yaml_data['ground_truth_compression'] = self.data['ground_truth_compression']
+        if 'ground_truth_flush_interval' in self.data:
+            yaml_data['ground_truth_flush_interval'] = self.data['ground_truth_flush_interval']
         # Write gaussian noise scale value to intermediate yaml
         if 'noise_scale' in self.data:
             yaml_data['noise_scale'] = self.data['noise_scale']
         else:
             yaml_data['noise_scale'] = 0
+        # Checkpoints to resume the experiment from
+        if 'checkpoint_interval' in self.data:
+            yaml_data['checkpoint_interval'] = self.data['checkpoint_interval']
+        if self.resume:
+            yaml_data['resume'] = True
+        # Age of the tags of other PLCs in headless mode
+        if 'cache_staleness' in self.data:
+            yaml_data['cache_staleness'] = self.data['cache_staleness']
+        # Seconds the PLCs wait for fresh tags of other PLCs
+        if 'cache_deadline' in self.data:
+            yaml_data['cache_deadline'] = self.data['cache_deadline']
+        # Side file with the duration of the phases of every iteration
+        if self.data['profile_phases']:
+            yaml_data['profile_phases'] = True
+        # Iterations the PLCs can skip their scan for
+        if 'lookahead' in self.data:
+            yaml_data['lookahead'] = self.data['lookahead']
 
         # Demand
         yaml_data['demand'] = self.data['demand']
 
+        # Reduced network, without the pipes and junctions no PLC observes
+        if 'skeletonize' in self.data:
+            yaml_data['inp_file'] = str(self.skeletonize())
+
         # Note: if iterations not present then default value will be written in InputParser
         if 'iterations' in self.data:
             yaml_data['iterations'] = self.data['iterations']
@@ -901,7 +1050,7 @@ class ConfigParser:
         # Write values from INP file into yaml file (controls, tanks/valves/initial values, etc.)
 
         # toDo: test this - preparing DHALSIM to be used with other simulators
-        if self.data['simulator'] == 'wntr' or self.data['simulator'] == 'epynet':
+        if self.data['simulator'] in ('wntr', 'epynet', 'epanet', 'surrogate'):
             yaml_data = InputParser(yaml_data).write()
 
         # Parse the device attacks from the config file
@@ -0,0 +1,142 @@
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import wntr
+
+from dhalsim.py3_logger import get_logger
+
+CACHE_VERSION = 1
+"""Version of the skeletonization, part of the cache key so older reduced networks are not reused"""
+
+
+class Skeletonizer:
+    """
+    Reduces a network to what the PLCs and the ground truth need, with the skeletonization of
+    WNTR: branch trimming, series pipe merging and parallel pipe merging of the pipes up to a
+    diameter. Tanks, reservoirs, pumps and valves are never removed, and neither are the junctions
+    read by a PLC sensor and the junctions and pipes used by the controls of the inp file. The
+    demands of removed junctions are moved to the junctions that are kept.
+
+    The reduced inp file is cached under a name derived from the inp file and the options, so
+    batches and later runs of the experiment reuse it. Next to it, an accuracy report compares
+    the sensor trajectories of the reduced network with those of the full network over a short
+    calibration run.
+
+    :param inp_file: path to the EPANET inp file
+    :param plcs: the PLCs of the config file
+    :param options: the :code:`skeletonize` options of the config file
+    :param cache_dir: directory of the reduced inp files and their reports
+    :param demand_model: :code:`pdd` for pressure driven demand, :code:`dd` for demand driven
+    :param log_level: level of the logger
+    """
+
+    def __init__(self, inp_file, plcs, options, cache_dir, demand_model='pdd', log_level='info'):
+        self.inp_file = Path(inp_file)
+        self.pipe_diameter = options['pipe_diameter']
+        self.calibration_iterations = options.get('calibration_iterations', 24)
+        self.cache_dir = Path(cache_dir)
+        self.demand_model = demand_model
+        self.logger = get_logger(log_level)
+
+        self.wn = wntr.network.WaterNetworkModel(str(self.inp_file))
+        self.sensors = [sensor for plc in plcs for sensor in plc.get('sensors', [])]
+
+        name = self.inp_file.stem + '_skeleton_' + self.cache_key()[:16]
+        self.skeleton_path = self.cache_dir / (name + '.inp')
+        self.report_path = self.cache_dir / (name + '_accuracy.csv')
+
+    def protected_junctions(self):
+        """
+        Gets the junctions that are read by a PLC sensor.
+
+        :return: sorted list of junction names
+        """
+        return sorted(set(self.sensors) & set(self.wn.junction_name_list))
+
+    def cache_key(self):
+        """
+        Gets a hash of everything the reduced network depends on: the inp file, the diameter
+        threshold, the protected junctions and the calibration run.
+
+        :return: hexadecimal digest
+        """
+        digest = hashlib.sha256()
+        digest.update(self.inp_file.read_bytes())
+        digest.update(repr((CACHE_VERSION, float(self.pipe_diameter), self.calibration_iterations,
+                            self.demand_model, self.protected_junctions())).encode())
+        return digest.hexdigest()
+
+    def reduce(self):
+        """
+        Gets the reduced inp file, skeletonizing the network and writing the accuracy report when
+        they are not cached yet.
+
+        :return: path to the reduced inp file
+        """
+        if self.skeleton_path.is_file() and self.report_path.is_file():
+            self.logger.info("Using cached skeleton " + str(self.skeleton_path))
+            return self.skeleton_path
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        skeleton = wntr.morph.skeletonize(self.wn, self.pipe_diameter, use_epanet=False,
+                                          junctions_to_exclude=self.protected_junctions())
+
+        # Written under a temporary name first, batches running in parallel may reduce the same network
+        temporary_path = self.skeleton_path.with_suffix('.inp.' + str(os.getpid()))
+        wntr.network.io.write_inpfile(skeleton, str(temporary_path))
+        os.replace(str(temporary_path), str(self.skeleton_path))
+
+        report = self.accuracy_report(wntr.network.WaterNetworkModel(str(self.skeleton_path)))
+        temporary_path = self.report_path.with_suffix('.csv.' + str(os.getpid()))
+        report.to_csv(str(temporary_path), index=False)
+        os.replace(str(temporary_path), str(self.report_path))
+
+        self.logger.info("Skeletonized {inp}: {junctions} of {total_junctions} junctions and {pipes} of "
+                         "{total_pipes} pipes kept, largest sensor error {error:.4f}. Report at {report}"
+                         .format(inp=self.inp_file.name, junctions=skeleton.num_junctions,
+                                 total_junctions=self.wn.num_junctions, pipes=skeleton.num_pipes,
+                                 total_pipes=self.wn.num_pipes,
+                                 error=report['max_abs_error'].max() if len(report) else 0.0,
+                                 report=self.report_path))
+        return self.skeleton_path
+
+    def calibration_results(self, wn):
+        """
+        Runs the calibration simulation, with the controls of the inp file.
+
+        :param wn: the water network model to simulate
+        :return: WNTR simulation results
+        """
+        wn.options.time.duration = self.calibration_iterations * wn.options.time.hydraulic_timestep
+        if self.demand_model == 'pdd':
+            wn.options.hydraulic.demand_model = 'PDD'
+        return wntr.sim.WNTRSimulator(wn).run_sim()
+
+    def accuracy_report(self, skeleton):
+        """
+        Compares the trajectories of the values PLCs can read in the full and the reduced network:
+        tank levels, pressures of the sensor junctions and flows of pumps and valves.
+
+        :param skeleton: the reduced water network model
+        :return: pandas DataFrame with the maximum absolute error and the root mean square error
+           of every element
+        """
+        full_results = self.calibration_results(wntr.network.WaterNetworkModel(str(self.inp_file)))
+        skeleton_results = self.calibration_results(skeleton)
+
+        compared = [('level', 'node', 'pressure', self.wn.tank_name_list),
+                    ('pressure', 'node', 'pressure', self.protected_junctions()),
+                    ('flow', 'link', 'flowrate', self.wn.pump_name_list + self.wn.valve_name_list)]
+
+        rows = []
+        for quantity, element_type, attribute, names in compared:
+            full = getattr(full_results, element_type)[attribute]
+            reduced = getattr(skeleton_results, element_type)[attribute]
+            for name in names:
+                error = (reduced[name] - full[name]).abs().to_numpy()
+                rows.append({'element': name, 'quantity': quantity, 'max_abs_error': error.max(),
+                             'rmse': np.sqrt(np.mean(error ** 2))})
+        return pd.DataFrame(rows, columns=['element', 'quantity', 'max_abs_error', 'rmse'])
@@ -0,0 +1,162 @@
+import time
+from pathlib import Path
+
+import numpy as np
+
+PHASES = ('publish', 'control', 'actuators', 'solve', 'read_state', 'write_state', 'results',
+          'checkpoint', 'sync')
+"""Phases of an iteration of the physical process, in the order of the columns of the profile"""
+
+PERCENTILES = (50, 90, 99)
+"""Percentiles of the phase durations in the summary"""
+
+
+def get_phase_profiler(data, resume=False):
+    """
+    Creates the phase profiler of an experiment. When :code:`profile_phases` is not set in the
+    intermediate yaml, the profiler records nothing.
+
+    :param data: the data of the intermediate yaml
+    :param resume: (Default value = False) whether the experiment continues from a checkpoint,
+       the rows are then appended to the existing profile
+    :return: a :class:`PhaseProfiler` or a :class:`DisabledProfiler`
+    """
+    if not data.get('profile_phases'):
+        return DisabledProfiler()
+    return PhaseProfiler(Path(data['output_path']) / 'phase_profile.csv', append=resume)
+
+
+class DisabledProfiler:
+    """Profiler with the interface of :class:`PhaseProfiler` that records nothing."""
+
+    def start(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def end_iteration(self, iteration):
+        pass
+
+    def close(self):
+        return None
+
+
+class PhaseProfiler:
+    """
+    Records how long every phase of an iteration of the physical process takes, with the
+    monotonic clock. :meth:`lap` adds the time since the previous lap to a phase, so the phases
+    of an iteration add up to its wall time.
+
+    Durations are kept in a block of :code:`block_size` rows of nanoseconds, and every full block
+    is appended to the csv file in microseconds: one row per iteration, with the iteration and a
+    column for every phase of :data:`PHASES`. Only the current block is kept in memory, the
+    summary is computed from the rows in the file.
+
+    :param path: path of the csv file
+    :param append: (Default value = False) append to an existing file instead of replacing it
+    :param block_size: (Default value = 1024) amount of iterations kept before they are written
+    """
+
+    def __init__(self, path, append=False, block_size=1024):
+        self.path = Path(path)
+        self.column = {phase: i + 1 for i, phase in enumerate(PHASES)}
+        self.block = np.zeros((block_size, len(PHASES) + 1), dtype=np.int64)
+        self.row = 0
+        self.rows_written = 0
+
+        write_header = not append or not self.path.is_file()
+        self.file = self.path.open(mode='a' if append else 'w')
+        if write_header:
+            self.file.write(','.join(['iteration'] + [phase + '_us' for phase in PHASES]) + '\n')
+        # Rows of earlier runs, when appending, are not part of the summary
+        self.first_row_offset = self.file.tell()
+
+        self.last = time.perf_counter_ns()
+
+    def start(self):
+        """Starts timing the first phase."""
+        self.last = time.perf_counter_ns()
+
+    def lap(self, phase):
+        """
+        Adds the time since the previous lap to a phase of the current iteration.
+
+        :param phase: name of the phase, one of :data:`PHASES`
+        """
+        now = time.perf_counter_ns()
+        self.block[self.row, self.column[phase]] += now - self.last
+        self.last = now
+
+    def end_iteration(self, iteration):
+        """
+        Ends the row of the current iteration, the next lap is part of a new row.
+
+        :param iteration: the iteration to store in the row
+        """
+        self.block[self.row, 0] = iteration
+        self.row += 1
+        if self.row == len(self.block):
+            self.flush()
+
+    def flush(self):
+        """Writes the finished rows to the file."""
+        if self.row == 0:
+            return
+        microseconds = self.block[:self.row].copy()
+        microseconds[:, 1:] //= 1000
+        np.savetxt(self.file, microseconds, fmt='%d', delimiter=',')
+        self.file.flush()
+        self.rows_written += self.row
+
+        self.block[:] = 0
+        self.row = 0
+
+    def summary(self):
+        """
+        Gets the percentiles of the duration of every phase, and of the iterations, over the
+        iterations recorded by this profiler and written to the file.
+
+        :return: the summary as a table, with durations in milliseconds
+        """
+        if not self.rows_written:
+            return "No iterations profiled."
+        with self.path.open() as file:
+            file.seek(self.first_row_offset)
+            durations = np.loadtxt(file, dtype=np.int64, delimiter=',', ndmin=2)[:, 1:] / 1e3
+        totals = durations.sum(axis=1)
+        share = durations.sum(axis=0) / max(totals.sum(), 1e-12) * 100
+
+        header = "{phase:<12}".format(phase="phase") + "".join(
+            "{p:>10}".format(p="p" + str(p)) for p in PERCENTILES) + "{m:>10}{s:>8}".format(m="max", s="share")
+        lines = ["Phase durations in ms over {n} iterations:".format(n=len(totals)), header]
+        for i, phase in enumerate(PHASES):
+            lines.append(self.format_line(phase, durations[:, i], share[i]))
+        lines.append(self.format_line("iteration", totals, 100.0))
+        return "\n".join(lines)
+
+    @staticmethod
+    def format_line(name, values, share):
+        """
+        Formats the percentiles of one phase.
+
+        :param name: name of the phase
+        :param values: durations of the phase in milliseconds
+        :param share: percentage of the total time spent in the phase
+        :return: the line of the summary
+        """
+        percentiles = np.percentile(values, PERCENTILES)
+        return "{name:<12}".format(name=name) + "".join("{v:>10.3f}".format(v=v) for v in percentiles) + \
+            "{m:>10.3f}{s:>7.1f}%".format(m=values.max(), s=share)
+
+    def close(self):
+        """
+        Writes the remaining rows and closes the file.
+
+        :return: the summary of :meth:`summary`
+        """
+        if self.file.closed:
+            return self.summary()
+        self.flush()
+        self.file.close()
+        return self.summary()
@@ -4,7 +4,7 @@ import os
 import signal
 import logging
 from datetime import datetime
-import random
+import numpy as np
 import pandas as pd
 import progressbar
 import sqlite3
@@ -12,30 +12,27 @@ import sys
 import time
 from pathlib import Path
 
+from dhalsim.barrier import BarrierServer, get_node_names
+from dhalsim.checkpoint import CheckpointError, get_checkpoint_path, read_checkpoint, write_checkpoint
+from dhalsim.db_client import get_database_client
+from dhalsim.ground_truth import get_ground_truth_writer
+from dhalsim.hydraulics.backend import UnsupportedSimulator, get_backend_class
+from dhalsim.phase_profiler import get_phase_profiler
 from dhalsim.parser.file_generator import BatchReadmeGenerator, GeneralReadmeGenerator
 from dhalsim.py3_logger import get_logger
+from dhalsim.tag_table import get_tag_table
 import yaml
 
-import wntr
-import wntr.network.controls as controls
-from decimal import Decimal
-
-from epynet.water_network import WaterDistributionNetwork
-from epynet import epynetUtils
-
 
 class Error(Exception):
     """Base class for exceptions in this module."""
 
 
-class DatabaseError(Error):
-    """Raised when not being able to connect to the database"""
-
-
 class PhysicalPlant:
     """
-    Class representing the plant itself, runs each iteration. This class also deals with WNTR
-    and updates the database.
+    Class representing the plant itself, runs each iteration. The hydraulic simulation is done by
+    the :class:`~dhalsim.hydraulics.backend.HydraulicBackend` of the configured simulator, this
+    class exchanges its state with the nodes through the database.
     """
 
     WAIT_FOR_FLAG = 0.005
@@ -56,8 +53,7 @@ class PhysicalPlant:
         logging.getLogger('wntr').setLevel(logging.WARNING)
         self.logger = get_logger(self.data['log_level'])
 
-        self.ground_truth_path = Path(self.data["output_path"]) / "ground_truth.csv"
-        self.ground_truth_path.touch(exist_ok=True)
+        self.db = get_database_client(self.data["db_path"], self.logger, self.DB_TRIES)
 
         # Use of prepared statements
         self._name = 'plant'
@@ -76,31 +72,45 @@ class PhysicalPlant:
         # connection to the database
         self.db_path = self.data["db_path"]
 
-        # get simulator: WNTR or epynet. This will impact how the controls, actuator status, and results are handled
+        self.connect_nodes()
+
+        # Checkpoint of an earlier run of this experiment, or of the shared prefix of a campaign,
+        # to continue from
+        self.checkpoint_path = get_checkpoint_path(self.data)
+        self.checkpoint_interval = self.data.get('checkpoint_interval')
+        self.fork = self.data.get('fork')
+        self.checkpoint = None
+        if self.fork:
+            self.checkpoint = self.load_checkpoint(Path(self.fork['checkpoint']), required=True)
+        elif self.data.get('resume'):
+            self.checkpoint = self.load_checkpoint(self.checkpoint_path)
+
+        # get simulator: WNTR or epynet. The backend of the simulator handles the controls, actuator status,
+        # and results
         self.simulator = self.data["simulator"]
-
-        if self.simulator == 'epynet':
-            self.prepare_epynet_simulator()
-        elif self.simulator == 'wntr':
-            self.prepare_wntr_simulator()
-        else:
-            self.logger.warning("Warning! Unsupported simulator configured, defaulting to epynet")
-            self.simulator = 'epynet'
-            self.prepare_epynet_simulator()
+        self.prepare_simulator()
 
         self.scada_junction_list = self.get_scada_junction_list(self.data['plcs'])
-        self.values_list = list()
+        self.scada_junction_indices = self.backend.state.junction_indices(self.scada_junction_list)
 
         list_header = ['iteration', 'timestamp']
         list_header.extend(self.create_node_header(self.tank_list))
         list_header.extend(self.create_node_header(self.junction_list))
-        list_header.extend(self.create_link_header(self.pump_list))
-        list_header.extend(self.create_link_header(self.valve_list))
+        link_header = self.create_link_header(self.pump_list) + self.create_link_header(self.valve_list)
+        list_header.extend(link_header)
+
+        attack_header = self.create_attack_header()
+        list_header.extend(attack_header)
 
-        list_header.extend(self.create_attack_header())
+        # Append only writer of ground_truth.csv, or its parquet/arrow equivalent. Statuses and
+        # attack flags are integer columns
+        self.ground_truth = get_ground_truth_writer(self.data, list_header,
+                                                    link_header[1::2] + attack_header,
+                                                    self.checkpoint['ground_truth'] if self.checkpoint and
+                                                    not self.fork else None)
 
-        self.results_list = []
-        self.results_list.append(list_header)
+        # Wall time of the phases of every iteration, when profile_phases is set
+        self.profiler = get_phase_profiler(self.data, resume=bool(self.checkpoint) and not self.fork)
 
         # Set initial physical conditions
         self.set_initial_values()
@@ -111,18 +121,150 @@ class PhysicalPlant:
 
         self.start_time = datetime.now()
 
-        # Build initial list of actuators
-        if self.simulator == 'epynet':
-            self.build_initial_actuator_dict()
-            self.master_time = 0
-        elif self.simulator == 'wntr':
-            self.sim = wntr.sim.WNTRSimulator(self.wn)
-            self.master_time = -1
+        self.master_time = self.backend.initial_iteration
+
+        self._init_read_phase()
+        self._init_results_columns()
 
         self.db_update_string = "UPDATE plant SET value = ? WHERE name = ?"
+        self.master_time_string = "REPLACE INTO master_time (id, time) VALUES(1, ?)"
+
+        # Values of the tags computed in the current iteration, written in one transaction
+        self.plant_state = {}
+
+        if self.checkpoint:
+            self.restore_checkpoint(self.checkpoint)
+
+        self.logger.info("DB Sleep time: " + str(self.db.sleep_time))
+
+    def connect_nodes(self):
+        """
+        Opens the channels shared with the nodes of the experiment: the memory mapped tag table,
+        when tags are not stored in the plant table, and the iteration barrier, when the nodes do
+        not synchronize through the sync table.
+        """
+        self.tag_table = get_tag_table(self.data)
+
+        self.barrier = None
+        if self.data.get("sync_mode", "database") == "socket":
+            self.barrier = BarrierServer(self.data["sync_path"], get_node_names(self.data))
+            self.barrier.start()
+
+    def load_checkpoint(self, path, required=False):
+        """
+        Reads the checkpoint to resume from. Without a checkpoint, for example for a batch that had
+        not started yet, the simulation starts from the beginning.
+
+        :param path: path of the checkpoint
+        :param required: (Default value = False) whether to abort when there is no checkpoint
+        :return: the state saved in the checkpoint, or None
+        """
+        if not path.is_file() and not required:
+            self.logger.warning("No checkpoint found at " + str(path) + ", starting from the beginning.")
+            return None
+
+        try:
+            return read_checkpoint(path)
+        except CheckpointError as exc:
+            self.logger.error(str(exc) + ". Aborting")
+            sys.exit(1)
 
-        self.db_sleep_time = random.uniform(0.01, 0.1)
-        self.logger.info("DB Sleep time: " + str(self.db_sleep_time))
+    def checkpoint_due(self):
+        """Whether a checkpoint is written at the current iteration."""
+        return bool(self.checkpoint_interval) and self.master_time > 0 and \
+            self.master_time % self.checkpoint_interval == 0
+
+    def save_checkpoint(self):
+        """
+        Writes a checkpoint of the current iteration: the master time, the size of the ground
+        truth, the tables shared with the nodes and the state of the simulation, as saved by
+        :meth:`~dhalsim.hydraulics.backend.HydraulicBackend.save_state`.
+        """
+        self.ground_truth.flush()
+
+        state = {
+            'simulator': self.simulator,
+            'master_time': self.master_time,
+            'ground_truth': {'iteration': self.master_time, 'offset': self.ground_truth.position()},
+            'tables': self.read_tables(),
+            'simulation': self.backend.save_state(),
+        }
+
+        write_checkpoint(self.checkpoint_path, state)
+        self.logger.debug("Checkpoint written at iteration " + str(self.master_time))
+
+    def restore_checkpoint(self, state):
+        """
+        Continues the simulation from a checkpoint written by :meth:`save_checkpoint`.
+
+        :param state: the state saved in the checkpoint
+        """
+        if state['simulator'] != self.simulator:
+            self.logger.error("Checkpoint was written by " + state['simulator'] + " but the simulator is " +
+                              self.simulator + ". Aborting")
+            sys.exit(1)
+
+        self.master_time = state['master_time']
+
+        self.backend.restore_state(state['simulation'])
+        self.wn = self.backend.wn
+        self.actuator_values[:] = self.backend.get_actuator_values()
+
+        self.restore_tables(state['tables'])
+
+        if self.fork:
+            self.copy_prefix_results(Path(self.fork['ground_truth']))
+        self.logger.info("Resuming simulation from iteration " + str(self.master_time))
+
+    def copy_prefix_results(self, path):
+        """
+        Copies the ground truth of the shared prefix of a campaign to the ground truth of this
+        scenario. The prefix ran without attacks, so the attack columns of this scenario are 0.
+
+        :param path: path of the ground truth csv of the prefix
+        """
+        with open(str(path), newline='') as file:
+            reader = csv.reader(file)
+            prefix_header = next(reader)
+            header = self.ground_truth.header
+            if header[:len(prefix_header)] != prefix_header:
+                self.logger.error("Ground truth of the prefix does not match this scenario. Aborting")
+                sys.exit(1)
+
+            padding = [0] * (len(header) - len(prefix_header))
+            for row in reader:
+                self.ground_truth.append([int(row[0]), datetime.fromisoformat(row[1])] +
+                                         [float(value) for value in row[2:]] + padding)
+
+    def read_tables(self):
+        """
+        Reads the tables shared with the nodes for a checkpoint: the plant and attack tables, the
+        master time and the tag table.
+
+        :return: dictionary with the contents of the tables
+        """
+        tables = {
+            'plant': self.db.fetchall("SELECT name, value FROM plant"),
+            'attack': self.db.fetchall("SELECT name, flag FROM attack"),
+            'master_time': self.master_time,
+        }
+        if self.tag_table:
+            tables['tags'] = dict(zip(self.tag_table.names, self.tag_table.read().tolist()))
+        return tables
+
+    def restore_tables(self, tables):
+        """
+        Writes the tables saved by :meth:`read_tables` in one transaction.
+
+        :param tables: dictionary with the contents of the tables
+        """
+        self.db.transaction([
+            (self.db_update_string, [(value, name) for name, value in tables['plant']]),
+            ("UPDATE attack SET flag = ? WHERE name = ?", [(flag, name) for name, flag in tables['attack']]),
+            (self.master_time_string, [(str(tables['master_time']),)]),
+        ])
+        if self.tag_table and 'tags' in tables:
+            self.tag_table.update(tables['tags'])
 
     def set_sync(self, flag):
         """
@@ -135,15 +277,17 @@ class PhysicalPlant:
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
+        if self.barrier:
+            self.barrier.release(int(flag))
+            return
         #"UPDATE sync SET flag=2"
         self.db_query("UPDATE sync SET flag=?", True, (int(flag),))
 
     def db_query(self, query, write=False, parameters=None):
         """
-        Execute a query on the database
-        On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
-        Before it reties, it will sleep for :code:`DB_SLEEP_TIME` seconds.
-        This is necessary because of the limited concurrency in SQLite.
+        Execute a query on the database through the :class:`~dhalsim.db_client.DatabaseClient` of
+        the physical process. On a :code:`sqlite3.OperationalError` it will retry with a max of
+        :code:`DB_TRIES` tries.
         :param query: The SQL query to execute in the db
         :type query: str
         :param write: Boolean flag to indicate if this query will write into the database
@@ -151,117 +295,33 @@ class PhysicalPlant:
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
-        for i in range(self.DB_TRIES):
-            try:
-                with sqlite3.connect(self.data["db_path"]) as conn:
-                    cur = conn.cursor()
-                    if parameters:
-                        cur.execute(query, parameters)
-                    else:
-                        cur.execute(query)
-                    conn.commit()
-
-                    if not write:
-                        return cur.fetchone()[0]
-                    else:
-                        return
-            except sqlite3.OperationalError as exc:
-                self.logger.info(
-                    "Failed to connect to db with exception {exc}. Trying {i} more times.".format(
-                        exc=exc, i=self.DB_TRIES - i - 1))
-                time.sleep(self.db_sleep_time)
-
-        self.logger.error("Failed to connect to db. Tried {i} times.".format(i=self.DB_TRIES))
-        raise DatabaseError("Failed to execute db query in database")
-
-    def prepare_wntr_simulator(self):
-        self.logger.info("Preparing wntr simulation")
-        self.wn = wntr.network.WaterNetworkModel(self.data['inp_file'])
-
-        self.node_list = list(self.wn.node_name_list)
-        self.link_list = list(self.wn.link_name_list)
+        return self.db.db_query(query, write, parameters)
 
-        self.tank_list = self.get_node_list_by_type(self.node_list, 'Tank')
-        self.junction_list = self.get_node_list_by_type(self.node_list, 'Junction')
-
-        self.pump_list = self.get_link_list_by_type(self.link_list, 'Pump')
-        self.valve_list = self.get_link_list_by_type(self.link_list, 'Valve')
-
-        dummy_condition = controls.ValueCondition(self.wn.get_node(self.tank_list[0]), 'level',
-                                                  '>=', -1)
-
-        self.control_list = []
-        for valve in self.valve_list:
-            self.control_list.append(self.create_control_dict(valve, dummy_condition))
-
-        for pump in self.pump_list:
-            self.control_list.append(self.create_control_dict(pump, dummy_condition))
-
-        for control in self.control_list:
-            an_action = controls.ControlAction(control['actuator'], control['parameter'],
-                                               control['value'])
-            a_control = controls.Control(control['condition'], an_action, name=control['name'])
-            self.wn.add_control(control['name'], a_control)
-
-        if self.data['demand'] == 'pdd':
-            self.wn.options.hydraulic.demand_model = 'PDD'
-
-        self.simulation_step = self.wn.options.time.hydraulic_timestep
-
-    def prepare_epynet_simulator(self):
+    def prepare_simulator(self):
+        """
+        Loads the network in the backend of the configured simulator and puts its actuators under
+        the control of the PLCs. An unsupported simulator defaults to epynet.
+        """
+        try:
+            backend_class = get_backend_class(self.simulator)
+        except UnsupportedSimulator:
+            self.logger.warning("Warning! Unsupported simulator configured, defaulting to epynet")
+            self.simulator = 'epynet'
+            backend_class = get_backend_class(self.simulator)
 
-        self.logger.info("Preparing epynet simulation")
+        self.logger.info("Preparing " + self.simulator + " simulation")
+        self.backend = backend_class(self.data['inp_file'], self.logger, self.data.get(self.simulator))
+        self.backend.prepare(self.data['demand'])
 
-        original_inp_filename = self.data['inp_file'].rsplit('.', 1)[0]
-        processed_inp_filename = original_inp_filename + '_processed.inp'
-        try:
-            self.remove_controls_from_inp_file(self.data['inp_file'], processed_inp_filename)
-        except IOError as ioe:
-            self.logger.error('IO Exception writing an EPANET file without [CONTROLS], aborting')
-            sys.exit(1)
+        self.wn = self.backend.wn
+        self.tank_list = self.backend.tank_list
+        self.junction_list = self.backend.junction_list
+        self.pump_list = self.backend.pump_list
+        self.valve_list = self.backend.valve_list
+        self.simulation_step = self.backend.simulation_step
 
-        # using an epynet water network object we do not have a way of removing the controls, so we write a new
-        # EPANET inp file without the [CONTROLS] section
-        self.wn = WaterDistributionNetwork(processed_inp_filename)
-
-        # epynet
-        self.simulation_step = epynetUtils.get_time_parameter(
-            self.wn, epynetUtils.get_time_param_code('EN_HYDSTEP'))[1]
-
-        # epynet
-        self.tank_list = list(self.wn.tanks.keys())
-        self.junction_list = list(self.wn.junctions.keys())
-        self.pump_list = list(self.wn.pumps.keys())
-        self.valve_list = list(self.wn.valves.keys())
-
-        # epynet
-        self.actuator_list = None
-
-    def create_control_dict(self, actuator, dummy_condition):
-        act_dict = dict.fromkeys(['actuator', 'parameter', 'value', 'condition', 'name'])
-        act_dict['actuator'] = self.wn.get_link(actuator)
-        act_dict['parameter'] = 'status'
-        act_dict['condition'] = dummy_condition
-        act_dict['name'] = actuator
-        if type(self.wn.get_link(actuator).status) is int:
-            act_dict['value'] = act_dict['actuator'].status
-        else:
-            act_dict['value'] = act_dict['actuator'].status.value
-        return act_dict
-
-    # toDo: Develop a test for this method
-    def remove_controls_from_inp_file(self, in_file, out_file):
-        write_out = True
-        with open(in_file) as infile, open(out_file, "w") as outfile:
-            for line in infile:
-                if write_out:
-                    outfile.write(line)
-                if line.startswith('[CONTROLS]'):
-                    write_out = False
-                    continue
-
-                if not write_out and line.startswith('['):
-                    write_out = True
+        self.pump_tags = [pump + 'F' for pump in self.pump_list]
+        self.valve_tags = [valve + 'F' for valve in self.valve_list]
 
     def get_scada_junction_list(self, plcs):
 
@@ -277,20 +337,6 @@ class PhysicalPlant:
 
         return junction_list
 
-    def get_node_list_by_type(self, a_list, a_type):
-        result = []
-        for node in a_list:
-            if self.wn.get_node(node).node_type == a_type:
-                result.append(str(node))
-        return result
-
-    def get_link_list_by_type(self, a_list, a_type):
-        result = []
-        for link in a_list:
-            if self.wn.get_link(link).link_type == a_type:
-                result.append(str(link))
-        return result
-
     @staticmethod
     def create_node_header(a_list):
         result = []
@@ -325,161 +371,55 @@ class PhysicalPlant:
 
         return result
 
-    def build_initial_actuator_dict(self):
-        actuator_status = []
-        actuator_names = self.pump_list
-        actuator_names.extend(self.valve_list)
-
-        for actuator in actuator_names:
-            if actuator in self.wn.pumps:
-                actuator_status.append(self.wn.pumps[actuator].status)
-            elif actuator in self.wn.valves:
-                actuator_status.append(self.wn.valves[actuator].status)
-            else:
-                self.logger.error('Invalid actuator!')
-
-        self.actuator_list = dict(zip(actuator_names, actuator_status))
-        
-    def register_initial_results(self):
-        self.values_list = [self.master_time, datetime.now()]
-
-        # register initial state of the tanks
-        if self.simulator == 'epynet':
-            # Get tanks levels
-            for tank in self.tank_list:
-                self.values_list.extend([self.wn.tanks[tank].tanklevel])
-        elif self.simulator == 'wntr':
-            for tank in self.tank_list:
-                self.values_list.extend([self.wn.get_node(tank).level])
-
-        if self.simulator == 'epynet':
-            # Get junction  levels
-            for junction in self.junction_list:
-                self.values_list.extend(
-                    [self.wn.junctions[junction].pressure])
-        elif self.simulator == 'wntr':
-            for junction in self.junction_list:
-                # toDo: Check in wntr 0.4.2 a new way of getting the initial junction pressure
-                self.values_list.extend([0])
-
-        if self.simulator == 'epynet':
-            # Get pumps flows and status
-            self.logger.debug('Registering initial results of pumps: ' + str(self.pump_list))
-            for pump in self.pump_list:
-                if pump in self.wn.pumps:
-                    self.values_list.extend([self.wn.pumps[pump].flow, self.wn.pumps[pump].status])
-                elif pump in self.wn.valves:
-                    self.values_list.extend([self.wn.valves[pump].flow, self.wn.valves[pump].status])
-                else:
-                    self.logger.error("Error. Actuator " + str(pump)  + " not found in EPANET file")
-        elif self.simulator == 'wntr':
-
-            for pump in self.pump_list:
-                self.values_list.extend([self.wn.get_link(pump).flow])
-                if type(self.wn.get_link(pump).status) is int:
-                    self.values_list.extend([self.wn.get_link(pump).status])
-                else:
-                    self.values_list.extend([self.wn.get_link(pump).status.value])
-
-        # epynet current's version includes valves status in pumps
-        if self.simulator != 'epynet':
-            self.extend_valves()
+    def _init_results_columns(self):
+        """
+        Computes the slices of the ground truth row holding every group of columns, in the order
+        of the header. Links, pumps first and then valves, have a flow and a status column.
+        """
+        offset = 0
+        columns = {}
+        groups = [('tank', len(self.create_node_header(self.tank_list))),
+                  ('junction', len(self.create_node_header(self.junction_list))),
+                  ('link', len(self.create_link_header(self.pump_list + self.valve_list))),
+                  ('attack', len(self.attack_names))]
+
+        for group, width in groups:
+            columns[group] = slice(offset, offset + width)
+            offset += width
+
+        self.tank_columns = columns['tank']
+        self.junction_columns = columns['junction']
+        self.link_columns = columns['link']
+        self.attack_columns = columns['attack']
 
-        self.extend_attacks()
+    def register_initial_results(self):
+        self.backend.read_initial_state()
+        self.register_results()
 
-    def register_results(self, results=None):
+    def register_results(self):
 
         # Results are divided into: nodes: reservoir and tanks, links: flows and status
-        self.values_list = [self.master_time, datetime.now()]
-        self.extend_tanks(results)
-        self.extend_junctions(results)
-        self.extend_pumps(results)
-
-        # epynet current's version includes valves status in pumps
-        if self.simulator != 'epynet':
-            self.extend_valves()
-
-        self.extend_attacks()
+        row = self.ground_truth.new_row(self.master_time, datetime.now())
+        self.extend_tanks(row)
+        self.extend_junctions(row)
+        self.extend_links(row)
+        self.extend_attacks(row)
 
-    def extend_tanks(self, results=None):
+    def extend_tanks(self, row):
+        row[self.tank_columns] = self.backend.state.tank_levels
 
-        if self.simulator == 'epynet':
-            # Get tanks levels
-            for tank in self.tank_list:
-                self.values_list.extend([results[tank]['pressure']])
-        elif self.simulator == 'wntr':
-            for tank in self.tank_list:
-                self.values_list.extend([self.wn.get_node(tank).level])
+    def extend_junctions(self, row):
+        row[self.junction_columns] = self.backend.state.junction_pressures
 
-    def extend_junctions(self, results=None):
+    def extend_links(self, row):
+        # Get pumps and valves flows and status
+        link_values = row[self.link_columns]
+        link_values[0::2] = self.backend.state.flows
+        link_values[1::2] = self.backend.state.statuses
 
-        if self.simulator == 'epynet':
-            # Get junction  levels
-            for junction in self.junction_list:
-                self.values_list.extend(
-                    [self.wn.junctions[junction].pressure.iloc[-1]])
-        elif self.simulator == 'wntr':
-            for junction in self.junction_list:
-                self.values_list.extend(
-                    [self.wn.get_node(junction).head - self.wn.get_node(junction).elevation])
-
-    def extend_pumps(self, results=None):
-
-        if self.simulator == 'epynet':
-            # Get pumps flows and status
-            for pump in self.pump_list:
-                self.values_list.extend([results[pump]['flow'], results[pump]['status']])
-
-        elif self.simulator == 'wntr':
-
-            for pump in self.pump_list:
-                self.values_list.extend([self.wn.get_link(pump).flow])
-
-                if type(self.wn.get_link(pump).status) is int:
-                    self.values_list.extend([self.wn.get_link(pump).status])
-                else:
-                    self.values_list.extend([self.wn.get_link(pump).status.value])
-
-    def extend_valves(self):
-        # Get valves flows and status
-        for valve in self.valve_list:
-            self.values_list.extend([self.wn.get_link(valve).flow])
-
-            if type(self.wn.get_link(valve).status) is int:
-                self.values_list.extend([self.wn.get_link(valve).status])
-            else:
-                self.values_list.extend([self.wn.get_link(valve).status.value])
-
-    def extend_attacks(self):
-        # Get device attacks
-        if "plcs" in self.data:
-            for plc in self.data["plcs"]:
-                if "attacks" in plc:
-                    for attack in plc["attacks"]:
-                        self.values_list.append(self.get_attack_flag(attack['name']))
-        # get network attacks
-        if "network_attacks" in self.data:
-            for network_attack in self.data["network_attacks"]:
-                self.values_list.append(self.get_attack_flag(network_attack['name']))
-
-    def update_controls(self):
-        """Updates all controls in WNTR."""
-        conn = sqlite3.connect(self.data["db_path"])
-        c = conn.cursor()
-
-        for control in self.control_list:
-            rows_1 = c.execute('SELECT value FROM plant WHERE name = ?', (control['name'],)).fetchone()
-            conn.commit()
-            new_status = int(rows_1[0])
-
-            control['value'] = new_status
-
-            new_action = controls.ControlAction(control['actuator'], control['parameter'],
-                                                control['value'])
-            new_control = controls.Control(control['condition'], new_action, name=control['name'])
-
-            self.wn.remove_control(control['name'])
-            self.wn.add_control(control['name'], new_control)
+    def extend_attacks(self, row):
+        # Get device attacks and network attacks, in the order of the attack header
+        row[self.attack_columns] = self.read_attack_flags()
 
     def _init_what(self):
         """Save a ordered tuple of pk field names in self._what."""
@@ -530,6 +470,23 @@ class PhysicalPlant:
 
         self._set_query = set_query
 
+    def _init_read_phase(self):
+        """
+        Prepares the queries and arrays used to read the actuators and attack flags once per
+        iteration, in the order of the actuators of the backend.
+        """
+        self.actuator_names = list(self.backend.actuator_names)
+        self.actuator_index = {name: i for i, name in enumerate(self.actuator_names)}
+        self.actuator_values = self.backend.get_actuator_values()
+        self.actuator_query = "SELECT name, value FROM plant WHERE name IN ({names})".format(
+            names=", ".join("?" * len(self.actuator_names)))
+        if self.tag_table:
+            self.actuator_slots = self.tag_table.slots(self.actuator_names)
+
+        self.attack_names = self.create_attack_header()
+        self.attack_index = {name: i for i, name in enumerate(self.attack_names)}
+        self.attack_flags = np.zeros(len(self.attack_names), dtype=np.int64)
+
     def _init_get_query(self):
         """Use prepared statement."""
 
@@ -545,11 +502,9 @@ class PhysicalPlant:
 
         self._get_query = get_query
 
-    def write_results(self, results):
-        """Writes ground truth file."""
-        with self.ground_truth_path.open(mode='w') as f:
-            writer = csv.writer(f)
-            writer.writerows(results)
+    def write_results(self):
+        """Writes the rows of the ground truth that are still buffered."""
+        self.ground_truth.flush()
 
     def get_plcs_ready(self, flag):
         """
@@ -559,6 +514,19 @@ class PhysicalPlant:
         res = self.db_query("""SELECT count(*) FROM sync WHERE flag != ?""", False, (str(flag),))
         return int(res) == 0
 
+    def wait_for_nodes(self, flag):
+        """
+        Blocks until all nodes have reported the given flag. With the socket barrier this waits
+        on the barrier, otherwise the sync table is polled every :code:`WAIT_FOR_FLAG` seconds.
+
+        :param flag: flag to wait for
+        """
+        if self.barrier:
+            self.barrier.wait_all(flag)
+            return
+        while not self.get_plcs_ready(flag):
+            time.sleep(self.WAIT_FOR_FLAG)
+
     def get_attack_flag(self, name):
         """
         Get the attack flag of this attack.
@@ -566,18 +534,36 @@ class PhysicalPlant:
         """
         return self.db_query("SELECT flag FROM attack WHERE name IS ?", False, (name,))
 
-    def get_actuator_status(self, actuator):
-        if isinstance(self.get_from_db(actuator), int):
-            # Actuator is either OPEN/CLOSED
-            return int(self.get_from_db(actuator))
-        else:
-            # Pump speed setting
-            #self.logger.debug('Pump setting value found: ' + str(float(self.get_from_db(actuator))))
-            return float(self.get_from_db(actuator))
+    def read_actuators(self):
+        """
+        Reads the status of all actuators with a single query.
+
+        :return: numpy array with the status of every actuator, in the order of :code:`actuator_names`
+        """
+        if self.tag_table:
+            self.actuator_values[:] = self.tag_table.read(self.actuator_slots)
+            return self.actuator_values
+
+        if self.actuator_names:
+            for name, value in self.db.fetchall(self.actuator_query, self.actuator_names):
+                self.actuator_values[self.actuator_index[name]] = float(value)
+        return self.actuator_values
+
+    def read_attack_flags(self):
+        """
+        Reads the flags of all device and network attacks with a single query.
+
+        :return: numpy array with the flag of every attack, in the order of the attack header
+        """
+        if self.attack_names:
+            for name, flag in self.db.fetchall("SELECT name, flag FROM attack"):
+                if name in self.attack_index:
+                    self.attack_flags[self.attack_index[name]] = int(flag)
+        return self.attack_flags
 
     def update_actuators(self):
-        for actuator in self.actuator_list:
-            self.actuator_list[actuator] = self.get_actuator_status(actuator)
+        """Applies the actuator statuses of the PLCs to the backend, for the next step."""
+        self.backend.apply_actuators(self.read_actuators())
 
     def convert_to_tuple(self, what):
         return what, 1
@@ -589,6 +575,10 @@ class PhysicalPlant:
         what_list overwrites the given what tuple,
         eg new what tuple: ``(value, what[0], what[1], ...)``
         """
+        if self.tag_table:
+            self.tag_table.set(what, value)
+            return value
+
         what_list = [value]
 
         what_tuple = self.convert_to_tuple(what)
@@ -596,39 +586,17 @@ class PhysicalPlant:
             what_list.append(pk)
         what = tuple(what_list)
 
-        for i in range(self.DB_TRIES):
-            with sqlite3.connect(self._path) as conn:
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute(self._set_query, what)
-                    conn.commit()
-                    return value
-
-                except sqlite3.OperationalError as e:
-                    self.logger.info('Failed writing to DB')
-                    time.sleep(self.db_sleep_time)
-        self.logger.error(
-            "Failed to connect to db. Tried {i} times.".format(i=self.DB_TRIES))
-        raise DatabaseError("Failed to set value to database")
+        self.db.execute(self._set_query, what)
+        return value
 
     def get_from_db(self, what):
         """Returns the first element of the result tuple."""
+        if self.tag_table:
+            return self.tag_table.get(what)
+
         what_tuple = self.convert_to_tuple(what)
 
-        for i in range(self.DB_TRIES):
-            with sqlite3.connect(self.db_path) as conn:
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute(self._get_query, what_tuple)
-                    record = cursor.fetchone()
-                    return record[0]
-
-                except sqlite3.OperationalError as e:
-                    self.logger.info('Failed reading to DB')
-                    time.sleep(self.db_sleep_time)
-        self.logger.error(
-            "Failed to connect to db. Tried {i} times.".format(i=self.DB_TRIES))
-        raise DatabaseError("Failed to get master clock from database")
+        return self.db.query(self._get_query, what_tuple)
 
     def main(self):
         """Runs the simulation for x iterations."""
@@ -652,229 +620,124 @@ class PhysicalPlant:
             p_bar = progressbar.ProgressBar(max_value=iteration_limit, widgets=widgets)
             p_bar.start()
 
-        if self.simulator == 'epynet':
-            self.simulate_with_epynet(iteration_limit, p_bar)
-        elif self.simulator == 'wntr':
-            self.simulate_with_wntr(iteration_limit, p_bar)
+        self.simulate(iteration_limit, p_bar)
         self.finish()
 
-    def simulate_with_epynet(self, iteration_limit, p_bar):
-        self.logger.info("Starting epynet simulation")
-        simulation_duration = iteration_limit*self.simulation_step
-        self.wn.set_time_params(duration=simulation_duration, hydraulic_step=self.simulation_step)
-        self.wn.init_simulation(interactive=True)
-        internal_epynet_step = 1
-        simulation_time = 0
-        step_results = None
+    def simulate(self, iteration_limit, p_bar):
+        """
+        Runs the iterations of the simulation. Every pass runs one step of the backend, steps that
+        solve an intermediate hydraulic time do not end an iteration: the nodes get the new plant
+        state, but the master time, the results and the checkpoints stay at the same iteration.
 
-        self.register_initial_results()
-        self.results_list.append(self.values_list)
+        :param iteration_limit: the iteration at which the simulation ends
+        :param p_bar: progress bar, or None
+        """
+        self.logger.info("Starting " + self.simulator + " simulation")
+        self.backend.start(iteration_limit - self.master_time)
 
-        while internal_epynet_step:
+        if not self.checkpoint:
+            self.register_initial_results()
+
+        self.profiler.start()
+        while self.master_time < iteration_limit:
 
             # We check that all PLCs updated their local caches and local CPPPO
-            while not self.get_plcs_ready(1):
-                time.sleep(self.WAIT_FOR_FLAG)
+            self.wait_for_nodes(1)
+            self.profiler.lap('publish')
 
             # Notify the PLCs they can start receiving remote values
             self.set_sync(2)
 
             # Wait for the PLCs to apply control logic
-            while not self.get_plcs_ready(3):
-                time.sleep(self.WAIT_FOR_FLAG)
+            self.wait_for_nodes(3)
+            self.profiler.lap('control')
 
             self.update_actuators()
-            #self.logger.debug('Actuator list: ' + str(self.actuator_list))
+            self.profiler.lap('actuators')
+
+            self.logger.debug("Iteration {x} out of {y}.".format(x=str(self.master_time), y=str(iteration_limit)))
 
             # Check for simulation error, print output on exception
             try:
-                internal_epynet_step, step_results = self.wn.simulate_step(simulation_time, self.actuator_list)
+                completed = self.backend.step()
             except Exception as exp:
-                self.logger.error(f"Error in Epynet simulation: {exp}")
+                self.logger.error(f"Error in {self.simulator} simulation: {exp}")
                 self.finish()
+                sys.exit(1)
+            self.profiler.lap('solve')
 
-            # Updates the SQLite DB
-            self.update_tanks(step_results)
-            self.update_pumps(step_results)
-            self.update_valves(step_results)
-            self.update_junctions(step_results)
+            # Reads the state of the network once, for the database and the results
+            self.backend.read_state()
 
-            # epynet - we skip intermediate timesteps
-            if (internal_epynet_step + simulation_time) // self.simulation_step > self.master_time:
-                skip_step = False
-            else:
-                skip_step = True
+            # Collects the new plant state
+            self.update_tanks()
+            self.update_pumps()
+            self.update_valves()
+            self.update_junctions()
+            self.profiler.lap('read_state')
 
-            if not skip_step:
+            if completed:
+                self.master_time = self.master_time + 1
 
-                self.master_time += 1
+            # Updates the plant state and master time in the SQLite DB
+            self.write_plant_state()
+            self.profiler.lap('write_state')
 
+            if completed:
                 if p_bar:
                     p_bar.update(self.master_time)
 
-                self.logger.debug("Iteration {x} out of {y}. Internal timestep {z}".format
-                                  (x=str(self.master_time),
-                                   y=str(iteration_limit), z=str(internal_epynet_step)))
-
                 # This becomes ground_truth.csv
-                self.register_results(step_results)
-                self.results_list.append(self.values_list)
+                self.register_results()
 
                 # Write results of this iteration if needed
                 if 'saving_interval' in self.data and self.master_time != 0 and \
                         self.master_time % self.data['saving_interval'] == 0:
-                    self.write_results(self.results_list)
-
-            # Set sync flags for nodes
-            self.set_sync(0)
-            #with sqlite3.connect(self.data["db_path"]) as conn:
-            #    c = conn.cursor()
-            #    c.execute("UPDATE sync SET flag=0")
-            #    conn.commit()
-
-            simulation_time = simulation_time + internal_epynet_step
-            conn = sqlite3.connect(self.data["db_path"])
-            c = conn.cursor()
-            c.execute("REPLACE INTO master_time (id, time) VALUES(1, ?)", (str(self.master_time),))
-            conn.commit()
-            #time.sleep(0.3)
-
-    def simulate_with_wntr(self, iteration_limit, p_bar):
-        self.logger.info("Starting WNTR simulation")
-        self.wn.options.time.duration = self.wn.options.time.hydraulic_timestep
-
-        self.register_initial_results()
-        self.results_list.append(self.values_list)
-
-        while self.master_time < iteration_limit:
-
-            # We check that all PLCs updated their local caches and local CPPPO
-            while not self.get_plcs_ready(1):
-                time.sleep(self.WAIT_FOR_FLAG)
-
-            # Notify the PLCs they can start receiving remote values
-            self.set_sync(2)
-            #with sqlite3.connect(self.data["db_path"]) as conn:
-            #    c = conn.cursor()
-            #    c.execute("UPDATE sync SET flag=2")
-            #    conn.commit()
-
-            # Wait for the PLCs to apply control logic
-            while not self.get_plcs_ready(3):
-                time.sleep(self.WAIT_FOR_FLAG)
-
-            self.update_controls()
-
-            self.logger.debug("Iteration {x} out of {y}.".format(x=str(self.master_time), y=str(iteration_limit)))
-
-            try:
-                self.sim.run_sim(convergence_error=True)
-            except Exception as exp:
-                self.logger.error(f"Error in WNTR simulation: {exp}")
-                self.finish()
-
-            # Updates the SQLite DB
-            self.update_tanks()
-            self.update_pumps()
-            self.update_valves()
-            self.update_junctions()
-
-            self.master_time = self.master_time + 1
-            conn = sqlite3.connect(self.data["db_path"])
-            c = conn.cursor()
-            c.execute("REPLACE INTO master_time (id, time) VALUES(1, ?)", (str(self.master_time),))
-            conn.commit()
+                    self.write_results()
+            self.profiler.lap('results')
 
-            if p_bar:
-                p_bar.update(self.master_time)
-
-            self.register_results()
-            self.results_list.append(self.values_list)
-
-            # Write results of this iteration if needed
-            if 'saving_interval' in self.data and self.master_time != 0 and \
-                    self.master_time % self.data['saving_interval'] == 0:
-                self.write_results(self.results_list)
+            if completed and self.checkpoint_due():
+                self.save_checkpoint()
+            self.profiler.lap('checkpoint')
 
             # Set sync flags for nodes
             self.set_sync(0)
-            #with sqlite3.connect(self.data["db_path"]) as conn:
-            #    c = conn.cursor()
-            #    c.execute("UPDATE sync SET flag=0")
-            #    conn.commit()
-
-    def update_tanks(self, network_state=None):
-        """Update tanks in database."""
-
-        if self.simulator == 'epynet':
-            for tank in self.tank_list:
-                level = network_state[tank]['pressure']
-                tank_name = tank
-                #self.logger.debug('Writing to DB tank: ' + str(tank_name) + ' with level: ' + str(level))
-                self.set_to_db(tank_name, level)
-
-        elif self.simulator == 'wntr':
-            conn = sqlite3.connect(self.data["db_path"])
-            c = conn.cursor()
-            for tank in self.tank_list:
-                a_level = self.wn.get_node(tank).level
-                c.execute(self.db_update_string, (str(a_level), tank,))
-                conn.commit()
-        else:
-            return
+            self.profiler.lap('sync')
+            self.profiler.end_iteration(self.master_time)
 
-    def update_pumps(self, network_state=None):
-        """"Update pumps in database."""
-        if self.simulator == 'epynet':
-            for pump in self.pump_list:
-                flow = network_state[pump]['flow']
-                pump_name = pump + 'F'
-                self.set_to_db(pump_name, flow)
-
-        elif self.simulator == 'wntr':
-            conn = sqlite3.connect(self.data["db_path"])
-            c = conn.cursor()
-            for pump in self.pump_list:
-                flow = Decimal(self.wn.get_link(pump).flow)
-                c.execute(self.db_update_string, (str(flow), pump + "F",))
-                conn.commit()
+    def write_plant_state(self):
+        """
+        Writes the plant state collected by the update methods, together with the master time.
+        In the database, the tags and the master time are written in a single transaction. With
+        the tag table, the tags are one update and the master time a separate write. In both cases
+        the PLCs only read them after the iteration barrier, so they never read a half updated
+        plant. Names without a tag are skipped.
+        """
+        if self.tag_table:
+            self.tag_table.update(self.plant_state)
+            self.db.execute(self.master_time_string, (str(self.master_time),))
         else:
-            return
+            tag_parameters = [(str(value), name) for name, value in self.plant_state.items()]
+            self.db.transaction([(self.db_update_string, tag_parameters),
+                                 (self.master_time_string, [(str(self.master_time),)])])
+        self.plant_state = {}
 
-    def update_valves(self, network_state=None):
-        """Update valve in database."""
-        if self.simulator == 'epynet':
-            for valve in self.valve_list:
-                flow = network_state[valve]['flow']
-                valve_name = valve + 'F'
-                self.set_to_db(valve_name, flow)
-
-        elif self.simulator == 'wntr':
-            conn = sqlite3.connect(self.data["db_path"])
-            c = conn.cursor()
-            for valve in self.valve_list:
-                flow = Decimal(self.wn.get_link(valve).flow)
-                c.execute(self.db_update_string, (str(flow), valve + "F",))
-                conn.commit()
-        else:
-            return
+    def update_tanks(self):
+        """Collect tank levels for :meth:`write_plant_state`."""
+        self.plant_state.update(zip(self.tank_list, self.backend.state.tank_levels.tolist()))
 
-    def update_junctions(self, network_state=None):
-        """Update junction pressure in database."""
-        if self.simulator == 'epynet':
-            for junction in self.scada_junction_list:
-                level = self.wn.junctions[junction].pressure.iloc[-1]
-                junction_name = junction
-                self.set_to_db(junction_name, level)
-        elif self.simulator == 'wntr':
-            conn = sqlite3.connect(self.data["db_path"])
-            c = conn.cursor()
-            for junction in self.scada_junction_list:
-                level = Decimal(self.wn.get_node(junction).head - self.wn.get_node(junction).elevation)
-                c.execute(self.db_update_string, (str(level), junction,))
-                conn.commit()
-        else:
-            return
+    def update_pumps(self):
+        """"Collect pump flows for :meth:`write_plant_state`."""
+        self.plant_state.update(zip(self.pump_tags, self.backend.state.pump_flows.tolist()))
+
+    def update_valves(self):
+        """Collect valve flows for :meth:`write_plant_state`."""
+        self.plant_state.update(zip(self.valve_tags, self.backend.state.valve_flows.tolist()))
+
+    def update_junctions(self):
+        """Collect junction pressures for :meth:`write_plant_state`."""
+        pressures = self.backend.state.junction_pressures[self.scada_junction_indices]
+        self.plant_state.update(zip(self.scada_junction_list, pressures.tolist()))
 
     def interrupt(self, sig, frame):
         self.finish()
@@ -882,7 +745,14 @@ class PhysicalPlant:
         sys.exit(0)
 
     def finish(self):
-        self.write_results(self.results_list)
+        if self.barrier:
+            self.barrier.stop()
+        self.logger.debug("Database statistics: " + str(self.db.stats()))
+        self.ground_truth.close()
+        self.backend.close()
+        profile_summary = self.profiler.close()
+        if profile_summary:
+            self.logger.info(profile_summary)
         end_time = datetime.now()
 
         if 'batch_simulations' in self.data:
@@ -900,37 +770,21 @@ class PhysicalPlant:
                                    end_time, False, self.master_time, self.wn, self.simulation_step).write_readme()
 
     def set_initial_values(self):
-        """Sets custom initial values for tanks and demand patterns in the WNTR simulation"""
+        """Sets custom initial values for tanks and demand patterns in the simulation"""
 
         if "initial_tank_values" in self.data:
             # Initial tank values
 
             self.logger.debug("Using custom initial tank levels: " + str(self.data["initial_tank_values"]))
 
-            for tank in self.tank_list:
-                if str(tank) in self.data["initial_tank_values"]:
-                    value = float(self.data["initial_tank_values"][str(tank)])
-
-                    if self.simulator == 'epynet':
-                        self.wn.tanks[tank].tanklevel = value
-                    else:
-                        self.wn.get_node(tank).init_level = value
+            self.backend.set_initial_levels({tank: float(self.data["initial_tank_values"][str(tank)])
+                                             for tank in self.tank_list
+                                             if str(tank) in self.data["initial_tank_values"]})
 
         if "demand_patterns_data" in self.data:
             # Demand patterns for batch
-            demands = pd.read_csv(self.data["demand_patterns_data"])
-
-            if self.data["simulator"] == 'epynet':
-                for pattern in self.wn.patterns.uid:
-                    self.wn.set_demand_pattern(pattern, demands[pattern].tolist())
-            else:
-                for name, pat in self.wn.patterns():
-                    if name in demands:
-                        self.logger.debug("Setting demands for " + name +
-                                          " to demands defined at: " + self.data["demand_patterns_data"])
-                        pat.multipliers = demands[name].values.tolist()
-                    else:
-                        self.logger.debug("Consumer " + name + " has no demands defined, using default...")
+            self.logger.debug("Using demands defined at: " + self.data["demand_patterns_data"])
+            self.backend.set_demand_patterns(pd.read_csv(self.data["demand_patterns_data"]))
 
 
 def is_valid_file(test_parser, arg):
@@ -48,10 +48,10 @@ class PlantControl(NodeControl):
         process to finish.
         """
 
-        if self.data['simulator'] == 'wntr' or self.data['simulator'] == 'epynet':
+        if self.data['simulator'] in ('wntr', 'epynet', 'epanet', 'surrogate'):
             physical_process_path = Path(__file__).parent.absolute().parent / "physical_process.py"
         else:
-            raise UnsupportedSimulator('Supported simulators are wntr, epynet')
+            raise UnsupportedSimulator('Supported simulators are wntr, epynet, epanet, surrogate')
 
         cmd = ["python3", str(physical_process_path), str(self.intermediate_yaml)]
 
@@ -11,6 +11,7 @@ import yaml
 from datetime import datetime
 from minicps.mcps import MiniCPS
 from mininet.net import Mininet
+from mininet.node import Controller
 from mininet.cli import CLI
 from mininet.link import TCLink
 
@@ -29,6 +30,9 @@ class GeneralCPS(MiniCPS):
     PROCESS_TIMEOUT = 1.0
     """Timeout between sending SIGINT, SIGTERM, and a SIGKILL"""
 
+    CONTROLLER_PORT = 6653
+    """Port of the OpenFlow controller, batches that run at the same time use the next ports"""
+
     def __init__(self, intermediate_yaml):
 
         # Create logs directory in working directory
@@ -63,7 +67,13 @@ class GeneralCPS(MiniCPS):
         else:
             topo = SimpleTopo(self.intermediate_yaml)
 
-        self.net = Mininet(topo=topo, autoSetMacs=False, link=TCLink)
+        if 'network_index' in self.data:
+            # Batches that run at the same time each need their own controller
+            network_index = self.data['network_index']
+            controller = Controller('c' + str(network_index), port=self.CONTROLLER_PORT + network_index)
+            self.net = Mininet(topo=topo, autoSetMacs=False, link=TCLink, controller=controller)
+        else:
+            self.net = Mininet(topo=topo, autoSetMacs=False, link=TCLink)
 
         self.net.start()
 
@@ -266,15 +276,42 @@ class GeneralCPS(MiniCPS):
             except Exception as msg:
                 self.logger.error("Exception shutting down plant_process: " + str(msg))
 
-        cmd = 'sudo pkill -f "python3 -m cpppo.server.enip"'
-        subprocess.call(cmd, shell=True, stderr=sys.stderr, stdout=sys.stdout)
-
-        cmd = 'sudo pkill -f "python3 -m cpppo.server.enip.client"'
-        subprocess.call(cmd, shell=True, stderr=sys.stderr, stdout=sys.stdout)
+        self.end_enip_processes()
 
         self.net.stop()
         sys.exit(0)
 
+    def end_enip_processes(self):
+        """
+        End the ENIP servers and clients left behind by the nodes. When batches run at the same
+        time, the other batches use the same addresses, so only the processes in the network
+        namespaces of the nodes of this network are ended.
+        """
+        if 'network_index' not in self.data:
+            cmd = 'sudo pkill -f "python3 -m cpppo.server.enip"'
+            subprocess.call(cmd, shell=True, stderr=sys.stderr, stdout=sys.stdout)
+
+            cmd = 'sudo pkill -f "python3 -m cpppo.server.enip.client"'
+            subprocess.call(cmd, shell=True, stderr=sys.stderr, stdout=sys.stdout)
+            return
+
+        namespaces = set()
+        for host in self.net.hosts:
+            try:
+                namespaces.add(os.readlink('/proc/{pid}/ns/net'.format(pid=host.pid)))
+            except OSError:
+                pass
+
+        pids = subprocess.run(['pgrep', '-f', 'python3 -m cpppo.server.enip'], stdout=subprocess.PIPE,
+                              universal_newlines=True).stdout.split()
+        for pid in pids:
+            try:
+                if os.readlink('/proc/{pid}/ns/net'.format(pid=pid)) in namespaces:
+                    os.kill(int(pid), signal.SIGTERM)
+            except OSError:
+                # The process has already ended
+                pass
+
     def write_mininet_links(self):
         """Writes mininet links file."""
         if 'batch_simulations' in self.data:
@@ -4,20 +4,48 @@ from minicps.devices import PLC
 
 class BasePLC(PLC):
 
+    tag_table = None
+    """Memory mapped tag table of the experiment, the plant table of the database is used when None"""
+
+    def get(self, what):
+        """
+        Gets the value of a local tag from the tag table, or from the database through MiniCPS.
+        :param what: tuple with the name of the tag and its pid
+        """
+        if self.tag_table:
+            return self.tag_table.get(what[0])
+        return super(BasePLC, self).get(what)
+
+    def set(self, what, value):
+        """
+        Sets the value of a local tag in the tag table, or in the database through MiniCPS.
+        :param what: tuple with the name of the tag and its pid
+        :param value: the new value
+        """
+        if self.tag_table:
+            self.tag_table.set(what[0], value)
+            return value
+        return super(BasePLC, self).set(what, value)
+
     # Pulls a fresh value from the local DB and updates the local CPPPO
-    def send_system_state(self):
+    def send_system_state(self, snapshot=None):
+        """
+        Publishes the sensors and actuators of this PLC on its ENIP server.
+        :param snapshot: (Default value = None) dictionary with the values of the tags read at the
+           start of the iteration, the tags are read one by one when not given
+        """
         values = []
         # Send sensor values (may have gaussian noise)
         for tag in self.sensors:
             # noinspection PyBroadException
             try:
+                sensor_value = float(self.get(tag) if snapshot is None else snapshot[tag[0]])
                 # Gaussian noise added with respect to noise_scale
                 if self.noise_scale != 0:
-                    sensor_value = float(self.get(tag))
                     noise_value = np.random.normal(0, self.noise_scale*sensor_value)
                     values.append(sensor_value + noise_value)
                 else:
-                    values.append(float(self.get(tag)))
+                    values.append(sensor_value)
             except Exception:
                 self.logger.error("Exception trying to get the tag.")
                 continue
@@ -25,7 +53,7 @@ class BasePLC(PLC):
         for tag in self.actuators:
             # noinspection PyBroadException
             try:
-                values.append(self.get(tag))
+                values.append(self.get(tag) if snapshot is None else snapshot[tag[0]])
             except Exception:
                 self.logger.error("Exception trying to get the tag.")
                 continue
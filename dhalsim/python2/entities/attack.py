@@ -1,5 +1,7 @@
 from abc import ABCMeta, abstractmethod
 
+from .lookahead import UNBOUNDED, threshold_horizon, time_horizon
+
 
 class Attack:
     """Defines an attack executed by a PLC (device or network attack)
@@ -28,6 +30,16 @@ class Attack:
         """
         pass
 
+    def horizon(self, plc, clock):
+        """
+        Gets the amount of iterations during which this attack cannot start or stop.
+
+        :param plc: the PLC that applies the attack
+        :param clock: the iteration of the scan
+        :return: amount of iterations, 0 when the attack has to be applied every step
+        """
+        return 0
+
 
 class TimeAttack(Attack):
     """
@@ -63,6 +75,19 @@ class TimeAttack(Attack):
         else:
             plc.set_attack_flag(False, self.name)
 
+    def horizon(self, plc, clock):
+        """
+        Gets the amount of iterations until the attack starts or ends.
+
+        :param plc: the PLC that applies the attack
+        :param clock: the iteration of the scan
+        """
+        if clock > self.end:
+            return UNBOUNDED
+        if clock < self.start:
+            return time_horizon(clock, self.start)
+        return time_horizon(clock, self.end + 1)
+
 
 class TriggerBelowAttack(Attack):
     """
@@ -101,6 +126,15 @@ class TriggerBelowAttack(Attack):
         else:
             plc.set_attack_flag(False, self.name)
 
+    def horizon(self, plc, clock):
+        """
+        Gets the amount of iterations the sensor needs to reach the value at its maximum rate.
+
+        :param plc: the PLC that applies the attack
+        :param clock: the iteration of the scan
+        """
+        return threshold_horizon(plc.get_tag(self.sensor), self.value, plc.get_rate(self.sensor))
+
 
 class TriggerAboveAttack(Attack):
     """
@@ -139,6 +173,15 @@ class TriggerAboveAttack(Attack):
         else:
             plc.set_attack_flag(False, self.name)
 
+    def horizon(self, plc, clock):
+        """
+        Gets the amount of iterations the sensor needs to reach the value at its maximum rate.
+
+        :param plc: the PLC that applies the attack
+        :param clock: the iteration of the scan
+        """
+        return threshold_horizon(plc.get_tag(self.sensor), self.value, plc.get_rate(self.sensor))
+
 
 class TriggerBetweenAttack(Attack):
     """
@@ -177,3 +220,45 @@ class TriggerBetweenAttack(Attack):
             plc.set_tag(self.actuator, self.command)
         else:
             plc.set_attack_flag(False, self.name)
+
+    def horizon(self, plc, clock):
+        """
+        Gets the amount of iterations the sensor needs to reach one of the values at its maximum
+        rate.
+
+        :param plc: the PLC that applies the attack
+        :param clock: the iteration of the scan
+        """
+        sensor_value = plc.get_tag(self.sensor)
+        rate = plc.get_rate(self.sensor)
+        return min(threshold_horizon(sensor_value, self.lower_value, rate),
+                   threshold_horizon(sensor_value, self.upper_value, rate))
+
+
+def create_attacks(attack_list):
+    """This function will create an array of DeviceAttacks
+    :param attack_list: A list of attack dicts that need to be converted to DeviceAttacks
+    """
+    attacks = []
+    for attack in attack_list:
+        if attack['trigger']['type'].lower() == "time":
+            attacks.append(
+                TimeAttack(attack['name'], attack['actuator'], attack['command'],
+                           attack['trigger']['start'], attack['trigger']['end']))
+        elif attack['trigger']['type'].lower() == "above":
+            attacks.append(
+                TriggerAboveAttack(attack['name'], attack['actuator'], attack['command'],
+                                   attack['trigger']['sensor'],
+                                   attack['trigger']['value']))
+        elif attack['trigger']['type'].lower() == "below":
+            attacks.append(
+                TriggerBelowAttack(attack['name'], attack['actuator'], attack['command'],
+                                   attack['trigger']['sensor'],
+                                   attack['trigger']['value']))
+        elif attack['trigger']['type'].lower() == "between":
+            attacks.append(
+                TriggerBetweenAttack(attack['name'], attack['actuator'], attack['command'],
+                                     attack['trigger']['sensor'],
+                                     attack['trigger']['lower_value'],
+                                     attack['trigger']['upper_value']))
+    return attacks
@@ -1,5 +1,7 @@
 from abc import ABCMeta, abstractmethod
 
+from .lookahead import threshold_horizon, time_horizon
+
 class Control:
     """Defines a control for a PLC to enforce
 
@@ -24,6 +26,16 @@ class Control:
         """
         pass
 
+    def horizon(self, generic_plc, clock):
+        """
+        Gets the amount of iterations during which the outcome of this control cannot change.
+
+        :param generic_plc: the PLC that applies the control
+        :param clock: the iteration of the scan
+        :return: amount of iterations, 0 when the control has to be applied every step
+        """
+        return 0
+
 
 class BelowControl(Control):
     """
@@ -48,6 +60,16 @@ class BelowControl(Control):
             #    generic_plc.intermediate_plc["name"] + " applied " + str(self) +
             #    " because dep_val " + str(dep_val) + ".")
 
+    def horizon(self, generic_plc, clock):
+        """
+        Gets the amount of iterations the dependant needs to reach the value at its maximum rate.
+
+        :param generic_plc: the PLC that applies the control
+        :param clock: the iteration of the scan
+        """
+        return threshold_horizon(generic_plc.get_tag(self.dependant), self.value,
+                                 generic_plc.get_rate(self.dependant))
+
     def __str__(self):
         return "Control if {dependant} < {value} then set {actuator} to {action}".format(
             dependant=self.dependant, value=self.value, actuator=self.actuator, action=self.action)
@@ -76,6 +98,16 @@ class AboveControl(Control):
             # generic_plc.logger.debug(
             #     generic_plc.intermediate_plc["name"] + " applied " + str(self) + " because dep_val " + str(dep_val))
 
+    def horizon(self, generic_plc, clock):
+        """
+        Gets the amount of iterations the dependant needs to reach the value at its maximum rate.
+
+        :param generic_plc: the PLC that applies the control
+        :param clock: the iteration of the scan
+        """
+        return threshold_horizon(generic_plc.get_tag(self.dependant), self.value,
+                                 generic_plc.get_rate(self.dependant))
+
     def __str__(self):
         return "Control if {dependant} > {value} then set {actuator} to {action}".format(
             dependant=self.dependant, value=self.value, actuator=self.actuator, action=self.action)
@@ -97,6 +129,39 @@ class TimeControl(Control):
             #generic_plc.logger.debug(
             #    generic_plc.intermediate_plc["name"] + " applied " + str(self) + " because curr_time " + str(curr_time))
 
+    def horizon(self, generic_plc, clock):
+        """
+        Gets the amount of iterations until the time of this control.
+
+        :param generic_plc: the PLC that applies the control
+        :param clock: the iteration of the scan
+        """
+        return time_horizon(clock, self.value)
+
     def __str__(self):
         return "Control if time = {value} then set {actuator} to {action}".format(
             value=self.value, actuator=self.actuator, action=self.action)
+
+
+def create_controls(controls_list):
+    """
+    Generates list of control objects for a plc
+    :param controls_list: a list of the control dicts to be converted to Control objects
+    """
+    ret = []
+    for control in controls_list:
+        if control["type"].lower() == "above":
+            control_instance = AboveControl(control["actuator"], control["action"],
+                                            control["dependant"],
+                                            control["value"])
+            ret.append(control_instance)
+        if control["type"].lower() == "below":
+            control_instance = BelowControl(control["actuator"], control["action"],
+                                            control["dependant"],
+                                            control["value"])
+            ret.append(control_instance)
+        if control["type"].lower() == "time":
+            control_instance = TimeControl(control["actuator"], control["action"],
+                                           control["value"])
+            ret.append(control_instance)
+    return ret
@@ -0,0 +1,69 @@
+import math
+
+UNBOUNDED = float('inf')
+"""Horizon of a condition that cannot change anymore"""
+
+
+def get_lookahead(data):
+    """
+    Gets the lookahead options of the experiment. Network attacks and network events can change
+    the values a PLC reads at any moment, so PLCs scan every iteration when there are any.
+
+    :param data: the data of the intermediate yaml
+    :return: dictionary with :code:`max_steps` and :code:`rates`, or None without lookahead
+    """
+    if 'lookahead' not in data or data.get('network_attacks') or data.get('network_events'):
+        return None
+    return data['lookahead']
+
+
+def threshold_horizon(value, threshold, rate):
+    """
+    Gets the amount of iterations a tag needs to reach a threshold when it changes at its maximum
+    rate. A condition comparing the tag to the threshold keeps its outcome during that many
+    iterations, also in the hydraulic steps in between.
+
+    :param value: the current value of the tag
+    :param threshold: the value the tag is compared to
+    :param rate: maximum change of the tag in one iteration, None when the tag has no bound
+    :return: amount of iterations, 0 when the condition can change before the next iteration
+    """
+    if rate is None:
+        return 0
+    if rate == 0:
+        return UNBOUNDED
+    return int(math.floor(abs(value - threshold) / rate))
+
+
+def time_horizon(clock, at):
+    """
+    Gets the amount of iterations until the master clock reaches an iteration. When the clock is
+    at that iteration, the condition only holds during this scan, so the next one has to run.
+
+    :param clock: the current iteration
+    :param at: the iteration a condition holds at
+    :return: amount of iterations, :code:`UNBOUNDED` when the iteration has passed
+    """
+    if at > clock:
+        return at - clock
+    if at == clock:
+        return 1
+    return UNBOUNDED
+
+
+def safe_horizon(plc, clock, max_steps):
+    """
+    Gets the amount of iterations during which none of the controls and device attacks of a PLC
+    can change an actuator or an attack flag, given the values the PLC reads now and the rates
+    of the lookahead options. Scans of the PLC before that iteration would only repeat the
+    current one.
+
+    :param plc: the PLC, offering :code:`get_tag` and :code:`get_rate`
+    :param clock: the iteration of the scan
+    :param max_steps: maximum amount of iterations to return
+    :return: amount of iterations, 0 when the PLC has to scan again in the next step
+    """
+    horizon = max_steps
+    for entity in plc.controls + plc.attacks:
+        horizon = min(horizon, entity.horizon(plc, clock))
+    return horizon
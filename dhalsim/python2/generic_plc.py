@@ -1,17 +1,21 @@
 import argparse
 import os.path
-import sqlite3
 import time
 from pathlib import Path
-import random
 
 import sys
 import yaml
 
 from basePLC import BasePLC
-from entities.attack import TimeAttack, TriggerBelowAttack, TriggerAboveAttack, TriggerBetweenAttack
-from entities.control import AboveControl, BelowControl, TimeControl
+from entities.attack import create_attacks
+from entities.control import create_controls
+from entities.lookahead import get_lookahead, safe_horizon
 from dhalsim import py3_logger
+from dhalsim.barrier import BarrierError, get_barrier_client
+# DatabaseError is re-exported on purpose: the queries of this module raise it, and callers import it from here
+from dhalsim.db_client import DatabaseError, get_database_client  # noqa: F401
+from dhalsim.tag_directory import get_tag_directory
+from dhalsim.tag_table import get_tag_table
 import threading
 import signal
 
@@ -28,10 +32,6 @@ class InvalidControlValue(Error):
     """Raised when tag you are looking for does not exist"""
 
 
-class DatabaseError(Error):
-    """Raised when not being able to connect to the database"""
-
-
 class GenericPLC(BasePLC):
     """
     This class represents a plc. This plc knows what it is connected to by reading the
@@ -47,6 +47,24 @@ class GenericPLC(BasePLC):
     PLC_CACHE_UPDATE_TIME = 0.05
     """ Time in seconds the SCADA server updates its cache"""
 
+    snapshot = None
+    """Values of the local tags read at the start of the current iteration, None before the first"""
+
+    snapshot_clock = None
+    """Master clock read together with :code:`snapshot`"""
+
+    pending_writes = None
+    """Actuator values set during the current scan, written at its end. None outside of a scan"""
+
+    pending_flags = None
+    """Attack flags changed during the current scan, written at its end. None outside of a scan"""
+
+    WRITE_QUERY = "UPDATE plant SET value = ? WHERE name = ?"
+    """Query to write an actuator value in the plant table"""
+
+    FLAG_QUERY = "UPDATE attack SET flag=? WHERE name IS ?"
+    """Query to write an attack flag in the attack table"""
+
     def __init__(self, intermediate_yaml_path, yaml_index):
         self.yaml_index = yaml_index
 
@@ -57,12 +75,28 @@ class GenericPLC(BasePLC):
 
         self.intermediate_plc = self.intermediate_yaml["plcs"][self.yaml_index]
 
+        self.barrier = get_barrier_client(self.intermediate_yaml, self.intermediate_plc["name"])
+        self.tag_table = get_tag_table(self.intermediate_yaml)
+
         if 'sensors' not in self.intermediate_plc:
             self.intermediate_plc['sensors'] = []
 
         if 'actuators' not in self.intermediate_plc:
             self.intermediate_plc['actuators'] = []
 
+        # Owners of the tags of all PLCs, and the tags connected to this PLC
+        self.tag_directory = get_tag_directory(self.intermediate_yaml)
+        self.local_tags = self.tag_directory.tags_of(self.intermediate_plc['name'])
+
+        # Local tags read in one query at the start of every iteration, together with the clock
+        self.snapshot_tags = [tag for tag in self.intermediate_plc['sensors'] + self.intermediate_plc['actuators']
+                              if tag != ""]
+        self.snapshot_query = "SELECT name, value FROM plant WHERE name IN ({names}) " \
+                              "UNION ALL SELECT NULL, time FROM master_time WHERE id IS 1".format(
+                                  names=", ".join("?" * len(self.snapshot_tags)))
+        if self.tag_table:
+            self.snapshot_slots = self.tag_table.slots(self.snapshot_tags)
+
         self.intermediate_controls = self.intermediate_plc['controls']
         self.controls = self.create_controls(self.intermediate_controls)
 
@@ -71,6 +105,13 @@ class GenericPLC(BasePLC):
         else:
             self.attacks = []
 
+        # The attack table starts with all flags at 0, flags are only written when they change
+        self.attack_flags = {attack.name: False for attack in self.attacks}
+
+        # Controls and device attacks are only applied again when they could change an actuator
+        self.lookahead = get_lookahead(self.intermediate_yaml)
+        self.next_scan = 0
+
         # Create state from db values
         state = {
             'name': "plant",
@@ -105,6 +146,13 @@ class GenericPLC(BasePLC):
         self.cache = {}
         self.tag_fresh = {}
 
+        # The cache thread counts the tags it refreshed since the start of the scan, and notifies
+        # the main loop when all of them are fresh
+        self.cache_condition = threading.Condition()
+        self.fresh_count = 0
+        self.cache_deadline = self.intermediate_yaml.get('cache_deadline')
+        self.stale_scans = 0
+
         self.update_cache_flag = False
         self.plcs_ready = False
         self.plc_run = True
@@ -113,6 +161,11 @@ class GenericPLC(BasePLC):
             self.cache[tag] = float(0)
             self.tag_fresh[tag] = False
 
+        # Cached tags grouped by the PLC they are received from, and the iteration of the last
+        # successful receive of every tag
+        self.cache_groups = self.tag_directory.group_by_owner(self.cache, exclude=self.intermediate_plc['name'])
+        self.cache_clock = {}
+
         self.do_super_construction(plc_protocol, state)
 
     def do_super_construction(self, plc_protocol, state):
@@ -167,52 +220,14 @@ class GenericPLC(BasePLC):
         Generates list of control objects for a plc
         :param controls_list: a list of the control dicts to be converted to Control objects
         """
-        ret = []
-        for control in controls_list:
-            if control["type"].lower() == "above":
-                control_instance = AboveControl(control["actuator"], control["action"],
-                                                control["dependant"],
-                                                control["value"])
-                ret.append(control_instance)
-            if control["type"].lower() == "below":
-                control_instance = BelowControl(control["actuator"], control["action"],
-                                                control["dependant"],
-                                                control["value"])
-                ret.append(control_instance)
-            if control["type"].lower() == "time":
-                control_instance = TimeControl(control["actuator"], control["action"],
-                                               control["value"])
-                ret.append(control_instance)
-        return ret
+        return create_controls(controls_list)
 
     @staticmethod
     def create_attacks(attack_list):
         """This function will create an array of DeviceAttacks
         :param attack_list: A list of attack dicts that need to be converted to DeviceAttacks
         """
-        attacks = []
-        for attack in attack_list:
-            if attack['trigger']['type'].lower() == "time":
-                attacks.append(
-                    TimeAttack(attack['name'], attack['actuator'], attack['command'],
-                               attack['trigger']['start'], attack['trigger']['end']))
-            elif attack['trigger']['type'].lower() == "above":
-                attacks.append(
-                    TriggerAboveAttack(attack['name'], attack['actuator'], attack['command'],
-                                       attack['trigger']['sensor'],
-                                       attack['trigger']['value']))
-            elif attack['trigger']['type'].lower() == "below":
-                attacks.append(
-                    TriggerBelowAttack(attack['name'], attack['actuator'], attack['command'],
-                                       attack['trigger']['sensor'],
-                                       attack['trigger']['value']))
-            elif attack['trigger']['type'].lower() == "between":
-                attacks.append(
-                    TriggerBetweenAttack(attack['name'], attack['actuator'], attack['command'],
-                                         attack['trigger']['sensor'],
-                                         attack['trigger']['lower_value'],
-                                         attack['trigger']['upper_value']))
-        return attacks
+        return create_attacks(attack_list)
 
     def pre_loop(self, sleep=0.5):
         """
@@ -224,7 +239,6 @@ class GenericPLC(BasePLC):
         signal.signal(signal.SIGTERM, self.sigint_handler)
 
         self.logger.debug(self.intermediate_plc['name'] + ' enters pre_loop')
-        self.db_sleep_time = random.uniform(0.01, 0.1)
 
         sensors = self.generate_tags(self.intermediate_plc['sensors'])
         actuators = self.generate_tags(self.intermediate_plc['actuators'])
@@ -256,7 +270,9 @@ class GenericPLC(BasePLC):
         :rtype: int
         :raise: TagDoesNotExist if tag cannot be found
         """
-        if tag in self.intermediate_plc["sensors"] or tag in self.intermediate_plc["actuators"]:
+        if tag in self.local_tags:
+            if self.snapshot is not None:
+                return self.snapshot[tag]
             return float(self.get((tag, 1)))
 
         if tag in self.cache:
@@ -265,24 +281,33 @@ class GenericPLC(BasePLC):
         self.logger.warning(
             "Cache miss in {plc} for tag {tag}".format(plc=self.intermediate_plc["name"], tag=tag))
 
-        for i, plc_data in enumerate(self.intermediate_yaml["plcs"]):
-            if i == self.yaml_index:
-                continue
-            if tag in plc_data["sensors"] or tag in plc_data["actuators"]:
-                received = float(self.receive((tag, 1), plc_data["public_ip"]))
-                return received
+        owner = self.tag_directory.owner(tag, exclude=self.intermediate_plc["name"])
+        if owner:
+            return float(self.receive((tag, 1), owner.public_ip))
 
         raise TagDoesNotExist(tag)
 
-    def get_tag_for_cache(self, tag, plc_ip, cache_update_time):
+    def get_tags_for_cache(self, tags, plc_ip, cache_update_time):
+        """
+        Receives a group of tags owned by one PLC with a single request, and stores them in the
+        cache.
+        :param tags: names of the tags to receive
+        :param plc_ip: ip of the PLC that owns the tags
+        :param cache_update_time: time in seconds to wait before retrying
+        :return: True if the tags were received, False otherwise
+        """
         for retry in range(self.UPDATE_RETRIES):
             try:
-                self.cache[tag] = float(self.receive((tag, 1), plc_ip))
+                values = self.receive_multiple([(tag, 1) for tag in tags], plc_ip)
+                if len(values) != len(tags):
+                    raise ValueError("received {n} values for {m} tags".format(n=len(values), m=len(tags)))
+                for tag, value in zip(tags, values):
+                    self.cache[tag] = float(value)
                 return True
             except Exception as e:
                 self.logger.info(
-                    "{plc} receive {tag} from {ip} failed with exception '{e}'".format(
-                        plc=self.intermediate_plc["name"], tag=tag,
+                    "{plc} receive {tags} from {ip} failed with exception '{e}'".format(
+                        plc=self.intermediate_plc["name"], tags=tags,
                         ip=plc_ip, e=str(e)))
                 if self.update_cache_flag:
                     time.sleep(cache_update_time)
@@ -294,26 +319,74 @@ class GenericPLC(BasePLC):
 
     def update_cache(self, cache_update_time):
         """
-        Update the cache of this plc by receiving all the required tags.
-        When something cannot be received, the previous value is used.
+        Update the cache of this plc by receiving all the required tags, one request per PLC
+        that owns some of them. The tags of a request are stamped with the iteration read before
+        it. When something cannot be received, the previous value is used.
         """
         while self.update_cache_flag:
-            for cached_tag in self.cache:
-                for i, plc_data in enumerate(self.intermediate_yaml["plcs"]):
-                    # Skip ourselves from the cacheupdate. This is done by basePLC module
-                    if i == self.yaml_index:
-                        continue
+            for plc_ip, tags in self.cache_groups:
+                clock = self.read_master_clock()
+                received = self.get_tags_for_cache(tags, plc_ip, cache_update_time)
+
+                with self.cache_condition:
+                    for tag in tags:
+                        if received:
+                            self.cache_clock[tag] = clock
+                        else:
+                            self.logger.info("Warning: Cache for tag {tag} could not be updated, using the value of "
+                                             "iteration {clock}".format(tag=tag, clock=self.cache_clock.get(tag)))
+                        if not self.tag_fresh[tag]:
+                            self.tag_fresh[tag] = True
+                            self.fresh_count += 1
+                    if self.cache_is_fresh():
+                        self.cache_condition.notify_all()
+
+    def cache_is_fresh(self):
+        """
+        Checks if all tags of the cache have been received since the start of the scan.
+        :return: True when they have
+        """
+        return self.fresh_count >= len(self.tag_fresh)
 
-                    if cached_tag in plc_data["sensors"] or cached_tag in plc_data["actuators"]:
+    def wait_for_cache(self, clock):
+        """
+        Marks all tags of the cache as stale and waits until the cache thread received all of them
+        again. With :code:`cache_deadline`, it waits at most that many seconds and then continues
+        with the last received values, logging which tags were stale.
+        :param clock: The iteration of the scan
+        """
+        with self.cache_condition:
+            for tag in self.tag_fresh:
+                self.tag_fresh[tag] = False
+            self.fresh_count = 0
+            self.cache_condition.wait_for(self.cache_is_fresh, self.cache_deadline)
+            stale = [tag for tag, fresh in self.tag_fresh.items() if not fresh]
 
-                        start_iteration = self.get_master_clock()
-                        res = self.get_tag_for_cache(cached_tag, plc_data["public_ip"], cache_update_time)
-                        if self.get_master_clock() == start_iteration:
-                            self.tag_fresh[cached_tag] = res
+        if stale:
+            self.stale_scans += 1
+            self.logger.info("Cache deadline passed in iteration {clock}, using stale values: {tags}".format(
+                clock=clock, tags=", ".join("{tag} (iteration {received})".format(
+                    tag=tag, received=self.cache_clock.get(tag)) for tag in stale)))
 
-                        if not self.tag_fresh[cached_tag]:
-                            self.logger.info("Warning: Cache for tag " + str(cached_tag) + " could not be updated")
-                            self.tag_fresh[cached_tag] = True
+    def get_rate(self, tag):
+        """
+        Get the maximum change of a tag in one iteration, from the lookahead options. Tags of
+        other PLCs have no bound with gaussian noise, their values can change at every read.
+        :param tag: The tag to get the rate of
+        :return: the rate, or None if the tag has no bound
+        """
+        if self.intermediate_yaml['noise_scale'] != 0 and tag in self.cache:
+            return None
+        return self.lookahead['rates'].get(tag)
+
+    def plan_next_scan(self, clock):
+        """
+        Computes the iteration of the next scan of this plc: until then, none of its controls and
+        device attacks can change an actuator or an attack flag.
+        :param clock: the iteration of the scan that was just applied
+        """
+        if self.lookahead:
+            self.next_scan = clock + safe_horizon(self, clock, self.lookahead['max_steps'])
 
     def set_tag(self, tag, value):
         """
@@ -333,17 +406,20 @@ class GenericPLC(BasePLC):
                 self.logger.error('Pump speed is only supported by epynet and not WNTR simulator')
                 raise InvalidControlValue(value)
 
-        if tag in self.intermediate_plc["sensors"] or tag in self.intermediate_plc["actuators"]:
-            self.set((tag, 1), value)
+        if tag in self.local_tags:
+            if self.pending_writes is not None:
+                self.pending_writes[tag] = value
+            else:
+                self.set((tag, 1), value)
+            if self.snapshot is not None:
+                self.snapshot[tag] = float(value)
         else:
             raise TagDoesNotExist(tag + " cannot be set from " + self.intermediate_plc["name"])
 
     def db_query(self, query, write=False, parameters=None):
         """
-        Execute a query on the database
-        On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
-        Before it reties, it will sleep for :code:`DB_SLEEP_TIME` seconds.
-        This is necessary because of the limited concurrency in SQLite.
+        Execute a query on the database through the :class:`~dhalsim.db_client.DatabaseClient` of
+        this plc. On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
         :param query: The SQL query to execute in the db
         :type query: str
         :param write: Boolean flag to indicate if this query will write into the database
@@ -351,31 +427,22 @@ class GenericPLC(BasePLC):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
-
-        for i in range(self.DB_TRIES):
-            try:
-                with sqlite3.connect(self.intermediate_yaml["db_path"]) as conn:
-                    cur = conn.cursor()
-                    if parameters:
-                        cur.execute(query, parameters)
-                    else:
-                        cur.execute(query)
-                    conn.commit()
-
-                    if not write:
-                        return cur.fetchone()[0]
-                    else:
-                        return
-            except sqlite3.OperationalError as exc:
-                self.logger.info(
-                    "Failed to connect to db with exception {exc}. Trying {i} more times.".format(
-                        exc=exc, i=self.DB_TRIES - i - 1))
-                time.sleep(self.db_sleep_time)
-
-        self.logger.error("Failed to connect to db. Tried {i} times.".format(i=self.DB_TRIES))
-        raise DatabaseError("Failed to get master clock from database")
+        db = get_database_client(self.intermediate_yaml['db_path'], self.logger, self.DB_TRIES)
+        return db.db_query(query, write, parameters)
 
     def get_master_clock(self):
+        """
+        Get the value of the master clock of the physical process, as read in the snapshot of
+        the current iteration. Before the first snapshot it is read from the database.
+        :return: Iteration in the physical process.
+        :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
+           :code:`DB_TRIES` tries.
+        """
+        if self.snapshot is not None:
+            return self.snapshot_clock
+        return self.read_master_clock()
+
+    def read_master_clock(self):
         """
         Get the value of the master clock of the physical process through the database.
         On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
@@ -387,6 +454,30 @@ class GenericPLC(BasePLC):
         master_time = self.db_query("SELECT time FROM master_time WHERE id IS 1", False, None)
         return master_time
 
+    def take_snapshot(self):
+        """
+        Reads the master clock and all sensors and actuators of this plc at once, at the start of
+        an iteration. The plant does not change them before the next iteration, so the values
+        published by :meth:`send_system_state` and used by the controls and device attacks of
+        this iteration come from this snapshot. Actuators set by this plc are updated in it.
+        :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
+           :code:`DB_TRIES` tries.
+        """
+        if self.tag_table:
+            values = self.tag_table.read(self.snapshot_slots).tolist()
+            self.snapshot_clock = self.read_master_clock()
+            self.snapshot = dict(zip(self.snapshot_tags, values))
+            return
+
+        db = get_database_client(self.intermediate_yaml['db_path'], self.logger, self.DB_TRIES)
+        snapshot = {}
+        for name, value in db.fetchall(self.snapshot_query, self.snapshot_tags):
+            if name is None:
+                self.snapshot_clock = int(value)
+            else:
+                snapshot[name] = float(value)
+        self.snapshot = snapshot
+
     def get_sync(self, flag):
         """
         Get the sync flag of this plc.
@@ -396,6 +487,8 @@ class GenericPLC(BasePLC):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
+        if self.barrier:
+            return self.barrier.get() == flag
         res = self.db_query("SELECT flag FROM sync WHERE name IS ?", False, (self.intermediate_plc["name"],))
         return res == flag
 
@@ -410,12 +503,33 @@ class GenericPLC(BasePLC):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
+        if self.barrier:
+            self.barrier.set(flag)
+            return
         self.db_query("UPDATE sync SET flag=? WHERE name IS ?", True, (int(flag), self.intermediate_plc["name"],))
 
+    def wait_sync(self, flag):
+        """
+        Wait until the sync flag of this plc equals flag. With the socket barrier this blocks
+        until the physical process releases the phase, otherwise the sync table is polled.
+        When the physical process closes the barrier, this waits for the plc to be shut down.
+        :param flag: flag to wait for
+        """
+        if self.barrier:
+            try:
+                self.barrier.wait(flag)
+            except BarrierError:
+                self.logger.debug("Barrier closed, waiting for shutdown.")
+                signal.pause()
+            return
+        while not self.get_sync(flag):
+            pass
+
     def set_attack_flag(self, flag, attack_name):
         """
         Set a flag in the attack table. When it is 1, we know that the attack with the
         provided name is currently running. When it is 0, it is not.
+        The flag is only written when it changes, during a scan it is written at the end of it.
         On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
         Before it reties, it will sleep for :code:`DB_SLEEP_TIME` seconds.
         :param flag: True for running to 1, False for running to 0
@@ -425,13 +539,53 @@ class GenericPLC(BasePLC):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
-        self.db_query("UPDATE attack SET flag=? WHERE name IS ?", True, (int(flag), attack_name,))
+        if self.attack_flags.get(attack_name) == bool(flag):
+            return
+        self.attack_flags[attack_name] = bool(flag)
+
+        if self.pending_flags is not None:
+            self.pending_flags[attack_name] = int(flag)
+        else:
+            self.db_query(self.FLAG_QUERY, True, (int(flag), attack_name,))
+
+    def begin_scan(self):
+        """
+        Starts buffering the actuators and attack flags set by the controls and device attacks,
+        so an actuator set by several of them is written once, with its final value.
+        """
+        self.pending_writes = {}
+        self.pending_flags = {}
+
+    def commit_scan(self):
+        """
+        Writes the actuators and attack flags set since :meth:`begin_scan`. In the database they
+        are written in a single transaction, in the tag table the actuators are one update.
+        :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
+           :code:`DB_TRIES` tries.
+        """
+        writes, self.pending_writes = self.pending_writes, None
+        flags, self.pending_flags = self.pending_flags, None
+
+        statements = []
+        if writes and self.tag_table:
+            self.tag_table.update(writes)
+        elif writes:
+            statements.append((self.WRITE_QUERY, [(value, tag) for tag, value in writes.items()]))
+        if flags:
+            statements.append((self.FLAG_QUERY, [(flag, name) for name, flag in flags.items()]))
+
+        if statements:
+            db = get_database_client(self.intermediate_yaml['db_path'], self.logger, self.DB_TRIES)
+            db.transaction(statements)
 
     def stop_cache_update(self):
         self.update_cache_flag = False
 
     def sigint_handler(self, sig, frame):
         self.logger.debug('PLC shutdown commencing.')
+        if self.stale_scans:
+            self.logger.info("{plc} used stale cache values in {scans} scans".format(
+                plc=self.intermediate_plc['name'], scans=self.stale_scans))
         self.stop_cache_update()
         #self.cache_thread.join()
         self.plc_run = False
@@ -456,27 +610,27 @@ class GenericPLC(BasePLC):
                 self.cache_thread.start()
 
             # flag = 0 means a physical process finished a new iteration
-            while not self.get_sync(0):
-                pass
+            self.wait_sync(0)
 
             # we know a new physical simulation iteration just finished
             # get fresh local process data and update the local CPPPO
-            self.send_system_state()
+            self.take_snapshot()
+            self.send_system_state(self.snapshot)
             self.set_sync(1)
-            while not self.get_sync(2):
-                pass
+            self.wait_sync(2)
 
-            for tag in self.tag_fresh:
-                self.tag_fresh[tag] = False
+            clock = self.snapshot_clock
+
+            # Within the lookahead of the last scan, the controls would set the same actuators
+            if clock < self.next_scan:
+                self.set_sync(3)
+                if test_break:
+                    break
+                continue
 
-            # We only exit this while when all values are True
-            fresh = False
-            while not fresh:
-                fresh = True
-                for v in self.tag_fresh.values():
-                    fresh = fresh and v
+            self.wait_for_cache(clock)
 
-            clock = self.get_master_clock()
+            self.begin_scan()
 
             for control in self.controls:
                 control.apply(self)
@@ -484,6 +638,9 @@ class GenericPLC(BasePLC):
             for attack in self.attacks:
                 attack.apply(self)
 
+            self.commit_scan()
+            self.plan_next_scan(clock)
+
             self.set_sync(3)
 
             if test_break:
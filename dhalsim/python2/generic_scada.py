@@ -3,7 +3,6 @@ import csv
 import os.path
 import random
 import signal
-import sqlite3
 import sys
 import time
 from collections import OrderedDict
@@ -14,6 +13,10 @@ import yaml
 from basePLC import BasePLC
 
 from dhalsim import py3_logger
+from dhalsim.barrier import BarrierError, get_barrier_client
+# DatabaseError is re-exported on purpose: the queries of this module raise it, and callers import it from here
+from dhalsim.db_client import DatabaseError, get_database_client  # noqa: F401
+from dhalsim.tag_directory import get_tag_directory
 import threading
 import pandas as pd
 
@@ -30,10 +33,6 @@ class InvalidControlValue(Error):
     """Raised when tag you are looking for does not exist"""
 
 
-class DatabaseError(Error):
-    """Raised when not being able to connect to the database"""
-
-
 class GenericScada(BasePLC):
     """
     This class represents a scada. This scada knows what plcs it is collecting data from by reading the
@@ -61,6 +60,8 @@ class GenericScada(BasePLC):
         self.output_path = Path(self.intermediate_yaml["output_path"]) / "scada_values.csv"
         self.output_path.touch(exist_ok=True)
 
+        self.barrier = get_barrier_client(self.intermediate_yaml, 'scada')
+
         # Create state from db values
         state = {
             'name': "plant",
@@ -118,22 +119,11 @@ class GenericScada(BasePLC):
         super(GenericScada, self).__init__(name='scada', state=state, protocol=scada_protocol)
 
     def get_scada_tags(self):
-        aux_scada_tags = []
-        for PLC in self.intermediate_yaml['plcs']:
-
-            # We were having ordering issues by adding it as a set. Probably could be done in a more pythonic way
-            if 'sensors' in PLC:
-                    for sensor in PLC['sensors']:
-                        if sensor not in aux_scada_tags:
-                            aux_scada_tags.append(sensor)
-                            
-            if 'actuators' in PLC:
-                    for actuator in PLC['actuators']:
-                        if actuator not in aux_scada_tags:
-                            aux_scada_tags.append(actuator)
-
-        # self.logger.debug('SCADA tags: ' + str(aux_scada_tags))
-        return aux_scada_tags
+        """
+        Gets the tags of all PLCs, in the order of the PLCs and their sensors and actuators.
+        :return: list of tags, without duplicates
+        """
+        return list(get_tag_directory(self.intermediate_yaml).names)
 
     @staticmethod
     def generate_real_tags(plcs):
@@ -192,10 +182,8 @@ class GenericScada(BasePLC):
 
     def db_query(self, query, write=False, parameters=None):
         """
-        Execute a query on the database
-        On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
-        Before it reties, it will sleep for :code:`DB_SLEEP_TIME` seconds.
-        This is necessary because of the limited concurrency in SQLite.
+        Execute a query on the database through the :class:`~dhalsim.db_client.DatabaseClient` of
+        the SCADA. On a :code:`sqlite3.OperationalError` it will retry with a max of :code:`DB_TRIES` tries.
         :param query: The SQL query to execute in the db
         :type query: str
         :param write: Boolean flag to indicate if this query will write into the database
@@ -203,28 +191,8 @@ class GenericScada(BasePLC):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
-        for i in range(self.DB_TRIES):
-            try:
-                with sqlite3.connect(self.intermediate_yaml["db_path"]) as conn:
-                    cur = conn.cursor()
-                    if parameters:
-                        cur.execute(query, parameters)
-                    else:
-                        cur.execute(query)
-                    conn.commit()
-
-                    if not write:
-                        return cur.fetchone()[0]
-                    else:
-                        return
-            except sqlite3.OperationalError as exc:
-                self.logger.info(
-                    "Failed to connect to db with exception {exc}. Trying {i} more times.".format(
-                        exc=exc, i=self.DB_TRIES - i - 1))
-                time.sleep(self.db_sleep_time)
-
-        self.logger.error("Failed to connect to db. Tried {i} times.".format(i=self.DB_TRIES))
-        raise DatabaseError("Failed to get master clock from database")
+        db = get_database_client(self.intermediate_yaml['db_path'], self.logger, self.DB_TRIES)
+        return db.db_query(query, write, parameters)
 
     def get_sync(self, flag):
         """
@@ -235,6 +203,8 @@ class GenericScada(BasePLC):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
+        if self.barrier:
+            return self.barrier.get() == flag
         res = self.db_query("SELECT flag FROM sync WHERE name IS ?", False, ('scada',))
         return res == flag
 
@@ -249,8 +219,30 @@ class GenericScada(BasePLC):
         :raise DatabaseError: When a :code:`sqlite3.OperationalError` is still raised after
            :code:`DB_TRIES` tries.
         """
+        if self.barrier:
+            self.barrier.set(flag)
+            return
         self.db_query("UPDATE sync SET flag=? WHERE name IS ?", True, (int(flag), 'scada',))
 
+    def wait_sync(self, flag, sleep_time=0):
+        """
+        Wait until the sync flag of the SCADA equals flag. With the socket barrier this blocks
+        until the physical process releases the phase, otherwise the sync table is polled.
+        When the physical process closes the barrier, this waits for the SCADA to be shut down.
+        :param flag: flag to wait for
+        :param sleep_time: (Default value = 0) time to sleep between two polls of the sync table
+        """
+        if self.barrier:
+            try:
+                self.barrier.wait(flag)
+            except BarrierError:
+                self.logger.debug("Barrier closed, waiting for shutdown.")
+                signal.pause()
+            return
+        while not self.get_sync(flag):
+            if sleep_time:
+                time.sleep(sleep_time)
+
     def stop_cache_update(self):
         self.update_cache_flag = False
 
@@ -292,8 +284,7 @@ class GenericScada(BasePLC):
             tags.extend(self.generate_tags(PLC['sensors']))
             tags.extend(self.generate_tags(PLC['actuators']))
 
-            simple_tags.extend(PLC['sensors'])
-            simple_tags.extend(PLC['actuators'])
+            simple_tags.extend(tag for tag, _ in tags)
 
             plcs[PLC['public_ip']] = tags
             plcs_simple_tags[PLC['public_ip']] = simple_tags
@@ -360,13 +351,11 @@ class GenericScada(BasePLC):
         lock = None
 
         while self.scada_run:
-            while not self.get_sync(0):
-                time.sleep(self.db_sleep_time)
+            self.wait_sync(0, self.db_sleep_time)
 
             self.set_sync(1)
 
-            while not self.get_sync(2):
-                pass
+            self.wait_sync(2)
 
             if not self.plcs_ready:
                 self.plcs_ready = True
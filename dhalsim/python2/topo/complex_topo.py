@@ -58,10 +58,17 @@ class ComplexTopo(Topo):
     intermediate yaml file. Then, it will use that file to create all the routers, switches
     and nodes. After that, iptables rules and routes will be setup.
 
+    The switches are not in the network namespace of a node. When batches run at the same time,
+    every batch has a :code:`network_index` and numbers its switches from
+    :code:`network_index * SWITCH_NUMBERS` on, so their names do not clash.
+
     :param intermediate_yaml_path: The path to the intermediate yaml file. Here will also be writen to.
     :type intermediate_yaml_path: Path
     """
 
+    SWITCH_NUMBERS = 1000
+    """Amount of switch numbers reserved for the network of one batch"""
+
     def __init__(self, intermediate_yaml_path):
         # Set variables
         self.router_ip = "10.0.1.254"
@@ -75,6 +82,8 @@ class ComplexTopo(Topo):
         with self.intermediate_yaml_path.open(mode='r') as intermediate_yaml:
             self.data = yaml.safe_load(intermediate_yaml)
 
+        self.switch_offset = self.SWITCH_NUMBERS * self.data.get('network_index', 0)
+
         self.check_amount_of_nodes(self.data)
 
         # Generate PLC and SCADA data and write back to file
@@ -127,7 +136,7 @@ class ComplexTopo(Topo):
         scada['interface'] = scada['name'] + "-eth0"
         scada['provider_interface'] = "r0-eth" + str(index)
         scada['gateway_name'] = "r" + str(index)
-        scada['switch_name'] = "s" + str(index)
+        scada['switch_name'] = "s" + str(self.switch_offset + index)
         scada['gateway_inbound_mac'] = 'AA:BB:CC:DD:03:' + "{:02x}".format(index)
         scada['gateway_outbound_mac'] = 'AA:BB:CC:DD:04:' + "{:02x}".format(index)
         scada['gateway_ip'] = self.local_router_ips
@@ -145,7 +154,7 @@ class ComplexTopo(Topo):
                 plc['provider_interface'] = "r0-eth" + str(index)
                 plc['provider_mac'] = 'AA:BB:CC:DD:00:' + "{:02x}".format(index)
                 plc['gateway_name'] = "r" + str(index)
-                plc['switch_name'] = "s" + str(index)
+                plc['switch_name'] = "s" + str(self.switch_offset + index)
                 plc['gateway_ip'] = self.local_router_ips
                 plc['gateway_inbound_mac'] = 'AA:BB:CC:DD:03:' + "{:02x}".format(index)
                 plc['gateway_outbound_mac'] = 'AA:BB:CC:DD:04:' + "{:02x}".format(index)
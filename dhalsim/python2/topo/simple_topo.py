@@ -40,24 +40,32 @@ class SimpleTopo(Topo):
     intermediate yaml file. Then, it will use that file to create all the routers, switches
     and nodes. After that, iptables rules and routes will be setup.
 
+    The switches are not in the network namespace of a node. When batches run at the same time,
+    every batch has a :code:`network_index` and numbers its switches from
+    :code:`network_index * SWITCH_NUMBERS` on, so their names do not clash.
+
     :param intermediate_yaml_path: The path to the intermediate yaml file. Here will also be writen to.
     :type intermediate_yaml_path: Path
     """
 
+    SWITCH_NUMBERS = 1000
+    """Amount of switch numbers reserved for the network of one batch"""
+
     def __init__(self, intermediate_yaml_path):
+        # Load the data from the YAML file
+        self.intermediate_yaml_path = intermediate_yaml_path
+        with self.intermediate_yaml_path.open(mode='r') as intermediate_yaml:
+            self.data = yaml.safe_load(intermediate_yaml)
+
         # Set variables
+        switch_offset = self.SWITCH_NUMBERS * self.data.get('network_index', 0)
         self.router_ip = "192.168.1.254"
         self.supervisor_ip = "192.168.2.254"
         self.router_mac = 'AA:BB:CC:DD:00:01'
         self.supervisor_mac = 'AA:BB:CC:DD:00:02'
         self.router = 'r0'
-        self.plc_switch = 's1'
-        self.scada_switch = 's2'
-
-        # Load the data from the YAML file
-        self.intermediate_yaml_path = intermediate_yaml_path
-        with self.intermediate_yaml_path.open(mode='r') as intermediate_yaml:
-            self.data = yaml.safe_load(intermediate_yaml)
+        self.plc_switch = 's' + str(switch_offset + 1)
+        self.scada_switch = 's' + str(switch_offset + 2)
 
         self.check_amount_of_nodes(self.data)
 
@@ -171,7 +179,7 @@ class SimpleTopo(Topo):
         # Add a router to the network
         router = self.addNode('r0', cls=LinuxRouter, ip=router_ip)
         # Add a switch to the network
-        switch = self.addSwitch('s1')
+        switch = self.addSwitch(self.plc_switch)
         self.addLink(switch, router, intfName2='r0-eth1', addr2=self.router_mac,
                      params2={'ip': router_ip})
 
@@ -190,7 +198,7 @@ class SimpleTopo(Topo):
         # -- SUPERVISOR NETWORK -- #
         supervisor_ip = self.supervisor_ip + "/24"
         # Add a switch for the supervisor network
-        supervisor_switch = self.addSwitch("s2")
+        supervisor_switch = self.addSwitch(self.scada_switch)
         # Link the router and the supervisor switch
         self.addLink(supervisor_switch, router, intfName2='r0-eth2', addr2=self.supervisor_mac,
                      params2={'ip': supervisor_ip})
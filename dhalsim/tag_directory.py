@@ -0,0 +1,134 @@
+from collections import namedtuple
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class UnknownPLC(Error):
+    """Raised when a PLC is not in the directory"""
+
+
+TagOwner = namedtuple('TagOwner', ['name', 'local_ip', 'public_ip', 'role'])
+"""PLC that has a tag: its name, its ips and whether the tag is a :code:`sensor` or an :code:`actuator`"""
+
+
+def get_tag_directory(data):
+    """
+    Builds the :class:`TagDirectory` of the PLCs of an experiment.
+
+    :param data: the data of the intermediate yaml, or of the config file
+    :return: the tag directory
+    """
+    return TagDirectory(data.get('plcs', []))
+
+
+class TagDirectory:
+    """
+    Index of the sensors and actuators of the PLCs of an experiment, built once from the
+    intermediate yaml. It maps every tag to the PLCs that have it, in the order of the yaml, and
+    keeps the tags of every PLC in sets, so finding the owner of a tag or checking if a PLC has a
+    tag does not depend on the amount of PLCs and tags.
+
+    Empty tags, which the yaml uses for PLCs without sensors, are left out.
+
+    :param plcs: the :code:`plcs` section of the intermediate yaml
+    """
+
+    def __init__(self, plcs):
+        self.names = []
+        self.plcs = {}
+        self.sensors = {}
+        self.actuators = {}
+        self.owners = {}
+        self.actuator_owners = {}
+
+        for plc in plcs:
+            sensors = [tag for tag in plc.get('sensors') or [] if tag != ""]
+            actuators = [tag for tag in plc.get('actuators') or [] if tag != ""]
+
+            self.plcs[plc['name']] = plc
+            self.sensors[plc['name']] = frozenset(sensors)
+            self.actuators[plc['name']] = frozenset(actuators)
+
+            for tag, role in [(tag, 'sensor') for tag in sensors] + [(tag, 'actuator') for tag in actuators]:
+                owner = TagOwner(plc['name'], plc.get('local_ip'), plc.get('public_ip'), role)
+                if tag not in self.owners:
+                    self.owners[tag] = []
+                    self.names.append(tag)
+                if all(other.name != owner.name for other in self.owners[tag]):
+                    self.owners[tag].append(owner)
+                if role == 'actuator':
+                    self.actuator_owners.setdefault(tag, owner)
+
+        self.tags = {name: self.sensors[name] | self.actuators[name] for name in self.plcs}
+
+    def __contains__(self, tag):
+        return tag in self.owners
+
+    def tags_of(self, plc_name):
+        """
+        Gets the sensors and actuators of a PLC.
+
+        :param plc_name: name of the PLC
+        :return: frozenset of tags
+        :raise UnknownPLC: when there is no PLC with that name
+        """
+        if plc_name not in self.tags:
+            raise UnknownPLC(plc_name)
+        return self.tags[plc_name]
+
+    def owner(self, tag, exclude=None):
+        """
+        Gets the first PLC that has a tag, as a sensor or as an actuator.
+
+        :param tag: the tag
+        :param exclude: (Default value = None) name of a PLC to skip, usually the one asking
+        :return: a :class:`TagOwner`, or None when no other PLC has the tag
+        """
+        for owner in self.owners.get(tag, ()):
+            if owner.name != exclude:
+                return owner
+        return None
+
+    def actuator_owner(self, tag):
+        """
+        Gets the first PLC that has a tag as an actuator.
+
+        :param tag: the tag
+        :return: a :class:`TagOwner`, or None when no PLC controls the tag
+        """
+        return self.actuator_owners.get(tag)
+
+    def address(self, tag, plc_name=None):
+        """
+        Gets the ip to receive a tag from: the local ip when its owner is the given PLC, the
+        public ip of its owner otherwise.
+
+        :param tag: the tag
+        :param plc_name: (Default value = None) name of the PLC the receiver is next to
+        :return: the ip, or None when no PLC has the tag
+        """
+        owner = self.owner(tag)
+        if owner is None:
+            return None
+        return owner.local_ip if owner.name == plc_name else owner.public_ip
+
+    def group_by_owner(self, tags, exclude=None):
+        """
+        Groups tags by the PLC they are received from, so every PLC can be asked for all of its
+        tags at once. Tags no other PLC has are left out.
+
+        :param tags: the tags to group
+        :param exclude: (Default value = None) name of a PLC to skip, usually the one asking
+        :return: list of (public ip, tags) tuples, in the order of the PLCs and their tags in the yaml
+        """
+        wanted = set(tags)
+        groups = {}
+        for tag in self.names:
+            if tag not in wanted:
+                continue
+            owner = self.owner(tag, exclude)
+            if owner:
+                groups.setdefault(owner.name, []).append(tag)
+        return [(self.plcs[name].get('public_ip'), groups[name]) for name in self.plcs if name in groups]
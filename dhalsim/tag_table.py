@@ -0,0 +1,192 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+
+class Error(Exception):
+    """Base class for exceptions in this module."""
+
+
+class TagTableError(Error):
+    """Raised when the tag table file is missing or malformed"""
+
+
+def get_tag_table(data):
+    """
+    Opens the :class:`TagTable` of an experiment when it uses the mmap tag backend.
+
+    :param data: the data of the intermediate yaml
+    :return: the tag table, or None if tags are stored in the :code:`plant` table of the database
+    """
+    if data.get("tag_backend", "sqlite") != "mmap":
+        return None
+    return TagTable(data["tag_table_path"])
+
+
+class TagTable:
+    """
+    Fixed layout table of float64 tag values in a memory mapped file, shared by the physical
+    process and the PLCs as an alternative to the :code:`plant` table of the database.
+
+    The file starts with a header holding the tag names, which gives every tag a fixed slot,
+    followed by a sequence counter and one float64 per tag. Writers are serialized with a lock on
+    the file and make the sequence counter odd while they write. Readers of several tags retry
+    until they read the same even counter before and after copying the values (a seqlock), so they
+    never see a half written update. Reading or writing one tag is a single aligned 8 byte access.
+
+    :param path: path of a tag table file created by :meth:`create`
+    """
+
+    MAGIC = b'DHALTAGS'
+    """First bytes of a tag table file"""
+
+    HEADER = struct.Struct('<8sQQ')
+    """Magic, amount of slots and length of the encoded names"""
+
+    def __init__(self, path):
+        self.path = str(path)
+
+        try:
+            self.file = open(self.path, 'r+b')
+        except OSError as exc:
+            raise TagTableError("Cannot open tag table {path}: {exc}".format(path=self.path, exc=exc))
+
+        self.mmap = mmap.mmap(self.file.fileno(), 0)
+        if len(self.mmap) < self.HEADER.size or self.mmap[:len(self.MAGIC)] != self.MAGIC:
+            self.mmap.close()
+            self.file.close()
+            raise TagTableError("{path} is not a tag table".format(path=self.path))
+
+        _, slots, names_length = self.HEADER.unpack_from(self.mmap, 0)
+
+        names = self.mmap[self.HEADER.size:self.HEADER.size + names_length]
+        self.names = json.loads(names.decode())
+        self.index = {name: slot for slot, name in enumerate(self.names)}
+
+        sequence_offset = self.data_offset(names_length)
+        self.sequence = np.frombuffer(self.mmap, dtype=np.uint64, count=1, offset=sequence_offset)
+        self.values = np.frombuffer(self.mmap, dtype=np.float64, count=slots, offset=sequence_offset + 8)
+
+        self.lock = threading.Lock()
+
+    @classmethod
+    def data_offset(cls, names_length):
+        """
+        Gets the offset of the sequence counter, which is followed by the values.
+
+        :param names_length: length of the encoded names in the header
+        :return: the offset in bytes, aligned to 8 bytes
+        """
+        return (cls.HEADER.size + names_length + 7) // 8 * 8
+
+    @classmethod
+    def create(cls, path, names, values=None):
+        """
+        Creates a tag table file. An existing file is overwritten.
+
+        :param path: path of the file to create
+        :param names: names of the tags, in slot order
+        :param values: (Default value = None) initial values of the tags, 0 when not given
+        :return: the created tag table
+        """
+        names = [str(name) for name in names]
+        encoded_names = json.dumps(names).encode()
+        offset = cls.data_offset(len(encoded_names))
+
+        if values is None:
+            values = np.zeros(len(names))
+        values = np.asarray(values, dtype=np.float64)
+
+        with open(str(path), 'wb') as file:
+            file.write(cls.HEADER.pack(cls.MAGIC, len(names), len(encoded_names)))
+            file.write(encoded_names)
+            file.write(b'\0' * (offset - cls.HEADER.size - len(encoded_names)))
+            file.write(np.zeros(1, dtype=np.uint64).tobytes())
+            file.write(values.tobytes())
+        os.chmod(str(path), 0o666)
+
+        return cls(path)
+
+    def close(self):
+        """Unmaps the table and closes the file."""
+        self.sequence = None
+        self.values = None
+        self.mmap.close()
+        self.file.close()
+
+    def slots(self, names):
+        """
+        Gets the slots of tags.
+
+        :param names: names of the tags
+        :return: numpy array with the slot of every tag
+        :raise KeyError: when a tag is not in the table
+        """
+        return np.fromiter((self.index[name] for name in names), dtype=np.intp, count=len(names))
+
+    def get(self, name):
+        """
+        Gets the value of one tag.
+
+        :param name: name of the tag
+        :return: the value of the tag
+        :raise KeyError: when the tag is not in the table
+        """
+        return float(self.values[self.index[name]])
+
+    def set(self, name, value):
+        """
+        Sets the value of one tag.
+
+        :param name: name of the tag
+        :param value: the new value
+        :raise KeyError: when the tag is not in the table
+        """
+        self.write(self.index[name], float(value))
+
+    def read(self, slots=None):
+        """
+        Reads a consistent copy of several tags.
+
+        :param slots: (Default value = None) slots to read, all tags when not given
+        :return: numpy array with the values
+        """
+        while True:
+            start = int(self.sequence[0])
+            if start & 1:
+                continue
+            values = self.values.copy() if slots is None else self.values[slots]
+            if int(self.sequence[0]) == start:
+                return values
+
+    def write(self, slots, values):
+        """
+        Writes several tags as one update, readers see either all or none of the new values.
+
+        :param slots: slot or slots to write
+        :param values: value or values to write
+        """
+        with self.lock:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+            try:
+                self.sequence[0] += 1
+                self.values[slots] = values
+                self.sequence[0] += 1
+            finally:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+    def update(self, items):
+        """
+        Writes the tags of a dictionary as one update. Tags that are not in the table are skipped,
+        like an :code:`UPDATE` of the :code:`plant` table skips names without a row.
+
+        :param items: dictionary of tag names to values
+        """
+        names = [name for name in items if name in self.index]
+        if names:
+            self.write(self.slots(names), [float(items[name]) for name in names])
@@ -0,0 +1,42 @@
+import numpy as np
+
+from dhalsim.hydraulics.state import HydraulicState
+
+
+class WntrState(HydraulicState):
+    """
+    Reads the state of a WNTR water network model into numpy arrays. The node and link objects
+    and the elevations are resolved once, so reading the state after a step needs no lookups by
+    name and no per element type checks.
+
+    The arrays of :class:`~dhalsim.hydraulics.state.HydraulicState` are updated in place by
+    :meth:`update`.
+
+    :param wn: the WNTR water network model
+    :param tanks: names of the tanks
+    :param junctions: names of the junctions
+    :param pumps: names of the pumps
+    :param valves: names of the valves
+    """
+
+    def __init__(self, wn, tanks, junctions, pumps, valves):
+        super(WntrState, self).__init__(tanks, junctions, pumps, valves)
+        self.tank_nodes = [wn.get_node(name) for name in tanks]
+        self.junction_nodes = [wn.get_node(name) for name in junctions]
+        self.links = [wn.get_link(name) for name in list(pumps) + list(valves)]
+
+        self.tank_elevations = np.array([node.elevation for node in self.tank_nodes], dtype=np.float64)
+        self.junction_elevations = np.array([node.elevation for node in self.junction_nodes], dtype=np.float64)
+
+    def update(self):
+        """
+        Reads the tank levels, junction pressures (head minus elevation), link flows and link
+        statuses of the model. Values that WNTR has not computed yet are read as NaN.
+        """
+        self.tank_levels[:] = np.array([node.head for node in self.tank_nodes], dtype=np.float64)
+        self.tank_levels -= self.tank_elevations
+        self.junction_pressures[:] = np.array([node.head for node in self.junction_nodes], dtype=np.float64)
+        self.junction_pressures -= self.junction_elevations
+        self.flows[:] = np.array([link.flow for link in self.links], dtype=np.float64)
+        # LinkStatus is an IntEnum, older versions of WNTR use plain ints
+        self.statuses[:] = [int(link.status) for link in self.links]
@@ -41,6 +41,7 @@ setuptools.setup(
     extras_require={
         'test': ['wget', 'coverage', 'pytest-cov'],
         'doc': ['sphinx', 'sphinx-rtd-theme', 'sphinx-prompt'],
+        'arrow': ['pyarrow'],
     },
     python_requires=">=3.8.10",
     entry_points={
@@ -0,0 +1,150 @@
+import threading
+
+import pytest
+
+from dhalsim.barrier import BarrierServer, BarrierClient, BarrierError, get_node_names, get_barrier_client
+
+
+@pytest.fixture
+def socket_path(tmpdir):
+    return str(tmpdir.join("dhalsim_sync.sock"))
+
+
+@pytest.fixture
+def server(socket_path):
+    barrier = BarrierServer(socket_path, ["PLC1", "PLC2", "scada"])
+    barrier.start()
+    yield barrier
+    barrier.stop()
+
+
+def test_get_node_names():
+    data = {"plcs": [{"name": "PLC1"}, {"name": "PLC2"}],
+            "network_attacks": [{"name": "attack1"}],
+            "network_events": [{"name": "event1"}]}
+    assert get_node_names(data) == ["PLC1", "PLC2", "scada", "attack1", "event1"]
+
+
+def test_get_barrier_client_database(socket_path):
+    assert get_barrier_client({"sync_mode": "database", "sync_path": socket_path}, "PLC1") is None
+
+
+def test_get_barrier_client_default(socket_path):
+    assert get_barrier_client({"sync_path": socket_path}, "PLC1") is None
+
+
+def test_get_barrier_client_socket(socket_path):
+    client = get_barrier_client({"sync_mode": "socket", "sync_path": socket_path}, "PLC1")
+    assert client.name == "PLC1"
+    assert client.socket_path == socket_path
+
+
+def test_set_get(server, socket_path):
+    client = BarrierClient(socket_path, "PLC1")
+    assert client.get() == 0
+    client.set(1)
+    assert client.get() == 1
+    assert server.get_flag("PLC1") == 1
+    assert server.get_flag("PLC2") == 0
+    client.close()
+
+
+def test_unknown_node(server, socket_path):
+    client = BarrierClient(socket_path, "PLC3")
+    with pytest.raises(BarrierError):
+        client.set(1)
+    client.close()
+
+
+def test_wait_timeout(server, socket_path):
+    client = BarrierClient(socket_path, "PLC1")
+    assert client.wait(2, 0.01) is False
+    client.close()
+
+
+def test_wait_release(server, socket_path):
+    client = BarrierClient(socket_path, "PLC1")
+    client.connect()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(client.wait(2)))
+    thread.start()
+    server.release(2)
+    thread.join(5)
+    assert result == [True]
+    client.close()
+
+
+def test_wait_all(server, socket_path):
+    clients = [BarrierClient(socket_path, name) for name in ["PLC1", "PLC2", "scada"]]
+    done = threading.Event()
+
+    def wait_all():
+        server.wait_all(1)
+        done.set()
+
+    thread = threading.Thread(target=wait_all)
+    thread.start()
+
+    for client in clients[:-1]:
+        client.set(1)
+    assert not done.wait(0.05)
+
+    clients[-1].set(1)
+    thread.join(5)
+    assert done.is_set()
+
+    for client in clients:
+        client.close()
+
+
+def test_iteration(server, socket_path):
+    names = ["PLC1", "PLC2", "scada"]
+    iterations = 5
+    clocks = {name: [] for name in names}
+    master_time = [0]
+
+    def node(name):
+        client = BarrierClient(socket_path, name)
+        for _ in range(iterations):
+            client.wait(0)
+            client.set(1)
+            client.wait(2)
+            clocks[name].append(master_time[0])
+            client.set(3)
+        client.close()
+
+    threads = [threading.Thread(target=node, args=(name,)) for name in names]
+    for thread in threads:
+        thread.start()
+
+    for i in range(iterations):
+        server.wait_all(1)
+        server.release(2)
+        server.wait_all(3)
+        master_time[0] = i + 1
+        server.release(0)
+
+    for thread in threads:
+        thread.join(5)
+
+    for name in names:
+        assert clocks[name] == list(range(iterations))
+
+
+def test_stop_wakes_waiting_nodes(server, socket_path):
+    client = BarrierClient(socket_path, "PLC1")
+    client.connect()
+    errors = []
+
+    def wait():
+        try:
+            client.wait(2)
+        except BarrierError as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    server.stop()
+    thread.join(5)
+    assert len(errors) == 1
+    client.close()
@@ -0,0 +1,142 @@
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import yaml
+
+from dhalsim.campaign import Campaign, get_fork_iteration, get_shared_data
+from dhalsim.command_line import Runner
+
+
+@pytest.fixture
+def scenario():
+    return {
+        'iterations': 100,
+        'output_path': 'output_01',
+        'db_path': '/tmp/dhalsim_01/dhalsim.sqlite',
+        'plcs': [
+            {'name': 'PLC1', 'sensors': ['T0'], 'actuators': ['P_RAW1'],
+             'attacks': [{'name': 'attack1', 'actuator': 'P_RAW1', 'command': 'closed',
+                          'trigger': {'type': 'time', 'start': 60, 'end': 80}}]},
+            {'name': 'PLC2', 'sensors': ['T1'], 'actuators': ['V_PUB']},
+        ],
+        'network_attacks': [],
+        'ground_truth_format': 'parquet',
+        'ground_truth_compression': 'zstd',
+    }
+
+
+def test_fork_iteration(scenario):
+    assert get_fork_iteration(scenario) == 60
+
+
+def test_fork_iteration_network_attack(scenario):
+    scenario['network_attacks'] = [{'name': 'mitm', 'trigger': {'type': 'time', 'start': 40, 'end': 50}}]
+    assert get_fork_iteration(scenario) == 40
+
+
+def test_fork_iteration_sensor_trigger(scenario):
+    scenario['plcs'][1]['attacks'] = [{'name': 'attack2', 'actuator': 'V_PUB', 'command': 'open',
+                                       'trigger': {'type': 'below', 'sensor': 'T1', 'value': 0.5}}]
+    assert get_fork_iteration(scenario) == 0
+
+
+def test_fork_iteration_no_attacks(scenario):
+    del scenario['plcs'][0]['attacks']
+    assert get_fork_iteration(scenario) == 100
+
+
+def test_shared_data(scenario):
+    other = yaml.safe_load(yaml.safe_dump(scenario))
+    other['output_path'] = 'output_02'
+    other['plcs'][0]['attacks'][0]['trigger']['start'] = 70
+    assert get_shared_data(other) == get_shared_data(scenario)
+
+    other['plcs'][0]['sensors'] = ['T2']
+    assert get_shared_data(other) != get_shared_data(scenario)
+
+
+def test_prefix_yaml(tmpdir, scenario):
+    path = Campaign.write_prefix_yaml(scenario, 60, str(tmpdir))
+    with path.open() as file:
+        prefix = yaml.safe_load(file)
+
+    assert prefix['iterations'] == 60
+    assert prefix['checkpoint_interval'] == 60
+    assert 'attacks' not in prefix['plcs'][0]
+    assert prefix['ground_truth_format'] == 'csv'
+    assert 'ground_truth_compression' not in prefix
+    assert prefix['output_path'] == str(tmpdir.join('output'))
+    assert 'attacks' in scenario['plcs'][0]
+
+
+def write_config(directory, name, start):
+    config = {
+        'inp_file': 'small_network.inp',
+        'iterations': 8,
+        'log_level': 'warning',
+        'output_path': name,
+        'plcs': [{'name': 'PLC1', 'sensors': ['T1'], 'actuators': ['PU1']}],
+        'attacks': {'device_attacks': [{'name': 'attack_' + name, 'actuator': 'PU1', 'command': 'open',
+                                        'trigger': {'type': 'time', 'start': start, 'end': start + 2}}]},
+    }
+    path = directory / (name + '.yaml')
+    with path.open(mode='w') as file:
+        yaml.safe_dump(config, file)
+    return path
+
+
+def read_ground_truth(output_path):
+    return pd.read_csv(str(output_path / 'ground_truth.csv')).drop(columns='timestamp')
+
+
+@pytest.fixture
+def campaign_directory(tmpdir):
+    directory = Path(str(tmpdir))
+    shutil.copy(str(Path(__file__).parent.parent / 'auxilary_testing_files' / 'small_network.inp'), str(directory))
+    return directory
+
+
+def test_campaign_branches_match_direct_runs(campaign_directory, mocker):
+    direct = write_config(campaign_directory, 'direct', 4)
+    Runner(direct, campaign_directory / 'output', headless=True).run()
+
+    configs = [write_config(campaign_directory, 'branch', 4), write_config(campaign_directory, 'other', 5)]
+    mkdtemp = mocker.spy(tempfile, 'mkdtemp')
+    Campaign([Runner(config, campaign_directory / 'output', headless=True) for config in configs]).run()
+
+    expected = read_ground_truth(campaign_directory / 'direct')
+    branch = read_ground_truth(campaign_directory / 'branch')
+    other = read_ground_truth(campaign_directory / 'other')
+
+    pd.testing.assert_frame_equal(branch.rename(columns={'attack_branch': 'attack_direct'}), expected)
+    # The rows of the prefix are shared, with the attack column of the scenario set to 0
+    assert other['attack_other'].tolist()[:6] == [0] * 6
+    pd.testing.assert_frame_equal(other.drop(columns='attack_other').iloc[:6],
+                                  expected.drop(columns='attack_direct').iloc[:6])
+    assert not Path(mkdtemp.spy_return).exists()
+
+
+def test_campaign_failing_branch(campaign_directory, mocker):
+    configs = [write_config(campaign_directory, 'branch', 4), write_config(campaign_directory, 'other', 5)]
+    runners = [Runner(config, campaign_directory / 'output', headless=True) for config in configs]
+    run_headless = Runner.run_headless
+
+    def fail_branch(runner, yaml_path):
+        if runner is runners[0] and 'dhalsim_campaign_' not in str(yaml_path):
+            sys.exit(1)
+        run_headless(runner, yaml_path)
+
+    mocker.patch.object(Runner, 'run_headless', autospec=True, side_effect=fail_branch)
+    mkdtemp = mocker.spy(tempfile, 'mkdtemp')
+
+    with pytest.raises(SystemExit):
+        Campaign(runners).run()
+
+    # The other scenario still ran, and the prefix was removed
+    assert (campaign_directory / 'other' / 'ground_truth.csv').is_file()
+    assert not (campaign_directory / 'branch' / 'ground_truth.csv').exists()
+    assert not Path(mkdtemp.spy_return).exists()
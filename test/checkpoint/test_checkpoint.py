@@ -0,0 +1,56 @@
+import gzip
+import pickle
+
+import numpy as np
+import pytest
+
+from dhalsim.checkpoint import CheckpointError, get_checkpoint_path, read_checkpoint, write_checkpoint
+
+
+@pytest.fixture
+def state():
+    return {'master_time': 42, 'tank_levels': np.array([1.5, 2.5]), 'tables': {'plant': [('T0', '1.5')]}}
+
+
+def test_write_read(tmpdir, state):
+    path = tmpdir.join('checkpoint.pkl.gz')
+    write_checkpoint(path, state)
+    restored = read_checkpoint(path)
+
+    assert restored['master_time'] == 42
+    assert restored['tank_levels'].tolist() == [1.5, 2.5]
+    assert restored['tables'] == state['tables']
+    assert not tmpdir.join('checkpoint.pkl.gz.tmp').exists()
+
+
+def test_overwrite(tmpdir, state):
+    path = tmpdir.join('checkpoint.pkl.gz')
+    write_checkpoint(path, state)
+    state['master_time'] = 43
+    write_checkpoint(path, state)
+
+    assert read_checkpoint(path)['master_time'] == 43
+
+
+def test_missing(tmpdir):
+    with pytest.raises(CheckpointError):
+        read_checkpoint(tmpdir.join('checkpoint.pkl.gz'))
+
+
+def test_corrupt(tmpdir):
+    path = tmpdir.join('checkpoint.pkl.gz')
+    path.write_binary(b'not a checkpoint')
+    with pytest.raises(CheckpointError):
+        read_checkpoint(path)
+
+
+def test_other_version(tmpdir):
+    path = tmpdir.join('checkpoint.pkl.gz')
+    with gzip.open(str(path), 'wb') as file:
+        pickle.dump({'version': 0, 'state': {}}, file)
+    with pytest.raises(CheckpointError):
+        read_checkpoint(path)
+
+
+def test_checkpoint_path(tmpdir):
+    assert get_checkpoint_path({'output_path': str(tmpdir)}) == tmpdir.join('checkpoint.pkl.gz')
@@ -0,0 +1,73 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from mock import MagicMock
+
+from dhalsim.command_line import BatchError, Runner, run_batch
+
+
+@pytest.fixture
+def runner():
+    return Runner(Path('config.yaml'), Path('output'), headless=True, jobs=3)
+
+
+def test_run_batch(runner, mocker):
+    run_simulation = mocker.patch.object(Runner, 'run_simulation')
+    run_batch(runner, 'batch.yaml')
+    run_simulation.assert_called_once_with('batch.yaml', clean=False)
+
+
+def test_run_batch_exit(runner, mocker):
+    mocker.patch.object(Runner, 'run_simulation', side_effect=SystemExit(2))
+    with pytest.raises(BatchError, match="exited with 2"):
+        run_batch(runner, 'batch.yaml')
+
+
+def test_run_batch_clean_exit(runner, mocker):
+    mocker.patch.object(Runner, 'run_simulation', side_effect=SystemExit(0))
+    run_batch(runner, 'batch.yaml')
+
+
+def test_run_batch_returncode(runner, mocker):
+    mocker.patch.object(Runner, 'run_simulation')
+    runner.automatic_run = MagicMock(returncode=1)
+    with pytest.raises(BatchError, match="exited with 1"):
+        run_batch(runner, 'batch.yaml')
+
+
+def test_run_batches(runner, mocker):
+    mocker.patch('dhalsim.command_line.ProcessPoolExecutor', ThreadPoolExecutor)
+    # Every batch waits for the others, so this only passes when they run at the same time
+    barrier = threading.Barrier(3, timeout=5)
+    finished = []
+
+    def run_simulation(yaml_path, clean=True):
+        barrier.wait()
+        if yaml_path == 'batch_1.yaml':
+            sys.exit(1)
+        finished.append(yaml_path)
+
+    mocker.patch.object(runner, 'run_simulation', side_effect=run_simulation)
+    logger = MagicMock()
+
+    with pytest.raises(SystemExit) as exit_info:
+        runner.run_batches(['batch_0.yaml', 'batch_1.yaml', 'batch_2.yaml'], logger)
+
+    assert exit_info.value.code == 1
+    assert sorted(finished) == ['batch_0.yaml', 'batch_2.yaml']
+    logger.error.assert_any_call("Batch 1 failed: exited with 1")
+    logger.error.assert_called_with("1 out of 3 batches failed: [1]")
+
+
+def test_run_batches_success(runner, mocker):
+    mocker.patch('dhalsim.command_line.ProcessPoolExecutor', ThreadPoolExecutor)
+    mocker.patch.object(runner, 'run_simulation')
+    logger = MagicMock()
+
+    runner.run_batches(['batch_0.yaml', 'batch_1.yaml'], logger)
+
+    assert runner.run_simulation.call_count == 2
+    logger.error.assert_not_called()
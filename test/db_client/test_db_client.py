@@ -0,0 +1,120 @@
+import sqlite3
+import threading
+
+import pytest
+from mock import call
+
+from dhalsim.db_client import DatabaseClient, DatabaseError, get_database_client
+
+
+@pytest.fixture
+def db_path(tmpdir):
+    path = str(tmpdir.join("dhalsim.sqlite"))
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE plant (name TEXT NOT NULL, pid INTEGER NOT NULL, value TEXT, "
+                     "PRIMARY KEY (name, pid))")
+        conn.execute("INSERT INTO plant VALUES ('T1', 1, '0.5')")
+        conn.execute("INSERT INTO plant VALUES ('T2', 1, '1.5')")
+    return path
+
+
+@pytest.fixture
+def client(db_path, mocker):
+    return DatabaseClient(db_path, mocker.Mock(), tries=3, sleep_time=1.5)
+
+
+def test_pragmas(client):
+    conn = client.connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # NORMAL is 1
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+
+def test_connection_reused(client):
+    assert client.connection() is client.connection()
+
+
+def test_connection_per_thread(client):
+    connections = []
+    thread = threading.Thread(target=lambda: connections.append(client.connection()))
+    thread.start()
+    thread.join()
+    assert connections[0] is not client.connection()
+    assert len(client.connections) == 2
+
+
+def test_query(client):
+    assert client.query("SELECT value FROM plant WHERE name = ?", ("T1",)) == "0.5"
+
+
+def test_fetchall(client):
+    assert client.fetchall("SELECT name, value FROM plant ORDER BY name") == [("T1", "0.5"), ("T2", "1.5")]
+
+
+def test_execute(client, db_path):
+    client.execute("UPDATE plant SET value = ? WHERE name = ?", ("0.7", "T1"))
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT value FROM plant WHERE name = 'T1'").fetchone()[0] == "0.7"
+
+
+def test_executemany(client, db_path):
+    client.executemany("UPDATE plant SET value = ? WHERE name = ?", [("0.7", "T1"), ("1.7", "T2")])
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT value FROM plant ORDER BY name").fetchall() == [("0.7",), ("1.7",)]
+
+
+def test_transaction(client, db_path):
+    client.transaction([("UPDATE plant SET value = ? WHERE name = ?", [("0.7", "T1"), ("1.7", "T2")]),
+                        ("INSERT INTO plant VALUES (?, 1, ?)", [("T3", "2.5")])])
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT value FROM plant ORDER BY name").fetchall() == [("0.7",), ("1.7",), ("2.5",)]
+
+
+def test_transaction_rollback(client, db_path):
+    with pytest.raises(sqlite3.IntegrityError):
+        client.transaction([("UPDATE plant SET value = ? WHERE name = ?", [("0.7", "T1")]),
+                            ("INSERT INTO plant VALUES (?, 1, ?)", [("T2", "2.5")])])
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT value FROM plant WHERE name = 'T1'").fetchone()[0] == "0.5"
+
+
+def test_db_query(client):
+    client.db_query("UPDATE plant SET value = ? WHERE name = ?", True, ("0.7", "T1"))
+    assert client.db_query("SELECT value FROM plant WHERE name = ?", False, ("T1",)) == "0.7"
+    assert client.db_query("SELECT count(*) FROM plant") == 2
+
+
+def test_retry(client, mocker):
+    sleeper = mocker.patch("time.sleep", return_value=None)
+    function = mocker.Mock(side_effect=[sqlite3.OperationalError("database is locked"), 5])
+
+    assert client.run(function) == 5
+
+    sleeper.assert_called_once_with(1.5)
+    assert client.logger.info.call_count == 1
+    assert client.stats() == {'queries': 1, 'retries': 1, 'lock_waits': 1}
+
+
+def test_retry_fail_all(client, mocker):
+    sleeper = mocker.patch("time.sleep", return_value=None)
+    function = mocker.Mock(side_effect=sqlite3.OperationalError("disk I/O error"))
+
+    with pytest.raises(DatabaseError):
+        client.run(function)
+
+    sleeper.assert_has_calls([call(1.5), call(1.5), call(1.5)])
+    assert client.logger.error.call_count == 1
+    assert client.stats() == {'queries': 0, 'retries': 3, 'lock_waits': 0}
+
+
+def test_close(client):
+    client.connection()
+    client.close()
+    assert client.connections == []
+    assert client.query("SELECT count(*) FROM plant") == 2
+
+
+def test_get_database_client(db_path, mocker):
+    client = get_database_client(db_path, mocker.Mock())
+    assert client is get_database_client(db_path, mocker.Mock())
+    assert client.tries == DatabaseClient.DB_TRIES
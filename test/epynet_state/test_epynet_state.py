@@ -0,0 +1,95 @@
+import pytest
+
+from dhalsim.epynet_state import EpynetState, EN_FLOW, EN_PRESSURE, EN_STATUS
+
+NODES = ['T1', 'J1', 'J2', 'T2', 'J3']
+LINKS = ['P1', 'V1', 'P2']
+NODE_VALUES = {EN_PRESSURE: [1.5, 20.0, 30.0, 2.5, 40.0]}
+LINK_VALUES = {EN_FLOW: [0.25, 0.5, 0.75], EN_STATUS: [1, 0, 1]}
+
+
+class FakeLibrary:
+    """Array getters of EPANET 2.3, filling the whole buffer"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def ENgetnodevalues(self, code, values):
+        self.calls += 1
+        values[:] = NODE_VALUES[code]
+
+    def ENgetlinkvalues(self, code, values):
+        self.calls += 1
+        values[:] = LINK_VALUES[code]
+
+
+class FakeToolkit:
+    """Single value getters of the toolkit, indices start at 1"""
+
+    def __init__(self, lib=None):
+        self.calls = 0
+        if lib:
+            self._lib = lib
+
+    def ENgetnodeindex(self, name):
+        return NODES.index(name) + 1
+
+    def ENgetlinkindex(self, name):
+        return LINKS.index(name) + 1
+
+    def ENgetcount(self, code):
+        return len(NODES) if code == 0 else len(LINKS)
+
+    def ENgetnodevalue(self, index, code):
+        self.calls += 1
+        return NODE_VALUES[code][index - 1]
+
+    def ENgetlinkvalue(self, index, code):
+        self.calls += 1
+        return LINK_VALUES[code][index - 1]
+
+
+class FakeNetwork:
+    def __init__(self, ep):
+        self.ep = ep
+
+
+@pytest.fixture(params=[False, True], ids=['single', 'bulk'])
+def toolkit(request):
+    return FakeToolkit(FakeLibrary() if request.param else None)
+
+
+def test_update(toolkit):
+    state = EpynetState(FakeNetwork(toolkit), ['T2', 'T1'], ['J3', 'J1'], ['P2'], ['V1'])
+    state.update()
+
+    assert state.tank_levels.tolist() == [2.5, 1.5]
+    assert state.junction_pressures.tolist() == [40.0, 20.0]
+    assert state.flows.tolist() == [0.75, 0.5]
+    assert state.statuses.tolist() == [1, 0]
+    assert state.pump_flows.tolist() == [0.75]
+    assert state.valve_statuses.tolist() == [0]
+
+
+def test_only_requested_elements_read():
+    toolkit = FakeToolkit()
+    state = EpynetState(FakeNetwork(toolkit), ['T1'], ['J2'], ['P1'], [])
+    assert not state.bulk
+
+    state.update()
+    # pressure of two nodes, flow and status of one link
+    assert toolkit.calls == 4
+
+
+def test_bulk_one_call_per_parameter():
+    lib = FakeLibrary()
+    state = EpynetState(FakeNetwork(FakeToolkit(lib)), ['T1', 'T2'], ['J1', 'J2', 'J3'], ['P1', 'P2'], ['V1'])
+    assert state.bulk
+
+    state.update()
+    assert lib.calls == 3
+
+
+def test_junction_indices(toolkit):
+    state = EpynetState(FakeNetwork(toolkit), ['T1'], ['J1', 'J2', 'J3'], [], [])
+    assert state.junction_indices(['J3', 'J1']).tolist() == [2, 0]
@@ -0,0 +1,163 @@
+import csv
+import gzip
+from datetime import datetime
+
+import pytest
+
+from dhalsim.ground_truth import CsvWriter, GroundTruthError, ParquetWriter, ArrowWriter, \
+    ResultsBuffer, from_epoch_ns, get_ground_truth_writer, to_epoch_ns
+
+
+@pytest.fixture
+def header():
+    return ['iteration', 'timestamp', 'T1', 'P1_FLOW', 'P1_STATUS']
+
+
+def row(iteration):
+    return [iteration, datetime(2021, 1, 1, 0, 0, iteration), 0.5 + iteration, 1.25, 1]
+
+
+def read_csv(path):
+    with open(str(path), newline='') as file:
+        return list(csv.reader(file))
+
+
+def test_csv_header_written_on_open(tmpdir, header):
+    path = tmpdir.join("ground_truth.csv")
+    CsvWriter(path, header)
+    assert read_csv(path) == [header]
+
+
+def test_epoch_ns():
+    timestamp = datetime(2021, 3, 4, 5, 6, 7, 891011)
+    assert to_epoch_ns(timestamp) == 1614834367891011000
+    assert from_epoch_ns(to_epoch_ns(timestamp)) == timestamp
+
+
+def test_results_buffer(header):
+    buffer = ResultsBuffer(header, 2)
+    assert buffer.values.shape == (2, 3)
+    assert buffer.values.flags['F_CONTIGUOUS']
+
+    buffer.new_row(0, datetime(2021, 1, 1))[:] = [0.5, 1.25, 1]
+    values = buffer.new_row(1, 10)
+    values[0:2] = [1.5, 2.25]
+
+    assert buffer.full
+    assert buffer.iterations.tolist() == [0, 1]
+    assert buffer.timestamps.tolist() == [1609459200000000000, 10]
+    assert buffer.values.tolist() == [[0.5, 1.25, 1], [1.5, 2.25, 0]]
+
+    buffer.clear()
+    assert buffer.size == 0
+
+
+def test_csv_flush_interval(tmpdir, header):
+    path = tmpdir.join("ground_truth.csv")
+    writer = CsvWriter(path, header, flush_interval=2)
+
+    writer.append(row(0))
+    writer.append(row(1))
+    assert len(read_csv(path)) == 1
+
+    writer.append(row(2))
+    assert len(read_csv(path)) == 3
+    assert writer.buffer.size == 1
+    assert writer.rows_written == 2
+
+
+def test_csv_close(tmpdir, header):
+    path = tmpdir.join("ground_truth.csv")
+    writer = CsvWriter(path, header, int_columns=['P1_STATUS'])
+    writer.append(row(0))
+    writer.close()
+    writer.close()
+
+    assert read_csv(path) == [header, ['0', '2021-01-01 00:00:00', '0.5', '1.25', '1']]
+
+
+def test_buffer_bounded(tmpdir, header):
+    writer = CsvWriter(tmpdir.join("ground_truth.csv"), header, flush_interval=10 ** 9)
+    assert writer.flush_interval == CsvWriter.MAX_BUFFERED_ROWS
+
+
+def test_csv_gzip(tmpdir, header):
+    path = tmpdir.join("ground_truth.csv.gz")
+    writer = CsvWriter(path, header, compression='gzip')
+    writer.append(row(0))
+    writer.close()
+
+    with gzip.open(str(path), mode='rt', newline='') as file:
+        assert list(csv.reader(file))[0] == header
+
+
+def test_unsupported_compression(tmpdir, header):
+    with pytest.raises(GroundTruthError):
+        CsvWriter(tmpdir.join("ground_truth.csv"), header, compression='zstd')
+
+
+@pytest.mark.parametrize("data, expected_class, expected_name, expected_interval", [
+    ({}, CsvWriter, 'ground_truth.csv', CsvWriter.FLUSH_INTERVAL),
+    ({'saving_interval': 5}, CsvWriter, 'ground_truth.csv', 5),
+    ({'ground_truth_compression': 'gzip', 'ground_truth_flush_interval': 7, 'saving_interval': 5},
+     CsvWriter, 'ground_truth.csv.gz', 7),
+])
+def test_get_ground_truth_writer(tmpdir, header, data, expected_class, expected_name, expected_interval):
+    data['output_path'] = str(tmpdir)
+    writer = get_ground_truth_writer(data, header)
+
+    assert type(writer) is expected_class
+    assert writer.path.name == expected_name
+    assert writer.flush_interval == expected_interval
+
+
+@pytest.mark.parametrize("writer_class", [ParquetWriter, ArrowWriter])
+def test_columnar(tmpdir, header, writer_class):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    path = tmpdir.join("ground_truth" + writer_class.EXTENSION)
+    writer = writer_class(path, header, compression='zstd', flush_interval=2, int_columns=['P1_STATUS'])
+    for i in range(5):
+        writer.append(row(i))
+    writer.close()
+
+    if writer_class is ParquetWriter:
+        parquet_file = pyarrow.parquet.ParquetFile(str(path))
+        assert parquet_file.num_row_groups == 3
+        table = parquet_file.read()
+    else:
+        table = pyarrow.ipc.open_file(str(path)).read_all()
+
+    assert table.column_names == header
+    assert table.column('iteration').to_pylist() == [0, 1, 2, 3, 4]
+    assert table.column('T1').to_pylist() == [0.5, 1.5, 2.5, 3.5, 4.5]
+    assert table.column('P1_STATUS').to_pylist() == [1, 1, 1, 1, 1]
+    assert table.column('timestamp').to_pylist()[1] == datetime(2021, 1, 1, 0, 0, 1)
+
+
+def test_csv_resume(tmpdir, header):
+    data = {'output_path': str(tmpdir)}
+    writer = get_ground_truth_writer(data, header)
+    writer.append(row(0))
+    writer.flush()
+    resume = {'iteration': 0, 'offset': writer.position()}
+    # Rows written after the checkpoint are dropped
+    writer.append(row(1))
+    writer.close()
+
+    writer = get_ground_truth_writer(data, header, resume=resume)
+    writer.append(row(2))
+    writer.close()
+
+    assert [line[0] for line in read_csv(tmpdir.join('ground_truth.csv'))] == ['iteration', '0', '2']
+
+
+def test_resume_not_appendable(tmpdir, header):
+    data = {'output_path': str(tmpdir), 'ground_truth_compression': 'gzip'}
+    writer = get_ground_truth_writer(data, header, resume={'iteration': 5, 'offset': None})
+    assert writer.path.name == 'ground_truth_resumed_5.csv.gz'
+
+    with pytest.raises(GroundTruthError):
+        CsvWriter(tmpdir.join('ground_truth.csv.gz'), header, compression='gzip', offset=0)
@@ -0,0 +1,175 @@
+from collections import deque
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from mock import MagicMock
+
+from dhalsim.headless import HeadlessPLC, HeadlessPlant, InvalidControlValue, TagDoesNotExist
+
+
+@pytest.fixture
+def plant():
+    plant = HeadlessPlant.__new__(HeadlessPlant)
+    plant.logger = MagicMock()
+    plant.simulator = 'wntr'
+    plant.backend = SimpleNamespace(supports_speed=False)
+    plant.tags = {'T0': 2.5, 'T1': 1.0, 'P_RAW1': 0.0, 'V_PUB': 1.0}
+    plant.clock = 0
+    plant.noise_scale = 0
+    plant.lookahead = None
+    plant.random = np.random.default_rng(0)
+    plant.attack_index = {'attack1': 0}
+    plant.attack_flags = np.zeros(1, dtype=np.int64)
+    plant.plant_state = {}
+    return plant
+
+
+@pytest.fixture
+def plc_data():
+    return [
+        {'name': 'PLC1', 'sensors': ['T0'], 'actuators': ['P_RAW1'],
+         'controls': [{'type': 'below', 'dependant': 'T1', 'value': 2.0, 'actuator': 'P_RAW1',
+                       'action': 'OPEN'}],
+         'attacks': [{'name': 'attack1', 'actuator': 'P_RAW1', 'command': 'closed',
+                      'trigger': {'type': 'time', 'start': 3, 'end': 5}}]},
+        {'name': 'PLC2', 'sensors': ['T1'], 'actuators': ['V_PUB'], 'controls': []},
+    ]
+
+
+def add_plcs(plant, plc_data, staleness=0):
+    plant.plcs = [HeadlessPLC(plant, data) for data in plc_data]
+    plant.owner = {}
+    for plc in plant.plcs:
+        for tag in plc.sensors + plc.actuators:
+            plant.owner.setdefault(tag, plc)
+    plant.published_sensors = [tag for tag in plant.owner if tag in plant.owner[tag].sensors]
+    plant.published_actuators = [tag for tag in plant.owner if tag not in plant.owner[tag].sensors]
+    plant.published = deque(maxlen=staleness + 1)
+
+
+def test_controls_use_published_tags(plant, plc_data):
+    add_plcs(plant, plc_data)
+    plant.wait_for_nodes(1)
+    plant.wait_for_nodes(3)
+
+    assert plant.tags['P_RAW1'] == 1.0
+    assert plant.attack_flags.tolist() == [0]
+
+
+def test_device_attack(plant, plc_data):
+    add_plcs(plant, plc_data)
+    plant.clock = 4
+    plant.wait_for_nodes(1)
+    plant.wait_for_nodes(3)
+
+    assert plant.tags['P_RAW1'] == 0.0
+    assert plant.read_attack_flags().tolist() == [1]
+
+
+def test_lookahead_skips_scans(plant, plc_data):
+    plant.lookahead = {'max_steps': 10, 'rates': {'T1': 0.1}}
+    add_plcs(plant, plc_data)
+    plc = plant.plcs[0]
+
+    plant.wait_for_nodes(1)
+    plant.wait_for_nodes(3)
+    # The attack starts at iteration 3, T1 needs 10 iterations to reach 2.0
+    assert plc.next_scan == 3
+
+    plant.tags['P_RAW1'] = 0.0
+    for clock in (1, 2):
+        plant.clock = clock
+        plant.wait_for_nodes(3)
+    assert plant.tags['P_RAW1'] == 0.0
+    assert plc.skipped_scans == 2
+
+    plant.clock = 3
+    plant.wait_for_nodes(1)
+    plant.wait_for_nodes(3)
+    assert plant.read_attack_flags().tolist() == [1]
+    assert plc.next_scan == 6
+
+
+def test_lookahead_without_rate(plant, plc_data):
+    plant.lookahead = {'max_steps': 10, 'rates': {}}
+    add_plcs(plant, plc_data)
+    plant.wait_for_nodes(1)
+    plant.wait_for_nodes(3)
+
+    assert plant.plcs[0].next_scan == 0
+    assert plant.plcs[1].next_scan == 10
+
+
+def test_lookahead_with_noise(plant, plc_data):
+    plant.lookahead = {'max_steps': 10, 'rates': {'T0': 0.1, 'T1': 0.1}}
+    plant.noise_scale = 0.1
+    add_plcs(plant, plc_data)
+
+    assert plant.plcs[0].get_rate('T0') == 0.1
+    assert plant.plcs[0].get_rate('T1') is None
+
+
+def test_local_tags_not_published(plant, plc_data):
+    add_plcs(plant, plc_data)
+    plant.wait_for_nodes(1)
+    plant.tags['T0'] = 0.5
+
+    assert plant.plcs[0].get_tag('T0') == 0.5
+    assert plant.plcs[1].get_tag('T0') == 2.5
+
+
+def test_staleness(plant, plc_data):
+    add_plcs(plant, plc_data, staleness=1)
+    plant.wait_for_nodes(1)
+    plant.tags['T1'] = 3.0
+    plant.wait_for_nodes(1)
+    assert plant.plcs[0].get_tag('T1') == 1.0
+
+    plant.wait_for_nodes(1)
+    assert plant.plcs[0].get_tag('T1') == 3.0
+
+
+def test_noise_on_sensors_only(plant, plc_data):
+    add_plcs(plant, plc_data)
+    plant.noise_scale = 0.1
+    plant.wait_for_nodes(1)
+
+    assert plant.published[0]['T0'] != 2.5
+    assert plant.published[0]['V_PUB'] == 1.0
+
+
+def test_unknown_tag(plant, plc_data):
+    add_plcs(plant, plc_data)
+    plant.wait_for_nodes(1)
+
+    with pytest.raises(TagDoesNotExist):
+        plant.plcs[0].get_tag('T9')
+    with pytest.raises(TagDoesNotExist):
+        plant.plcs[0].set_tag('V_PUB', 'closed')
+
+
+def test_pump_speed_with_wntr(plant, plc_data):
+    add_plcs(plant, plc_data)
+
+    with pytest.raises(InvalidControlValue):
+        plant.plcs[0].set_tag('P_RAW1', 0.5)
+
+
+def test_write_plant_state(plant):
+    plant.master_time = 7
+    plant.plant_state = {'T0': 1.5, 'J280': 30.0}
+    plant.write_plant_state()
+
+    assert plant.tags['T0'] == 1.5
+    assert 'J280' not in plant.tags
+    assert plant.clock == 7
+    assert plant.plant_state == {}
+
+
+def test_read_actuators(plant):
+    plant.actuator_names = ['P_RAW1', 'V_GONE']
+    plant.actuator_values = np.array([0.0, 1.0])
+    plant.tags['P_RAW1'] = 1.0
+
+    assert plant.read_actuators().tolist() == [1.0, 1.0]
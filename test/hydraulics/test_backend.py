@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from mock import MagicMock
+
+from dhalsim.hydraulics.backend import UnsupportedSimulator, get_backend_class
+from dhalsim.hydraulics.wntr_backend import WntrBackend
+
+
+@pytest.fixture
+def backend():
+    backend = WntrBackend(Path(__file__).parent.parent / "auxilary_testing_files/wadi_map_pda_original.inp",
+                          MagicMock())
+    backend.prepare('pdd')
+    return backend
+
+
+def test_get_backend_class():
+    assert get_backend_class('wntr') is WntrBackend
+
+
+def test_get_backend_class_unsupported():
+    with pytest.raises(UnsupportedSimulator):
+        get_backend_class('unknown')
+
+
+def test_prepare(backend):
+    assert backend.actuator_names == backend.valve_list + backend.pump_list
+    assert backend.wn.options.hydraulic.demand_model in ('PDD', 'PDA')
+    assert backend.get_actuator_values().dtype == np.float64
+    assert len(backend.state.tank_levels) == len(backend.tank_list)
+
+
+def test_initial_actuator_states(backend):
+    states = backend.initial_actuator_states()
+    assert [name for name, _ in states] == backend.pump_list + backend.valve_list
+
+
+def test_apply_actuators(backend):
+    values = backend.get_actuator_values()
+    values[0] = 1 - values[0]
+    backend.apply_actuators(values)
+
+    assert backend.get_actuator_values().tolist() == values.tolist()
+    assert backend.wn.get_control(backend.actuator_names[0]).actions()[0]._value == int(values[0])
+
+
+def test_apply_actuators_unchanged(backend):
+    controls = [backend.wn.get_control(name) for name in backend.actuator_names]
+    values = backend.get_actuator_values()
+    values[0] = 1 - values[0]
+    backend.apply_actuators(values)
+
+    assert backend.wn.get_control(backend.actuator_names[0]) is not controls[0]
+    assert all(backend.wn.get_control(name) is control
+               for name, control in zip(backend.actuator_names[1:], controls[1:]))
+
+    # Applying the same statuses again changes nothing
+    replaced = backend.wn.get_control(backend.actuator_names[0])
+    backend.apply_actuators(values.copy())
+    assert backend.wn.get_control(backend.actuator_names[0]) is replaced
+
+
+def test_apply_actuators_while_simulating(backend):
+    pump = backend.pump_list[0]
+    index = backend.actuator_names.index(pump)
+    backend.start(2)
+    backend.step()
+
+    values = backend.get_actuator_values()
+    values[index] = 1 - values[index]
+    backend.apply_actuators(values)
+    backend.step()
+
+    assert backend.wn.get_link(pump).status == int(values[index])
+
+
+def test_step(backend):
+    backend.start(1)
+    assert backend.step()
+    backend.read_state()
+    assert backend.state.tank_levels.tolist() == [backend.wn.get_node(tank).level for tank in backend.tank_list]
+
+
+def test_save_and_restore_state(backend):
+    saved = backend.save_state()
+    values = backend.get_actuator_values()
+    backend.apply_actuators(1 - values)
+
+    backend.restore_state(saved)
+    assert backend.get_actuator_values().tolist() == saved['applied_status'].tolist()
+
+
+def test_restart(backend):
+    backend.start(2)
+    backend.step()
+    backend.read_state()
+    levels = backend.state.tank_levels + 0.1
+
+    backend.restart(3600, levels)
+    assert backend.wn.sim_time == 0
+    assert backend.wn.options.time.pattern_start == 3600
+    backend.read_state()
+    assert backend.state.tank_levels.tolist() == pytest.approx(levels.tolist())
+    assert backend.step()
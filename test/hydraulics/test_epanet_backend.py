@@ -0,0 +1,145 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from mock import MagicMock
+
+from dhalsim.hydraulics.epanet_backend import EpanetBackend
+from dhalsim.hydraulics.epanet_toolkit import EN_CONTROLCOUNT, EN_RULECOUNT, EN_SETTING, EN_STATUS, \
+    EN_TANKLEVEL, EpanetError, EpanetToolkit
+
+
+@pytest.fixture
+def inp_path():
+    return Path(__file__).parent.parent / "auxilary_testing_files/small_network.inp"
+
+
+@pytest.fixture
+def backend(inp_path):
+    backend = EpanetBackend(inp_path, MagicMock())
+    backend.prepare('pdd')
+    yield backend
+    backend.close()
+
+
+def test_toolkit_error(tmpdir):
+    inp_file = tmpdir.join("broken.inp")
+    inp_file.write("[JUNCTIONS]\n J1 10 0 MISSING\n[END]\n")
+    with pytest.raises(EpanetError):
+        EpanetToolkit(str(inp_file))
+
+
+def test_network(backend):
+    assert backend.tank_list == ['T1']
+    assert backend.junction_list == ['J1', 'J2', 'J3']
+    assert backend.pump_list == ['PU1']
+    assert backend.valve_list == ['V1']
+    assert backend.simulation_step == 900
+    assert backend.duration == 3600
+
+
+def test_prepare_deletes_rules(inp_path, tmpdir):
+    inp_file = tmpdir.join("rules.inp")
+    inp_file.write(inp_path.read_text().replace("[TIMES]", "[RULES]\nRULE 1\nIF TANK T1 LEVEL ABOVE 5\n"
+                                                          "THEN PUMP PU1 STATUS IS CLOSED\n\n[TIMES]"))
+    backend = EpanetBackend(Path(str(inp_file)), MagicMock())
+    assert backend.toolkit.count(EN_RULECOUNT) == 1
+
+    backend.prepare('pdd')
+    assert backend.toolkit.count(EN_RULECOUNT) == 0
+    assert backend.toolkit.count(EN_CONTROLCOUNT) == 0
+    backend.close()
+
+
+def test_initial_actuator_states(backend):
+    assert backend.initial_actuator_states() == [('PU1', False), ('V1', True)]
+
+
+def test_prepare(backend):
+    assert backend.toolkit.count(EN_CONTROLCOUNT) == 0
+    assert backend.actuator_names == ['PU1', 'V1']
+    assert backend.get_actuator_values().tolist() == [0, 1]
+
+
+def test_set_initial_levels(backend):
+    backend.set_initial_levels({'T1': 4.5})
+    assert backend.toolkit.get_node_value(backend.toolkit.node_index('T1'), EN_TANKLEVEL) == pytest.approx(4.5)
+
+
+def test_set_demand_patterns(backend):
+    backend.set_demand_patterns(pd.DataFrame({'PAT1': [2.0, 2.0, 2.0, 2.0], 'UNKNOWN': [0, 0, 0, 0]}))
+    backend.start(1)
+    backend.step()
+    # EPANET node parameter code of the demand
+    en_demand = 9
+    assert backend.toolkit.get_node_value(backend.toolkit.node_index('J2'), en_demand) == pytest.approx(4.0, abs=0.01)
+
+
+def test_apply_actuators(backend):
+    backend.start(4)
+    pump = backend.toolkit.link_index('PU1')
+
+    backend.apply_actuators(np.array([1.0, 1.0]))
+    assert backend.toolkit.get_link_value(pump, EN_STATUS) == 1
+
+    backend.apply_actuators(np.array([0.8, 1.0]))
+    assert backend.toolkit.get_link_value(pump, EN_SETTING) == pytest.approx(0.8)
+    assert backend.get_actuator_values().tolist() == [0.8, 1.0]
+
+
+def test_step(backend):
+    backend.start(4)
+    backend.read_initial_state()
+    assert backend.state.tank_levels.tolist() == pytest.approx([3.0])
+    assert backend.state.junction_pressures.tolist() == [0, 0, 0]
+
+    backend.apply_actuators(np.array([1.0, 1.0]))
+    assert backend.step()
+    backend.read_state()
+    assert backend.simulation_time == 900
+    assert backend.state.pump_statuses.tolist() == [1]
+    assert backend.state.pump_flows[0] > 0
+    assert backend.state.tank_levels[0] > 3.0
+
+
+def test_save_and_restore_state(inp_path, backend):
+    backend.start(2)
+    backend.apply_actuators(np.array([1.0, 0.0]))
+    backend.step()
+    backend.read_state()
+    saved = backend.save_state()
+
+    restored = EpanetBackend(inp_path, MagicMock())
+    restored.prepare('pdd')
+    restored.restore_state(saved)
+    restored.start(2)
+    restored.read_initial_state()
+
+    assert restored.simulation_time == 900
+    assert restored.get_actuator_values().tolist() == [1.0, 0.0]
+    assert restored.state.tank_levels.tolist() == pytest.approx(saved['tank_levels'].tolist())
+    restored.close()
+
+
+def test_restart(inp_path, backend):
+    statuses = [np.array([1.0, 1.0]), np.array([0.0, 1.0]), np.array([1.0, 1.0]), np.array([1.0, 1.0])]
+    backend.start(4)
+    levels = []
+    for values in statuses:
+        backend.apply_actuators(values)
+        backend.step()
+        backend.read_state()
+        levels.append(backend.state.tank_levels.copy())
+
+    restarted = EpanetBackend(inp_path, MagicMock())
+    restarted.prepare('pdd')
+    restarted.start(4)
+    restarted.restart(1800, levels[1])
+    assert restarted.simulation_time == 1800
+    for values in statuses[2:]:
+        restarted.apply_actuators(values)
+        restarted.step()
+        restarted.read_state()
+    assert restarted.state.tank_levels.tolist() == pytest.approx(levels[3].tolist())
+    restarted.close()
@@ -0,0 +1,47 @@
+import pytest
+
+from dhalsim.hydraulics.state import HydraulicState
+
+
+@pytest.fixture
+def state():
+    return HydraulicState(['T1'], ['J1', 'J2', 'J3'], ['P1', 'P2'], ['V1'])
+
+
+def test_arrays(state):
+    assert state.tank_levels.tolist() == [0.0]
+    assert len(state.junction_pressures) == 3
+    assert state.statuses.dtype.kind == 'i'
+
+    state.flows[:] = [1, 2, 3]
+    state.statuses[:] = [1, 0, 1]
+    assert state.pump_flows.tolist() == [1, 2]
+    assert state.valve_flows.tolist() == [3]
+    assert state.pump_statuses.tolist() == [1, 0]
+    assert state.valve_statuses.tolist() == [1]
+
+
+def test_junction_indices(state):
+    assert state.junction_indices(['J3', 'J1']).tolist() == [2, 0]
+
+
+def test_copy_from(state):
+    other = HydraulicState(['T1'], ['J1', 'J2', 'J3'], ['P1', 'P2'], ['V1'])
+    other.tank_levels[:] = 2.5
+    other.junction_pressures[:] = [1, 2, 3]
+    other.flows[:] = [0.1, 0.2, 0.3]
+    other.statuses[:] = [1, 1, 0]
+
+    pump_flows = state.pump_flows
+    state.copy_from(other)
+
+    assert state.tank_levels.tolist() == [2.5]
+    assert state.junction_pressures.tolist() == [1, 2, 3]
+    assert state.statuses.tolist() == [1, 1, 0]
+    # The views keep pointing at the arrays
+    assert pump_flows.tolist() == [0.1, 0.2]
+
+
+def test_update(state):
+    with pytest.raises(NotImplementedError):
+        state.update()
@@ -0,0 +1,214 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import wntr
+from mock import MagicMock
+
+from dhalsim.hydraulics.epanet_backend import EpanetBackend
+from dhalsim.hydraulics.surrogate import PatternMultipliers, SurrogateError, SurrogateModel, \
+    SurrogateTrainer, main
+from dhalsim.hydraulics.surrogate_backend import SurrogateBackend
+
+HEADER = ['iteration', 'T1_LEVEL', 'J1_LEVEL', 'J2_LEVEL', 'J3_LEVEL', 'PU1_FLOW', 'PU1_STATUS', 'V1_FLOW',
+          'V1_STATUS']
+
+
+@pytest.fixture
+def inp_path():
+    return Path(__file__).parent.parent / "auxilary_testing_files/small_network.inp"
+
+
+def simulate(backend, level, statuses):
+    """Runs a backend with the given (pump, valve) statuses, returning its ground truth."""
+    backend.prepare('pdd')
+    backend.set_initial_levels({'T1': level})
+    backend.start(len(statuses))
+    backend.read_initial_state()
+
+    rows = []
+    for iteration in range(len(statuses) + 1):
+        if iteration:
+            backend.apply_actuators(np.array(statuses[iteration - 1]))
+            while not backend.step():
+                pass
+            backend.read_state()
+        state = backend.state
+        rows.append([iteration, state.tank_levels[0]] + state.junction_pressures.tolist() +
+                    [state.flows[0], state.statuses[0], state.flows[1], state.statuses[1]])
+    backend.close()
+    return pd.DataFrame(rows, columns=HEADER)
+
+
+def random_statuses(rng, iterations):
+    return [(float(pump), 1.0) for pump in rng.integers(0, 2, iterations)]
+
+
+@pytest.fixture
+def simulations(inp_path):
+    rng = np.random.default_rng(0)
+    return [(simulate(EpanetBackend(inp_path, MagicMock()), rng.uniform(1, 5), random_statuses(rng, 20)), None)
+            for _ in range(6)]
+
+
+@pytest.fixture
+def trainer(inp_path):
+    return SurrogateTrainer(inp_path, min_samples=5)
+
+
+@pytest.fixture
+def model_path(tmpdir, trainer, simulations):
+    path = Path(str(tmpdir)) / 'model.npz'
+    trainer.train(simulations).save(path)
+    return path
+
+
+@pytest.fixture
+def surrogate(inp_path, model_path):
+    return SurrogateBackend(inp_path, MagicMock(), {'model': str(model_path), 'fallback': 'epanet'})
+
+
+def test_pattern_multipliers(inp_path):
+    patterns = PatternMultipliers(wntr.network.WaterNetworkModel(str(inp_path)))
+    assert patterns.names == ['PAT1']
+    assert [patterns.at(time)[0] for time in (0, 900, 1800, 2700, 3600)] == [1.0, 1.5, 0.5, 1.0, 1.0]
+
+    patterns.set_demand_patterns(pd.DataFrame({'PAT1': [2.0, 3.0], 'UNKNOWN': [0, 0]}))
+    assert patterns.at(900).tolist() == [3.0]
+
+
+def test_samples(trainer, simulations):
+    ground_truth = simulations[0][0]
+    inputs, targets = trainer.samples(ground_truth)
+
+    assert inputs.shape == (20, 6)
+    assert targets.shape == (20, 6)
+    # Levels of the first row, statuses of the second row, multiplier and statuses of the first row
+    assert inputs[1].tolist() == pytest.approx([ground_truth['T1_LEVEL'][1], ground_truth['PU1_STATUS'][2], 1.0,
+                                                1.5, ground_truth['PU1_STATUS'][1], 1.0])
+    # The first step uses its own statuses as previous statuses
+    assert inputs[0, 4:].tolist() == inputs[0, 1:3].tolist()
+    assert targets[0].tolist() == pytest.approx(ground_truth.loc[1, trainer.output_names].tolist())
+
+
+def test_samples_missing_column(trainer, simulations):
+    with pytest.raises(SurrogateError):
+        trainer.samples(simulations[0][0].drop(columns='J2_LEVEL'))
+
+
+def test_train_not_enough_samples(inp_path, simulations):
+    with pytest.raises(SurrogateError):
+        SurrogateTrainer(inp_path, min_samples=1000).train(simulations)
+
+
+def test_save_and_load(tmpdir, trainer, simulations):
+    model = trainer.train(simulations)
+    path = Path(str(tmpdir)) / 'model.npz'
+    model.save(path)
+    loaded = SurrogateModel.load(path)
+
+    assert loaded.tank_names == ['T1']
+    assert loaded.actuator_names == ['PU1', 'V1']
+    assert loaded.output_names == model.output_names
+    inputs = trainer.samples(simulations[0][0])[0][3]
+    assert loaded.approximate(inputs).tolist() == model.approximate(inputs).tolist()
+
+
+def test_approximate_outside_of_envelope(trainer, simulations):
+    model = trainer.train(simulations)
+    inputs = trainer.samples(simulations[0][0])[0][3]
+    assert model.approximate(inputs) is not None
+
+    closed_valve = inputs.copy()
+    closed_valve[2] = 0
+    assert model.approximate(closed_valve) is None
+
+    full_tank = inputs.copy()
+    full_tank[0] = 6.0
+    assert model.approximate(full_tank) is None
+
+    high_demand = inputs.copy()
+    high_demand[3] = 10.0
+    assert model.approximate(high_demand) is None
+
+
+def test_validation_report(trainer, simulations):
+    model = trainer.train(simulations[:5])
+    report, coverage = trainer.validation_report(model, simulations[5:])
+
+    assert report.columns.tolist() == ['element', 'quantity', 'samples', 'max_abs_error', 'rmse']
+    assert report['element'].tolist() == ['T1', 'J1', 'J2', 'J3', 'PU1', 'V1']
+    assert report['quantity'].tolist() == ['level', 'pressure', 'pressure', 'pressure', 'flow', 'flow']
+    assert 0.5 < coverage <= 1
+    assert report['max_abs_error'].max() < 0.05
+
+
+def test_backend_matches_solver(inp_path, surrogate):
+    statuses = random_statuses(np.random.default_rng(1), 20)
+    expected = simulate(EpanetBackend(inp_path, MagicMock()), 3.0, statuses)
+    actual = simulate(surrogate, 3.0, statuses)
+
+    assert surrogate.predicted_steps > 10
+    assert (actual - expected).abs().max().max() < 0.05
+
+
+def test_backend_falls_back_to_solver(inp_path, surrogate):
+    # The model never saw a closed valve, and the tank fills up at the end
+    statuses = [(1.0, 1.0)] * 6 + [(1.0, 0.0)] * 3 + [(1.0, 1.0)] * 20
+    expected = simulate(EpanetBackend(inp_path, MagicMock()), 2.0, statuses)
+    actual = simulate(surrogate, 2.0, statuses)
+
+    assert surrogate.predicted_steps > 0
+    assert surrogate.solved_steps >= 3
+    assert (actual - expected).abs().max().max() < 0.05
+
+
+def test_backend_save_and_restore_state(inp_path, model_path, surrogate):
+    surrogate.prepare('pdd')
+    surrogate.start(4)
+    surrogate.read_initial_state()
+    surrogate.apply_actuators(np.array([1.0, 1.0]))
+    surrogate.step()
+    saved = surrogate.save_state()
+    surrogate.step()
+    expected = surrogate.state.tank_levels.copy()
+    surrogate.close()
+
+    restored = SurrogateBackend(inp_path, MagicMock(), {'model': str(model_path), 'fallback': 'epanet'})
+    restored.prepare('pdd')
+    restored.restore_state(saved)
+    restored.start(3)
+    assert restored.get_actuator_values().tolist() == [1.0, 1.0]
+    restored.step()
+    assert restored.simulation_time == 1800
+    assert restored.state.tank_levels.tolist() == pytest.approx(expected.tolist())
+    restored.close()
+
+
+def test_backend_other_network(inp_path, tmpdir, trainer, simulations):
+    model = trainer.train(simulations)
+    model.tank_names = ['T2']
+    path = Path(str(tmpdir)) / 'other.npz'
+    model.save(path)
+
+    with pytest.raises(SystemExit):
+        SurrogateBackend(inp_path, MagicMock(), {'model': str(path), 'fallback': 'epanet'})
+
+
+def test_main(inp_path, tmpdir, simulations, monkeypatch):
+    arguments = []
+    for i, (ground_truth, _) in enumerate(simulations):
+        ground_truth.to_csv(str(tmpdir.join('ground_truth_{i}.csv'.format(i=i))), index=False)
+        arguments.append(str(tmpdir.join('ground_truth_{i}.csv'.format(i=i))))
+    pd.DataFrame({'PAT1': [1.0, 1.5, 0.5, 1.0]}).to_csv(str(tmpdir.join('demands.csv')), index=False)
+    arguments[-1] += ',' + str(tmpdir.join('demands.csv'))
+
+    monkeypatch.setattr(sys, 'argv', ['surrogate', '--inp', str(inp_path), '--output', str(tmpdir.join('model.npz')),
+                                      '--min-samples', '5', '--holdout', '2'] + arguments)
+    main()
+
+    assert SurrogateModel.load(str(tmpdir.join('model.npz'))).tank_names == ['T1']
+    report = pd.read_csv(str(tmpdir.join('model_validation.csv')))
+    assert len(report) == 6
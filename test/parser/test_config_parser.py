@@ -5,7 +5,7 @@ from unittest.mock import MagicMock
 import pytest
 import yaml
 
-from dhalsim.parser.config_parser import ConfigParser, TooManyNodes
+from dhalsim.parser.config_parser import ConfigParser, MissingValueError, TooManyNodes
 
 
 @pytest.fixture
@@ -68,6 +68,8 @@ def test_generate_intermediate_yaml(mocker, tmpdir, wadi_config_yaml_path, fille
 
     # Because paths are dynamic, overwrite it in expected output
     expected['db_path'] = directory_mock.mkdtemp() + '/dhalsim.sqlite'
+    expected['sync_path'] = directory_mock.mkdtemp() + '/dhalsim_sync.sock'
+    expected['tag_table_path'] = directory_mock.mkdtemp() + '/dhalsim_tags.bin'
     local_path = str(Path(__file__).absolute().parent.parent)
     expected['inp_file'] = local_path + '/auxilary_testing_files/wadi_map_pda_original.inp'
     expected['output_path'] = local_path + '/auxilary_testing_files/output'
@@ -87,6 +89,95 @@ def test_generate_intermediate_yaml(mocker, tmpdir, wadi_config_yaml_path, fille
     directory_mock.chmod.assert_called_with(directory_mock.mkdtemp(), 0o775)
 
 
+def test_generate_temporary_dirs_on_tmpfs(mocker, wadi_config_yaml_path, directory_mock):
+    mocker.patch('tempfile.mkdtemp', directory_mock.mkdtemp)
+    mocker.patch('os.chmod', directory_mock.chmod)
+    mocker.patch('os.path.isdir', return_value=True)
+
+    parser = ConfigParser(wadi_config_yaml_path)
+    parser.data['db_on_tmpfs'] = True
+    parser.generate_temporary_dirs()
+
+    directory_mock.mkdtemp.assert_called_with(prefix='dhalsim_', dir='/dev/shm')
+    assert parser.db_path == directory_mock.mkdtemp() + '/dhalsim.sqlite'
+
+
+def test_generate_intermediate_yaml_network_index(mocker, wadi_config_yaml_path, directory_mock):
+    mocker.patch('tempfile.mkdtemp', directory_mock.mkdtemp)
+    mocker.patch('os.chmod', directory_mock.chmod)
+
+    parser = ConfigParser(wadi_config_yaml_path)
+    with parser.generate_intermediate_yaml().open(mode='r') as file:
+        assert 'network_index' not in yaml.safe_load(file)
+
+    parser.network_index = 2
+    with parser.generate_intermediate_yaml().open(mode='r') as file:
+        assert yaml.safe_load(file)['network_index'] == 2
+
+
+def test_generate_intermediate_yaml_skeletonize(mocker, tmpdir, wadi_config_yaml_path, directory_mock):
+    mocker.patch('tempfile.mkdtemp', directory_mock.mkdtemp)
+    mocker.patch('os.chmod', directory_mock.chmod)
+    skeleton_path = Path(str(tmpdir)) / 'skeleton.inp'
+    skeleton_path.write_text(Path("test/auxilary_testing_files/wadi_map_pda_original.inp").read_text())
+    reduce = mocker.patch('dhalsim.parser.skeletonizer.Skeletonizer.reduce', return_value=skeleton_path)
+
+    parser = ConfigParser(wadi_config_yaml_path)
+    with parser.generate_intermediate_yaml().open(mode='r') as file:
+        assert yaml.safe_load(file)['inp_file'] == str(parser.data['inp_file'])
+    reduce.assert_not_called()
+
+    parser.data['skeletonize'] = {'pipe_diameter': 0.3, 'calibration_iterations': 3}
+    with parser.generate_intermediate_yaml().open(mode='r') as file:
+        assert yaml.safe_load(file)['inp_file'] == str(skeleton_path)
+    reduce.assert_called_once()
+
+
+def test_generate_intermediate_yaml_surrogate(mocker, wadi_config_yaml_path, directory_mock):
+    mocker.patch('tempfile.mkdtemp', directory_mock.mkdtemp)
+    mocker.patch('os.chmod', directory_mock.chmod)
+
+    parser = ConfigParser(wadi_config_yaml_path)
+    parser.data['simulator'] = 'surrogate'
+    parser.data['surrogate'] = {'model': Path('/models/wadi.npz'), 'fallback': 'epanet', 'envelope_margin': 0.1}
+    with parser.generate_intermediate_yaml().open(mode='r') as file:
+        data = yaml.safe_load(file)
+
+    assert data['simulator'] == 'surrogate'
+    assert data['surrogate'] == {'model': '/models/wadi.npz', 'fallback': 'epanet', 'envelope_margin': 0.1}
+
+
+def test_generate_intermediate_yaml_lookahead(mocker, wadi_config_yaml_path, directory_mock):
+    mocker.patch('tempfile.mkdtemp', directory_mock.mkdtemp)
+    mocker.patch('os.chmod', directory_mock.chmod)
+
+    parser = ConfigParser(wadi_config_yaml_path)
+    parser.data['lookahead'] = {'max_steps': 5, 'rates': {'T0': 0.1}}
+    with parser.generate_intermediate_yaml().open(mode='r') as file:
+        data = yaml.safe_load(file)
+
+    assert data['lookahead'] == {'max_steps': 5, 'rates': {'T0': 0.1}}
+
+
+def test_generate_intermediate_yaml_cache_deadline(mocker, wadi_config_yaml_path, directory_mock):
+    mocker.patch('tempfile.mkdtemp', directory_mock.mkdtemp)
+    mocker.patch('os.chmod', directory_mock.chmod)
+
+    parser = ConfigParser(wadi_config_yaml_path)
+    parser.data['cache_deadline'] = 0.5
+    with parser.generate_intermediate_yaml().open(mode='r') as file:
+        data = yaml.safe_load(file)
+
+    assert data['cache_deadline'] == 0.5
+
+
+def test_surrogate_has_model():
+    ConfigParser.surrogate_has_model({'simulator': 'wntr'})
+    ConfigParser.surrogate_has_model({'simulator': 'surrogate', 'surrogate': {'model': Path('model.npz')}})
+    with pytest.raises(MissingValueError):
+        ConfigParser.surrogate_has_model({'simulator': 'surrogate'})
+
+
 @pytest.mark.parametrize('plcs, network_attacks',
                          [
                              (10, 10),
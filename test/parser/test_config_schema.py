@@ -29,6 +29,15 @@ def test_dict():
         "demand_patterns": Path(),
         "network_loss_data": Path(),
         "network_delay_data": Path(),
+        "sync_mode": "socket",
+        "db_on_tmpfs": False,
+        "tag_backend": "sqlite",
+        "ground_truth_format": "csv",
+        "ground_truth_compression": "gzip",
+        "ground_truth_flush_interval": 100,
+        "cache_staleness": 1,
+        "checkpoint_interval": 50,
+        "profile_phases": False,
         "plcs": [
             {"name": "PLC1", "sensors": ["T0"], "actuators": ["P_RAW1", "V_PUB"]},
             {"name": "PLC2", "sensors": ["T2"], "actuators": ["V_ER2i"]},
@@ -112,7 +121,12 @@ def test_valid_dict(test_dict):
     ('mininet_cli', False),
     ('log_level', 'info'),
     ('simulator', 'wntr'),
-    ('demand', 'pdd')
+    ('demand', 'pdd'),
+    ('sync_mode', 'socket'),
+    ('db_on_tmpfs', False),
+    ('tag_backend', 'sqlite'),
+    ('ground_truth_format', 'csv'),
+    ('profile_phases', False),
 ])
 def test_default_config(key, default_value, test_dict):
     del test_dict[key]
@@ -129,6 +143,10 @@ def test_default_config(key, default_value, test_dict):
     'network_loss_data',
     'network_delay_data',
     'attacks',
+    'ground_truth_compression',
+    'ground_truth_flush_interval',
+    'cache_staleness',
+    'checkpoint_interval',
 ])
 def test_optional_config(key, test_dict):
     del test_dict[key]
@@ -175,6 +193,37 @@ def test_required_config(required_key, test_dict):
     ('saving_interval', '3'),
     ('noise_scale', -1.0),
     ('noise_scale', '1'),
+    ('sync_mode', 1),
+    ('sync_mode', "invalid"),
+    ('sync_mode', ""),
+    ('db_on_tmpfs', "True"),
+    ('db_on_tmpfs', 1),
+    ('tag_backend', 1),
+    ('tag_backend', "shm"),
+    ('ground_truth_format', 1),
+    ('ground_truth_format', "xlsx"),
+    ('ground_truth_compression', "rar"),
+    ('ground_truth_compression', 1),
+    ('ground_truth_flush_interval', 0),
+    ('ground_truth_flush_interval', '3'),
+    ('cache_staleness', -1),
+    ('cache_staleness', 0.5),
+    ('cache_deadline', 0),
+    ('cache_deadline', 'soon'),
+    ('checkpoint_interval', 0),
+    ('checkpoint_interval', '10'),
+    ('profile_phases', 'True'),
+    ('profile_phases', 1),
+    ('skeletonize', {}),
+    ('skeletonize', {'pipe_diameter': 0}),
+    ('skeletonize', {'pipe_diameter': 0.3, 'calibration_iterations': 0}),
+    ('surrogate', {}),
+    ('surrogate', {'model': 'model.npz', 'fallback': 'epynet'}),
+    ('surrogate', {'model': 'model.npz', 'envelope_margin': -0.1}),
+    ('lookahead', {'max_steps': 0}),
+    ('lookahead', {'max_steps': 2.5}),
+    ('lookahead', {'rates': {'T1': -0.1}}),
+    ('lookahead', {'rates': {'T1': 'fast'}}),
 ])
 def test_invalid_config(key, invalid_value, test_dict):
     test_dict[key] = invalid_value
@@ -208,9 +257,36 @@ def test_invalid_config(key, invalid_value, test_dict):
     ('simulator', 'WNTR', 'wntr'),
     ('simulator', 'epynet', 'epynet'),
     ('simulator', 'EPYNET', 'epynet'),
+    ('simulator', 'epanet', 'epanet'),
+    ('simulator', 'SURROGATE', 'surrogate'),
     ('batch_simulations', 100, 100),
     ('saving_interval', 2, 2),
     ('noise_scale', 0.0, 0.0),
+    ('sync_mode', 'socket', 'socket'),
+    ('sync_mode', 'DATABASE', 'database'),
+    ('db_on_tmpfs', True, True),
+    ('db_on_tmpfs', False, False),
+    ('tag_backend', 'sqlite', 'sqlite'),
+    ('tag_backend', 'MMAP', 'mmap'),
+    ('ground_truth_format', 'PARQUET', 'parquet'),
+    ('ground_truth_format', 'arrow', 'arrow'),
+    ('ground_truth_compression', 'ZSTD', 'zstd'),
+    ('ground_truth_flush_interval', 50, 50),
+    ('cache_staleness', 0, 0),
+    ('cache_deadline', 2, 2.0),
+    ('cache_deadline', 0.5, 0.5),
+    ('checkpoint_interval', 100, 100),
+    ('profile_phases', True, True),
+    ('skeletonize', {'pipe_diameter': 1}, {'pipe_diameter': 1.0, 'calibration_iterations': 24}),
+    ('skeletonize', {'pipe_diameter': 0.3, 'calibration_iterations': 5},
+     {'pipe_diameter': 0.3, 'calibration_iterations': 5}),
+    ('surrogate', {'model': Path('model.npz')},
+     {'model': Path('model.npz'), 'fallback': 'wntr', 'envelope_margin': 0.05}),
+    ('surrogate', {'model': Path('model.npz'), 'fallback': 'EPANET', 'envelope_margin': 0},
+     {'model': Path('model.npz'), 'fallback': 'epanet', 'envelope_margin': 0.0}),
+    ('lookahead', {}, {'max_steps': 10, 'rates': {}}),
+    ('lookahead', {'max_steps': 4, 'rates': {'T1': 0.05, 'T2': 0}},
+     {'max_steps': 4, 'rates': {'T1': 0.05, 'T2': 0.0}}),
 ])
 def test_valid_config(key, input_value, expected_value, test_dict):
     test_dict[key] = input_value
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import pytest
+import wntr
+
+from dhalsim.parser.skeletonizer import Skeletonizer
+
+
+@pytest.fixture
+def inp_path():
+    return Path(__file__).parent.parent / "auxilary_testing_files/wadi_map_pda_original.inp"
+
+
+@pytest.fixture
+def plcs():
+    return [{'name': 'PLC1', 'sensors': ['T0', 'J1_33'], 'actuators': ['P_RAW1']},
+            {'name': 'PLC2', 'sensors': ['T1', 'P_RAW1F']}]
+
+
+@pytest.fixture
+def skeletonizer(inp_path, plcs, tmpdir):
+    return Skeletonizer(inp_path, plcs, {'pipe_diameter': 0.3, 'calibration_iterations': 3}, Path(str(tmpdir)))
+
+
+def test_protected_junctions(skeletonizer):
+    assert skeletonizer.protected_junctions() == ['J1_33']
+
+
+def test_reduce(skeletonizer):
+    path = skeletonizer.reduce()
+    assert path == skeletonizer.skeleton_path
+
+    full = wntr.network.WaterNetworkModel(str(skeletonizer.inp_file))
+    skeleton = wntr.network.WaterNetworkModel(str(path))
+    assert skeleton.num_junctions < full.num_junctions
+    assert 'J1_33' in skeleton.junction_name_list
+    assert skeleton.tank_name_list == full.tank_name_list
+    assert skeleton.pump_name_list == full.pump_name_list
+    assert skeleton.valve_name_list == full.valve_name_list
+
+
+def test_accuracy_report(skeletonizer):
+    skeletonizer.reduce()
+    with skeletonizer.report_path.open() as report:
+        lines = report.read().splitlines()
+
+    assert lines[0] == 'element,quantity,max_abs_error,rmse'
+    elements = [line.split(',')[0] for line in lines[1:]]
+    assert elements[:4] == ['T1', 'T2', 'T0', 'J1_33']
+    assert len(elements) == 4 + len(skeletonizer.wn.pump_name_list) + len(skeletonizer.wn.valve_name_list)
+
+
+def test_cached(skeletonizer, mocker):
+    path = skeletonizer.reduce()
+    skeletonize = mocker.spy(wntr.morph, 'skeletonize')
+    assert skeletonizer.reduce() == path
+    skeletonize.assert_not_called()
+
+
+def test_cache_key(inp_path, plcs, tmpdir, skeletonizer):
+    other = Skeletonizer(inp_path, plcs, {'pipe_diameter': 0.2, 'calibration_iterations': 3}, Path(str(tmpdir)))
+    assert other.skeleton_path != skeletonizer.skeleton_path
@@ -0,0 +1,117 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from dhalsim.phase_profiler import PHASES, DisabledProfiler, PhaseProfiler, get_phase_profiler
+
+
+@pytest.fixture
+def clock(mocker):
+    # Every call of the clock is 1 ms after the previous one
+    times = iter(range(0, 10 ** 12, 10 ** 6))
+    return mocker.patch('time.perf_counter_ns', side_effect=lambda: next(times))
+
+
+def run_iteration(profiler, iteration):
+    for phase in PHASES:
+        profiler.lap(phase)
+    profiler.end_iteration(iteration)
+
+
+def read_rows(path):
+    with open(str(path)) as file:
+        return list(csv.reader(file))
+
+
+def test_disabled(tmpdir):
+    profiler = get_phase_profiler({'output_path': str(tmpdir)})
+    assert isinstance(profiler, DisabledProfiler)
+    assert profiler.close() is None
+    assert not Path(str(tmpdir), 'phase_profile.csv').exists()
+
+
+def test_enabled(tmpdir):
+    profiler = get_phase_profiler({'output_path': str(tmpdir), 'profile_phases': True})
+    assert isinstance(profiler, PhaseProfiler)
+    assert profiler.path == Path(str(tmpdir), 'phase_profile.csv')
+    profiler.close()
+
+
+def test_rows(tmpdir, clock):
+    profiler = PhaseProfiler(tmpdir.join('profile.csv'), block_size=2)
+    profiler.start()
+    for iteration in range(1, 4):
+        run_iteration(profiler, iteration)
+
+    # The first block is written when it is full
+    assert len(read_rows(tmpdir.join('profile.csv'))) == 3
+
+    profiler.close()
+    rows = read_rows(tmpdir.join('profile.csv'))
+    assert rows[0] == ['iteration'] + [phase + '_us' for phase in PHASES]
+    assert [row[0] for row in rows[1:]] == ['1', '2', '3']
+    assert all(value == '1000' for row in rows[1:] for value in row[1:])
+
+
+def test_laps_of_a_phase_add_up(tmpdir, clock):
+    profiler = PhaseProfiler(tmpdir.join('profile.csv'))
+    profiler.start()
+    profiler.lap('publish')
+    profiler.lap('results')
+    profiler.lap('results')
+    profiler.end_iteration(1)
+    profiler.close()
+
+    row = dict(zip(*read_rows(tmpdir.join('profile.csv'))))
+    assert row['publish_us'] == '1000'
+    assert row['results_us'] == '2000'
+    assert row['solve_us'] == '0'
+
+
+def test_append(tmpdir, clock):
+    path = tmpdir.join('profile.csv')
+    profiler = PhaseProfiler(path)
+    run_iteration(profiler, 1)
+    profiler.close()
+
+    profiler = PhaseProfiler(path, append=True)
+    run_iteration(profiler, 2)
+    profiler.close()
+
+    rows = read_rows(path)
+    assert rows[0][0] == 'iteration'
+    assert [row[0] for row in rows[1:]] == ['1', '2']
+
+
+def test_summary(tmpdir, clock):
+    profiler = PhaseProfiler(tmpdir.join('profile.csv'))
+    assert profiler.summary() == "No iterations profiled."
+
+    profiler.start()
+    for iteration in range(1, 11):
+        run_iteration(profiler, iteration)
+    summary = profiler.close().splitlines()
+
+    assert summary[0] == "Phase durations in ms over 10 iterations:"
+    assert summary[2].split() == ['publish', '1.000', '1.000', '1.000', '1.000', '11.1%']
+    assert summary[-1].split()[0] == 'iteration'
+    assert summary[-1].split()[1] == '9.000'
+
+
+def test_summary_of_appended_profile(tmpdir, clock):
+    path = tmpdir.join('profile.csv')
+    profiler = PhaseProfiler(path, block_size=2)
+    for iteration in range(1, 4):
+        run_iteration(profiler, iteration)
+    profiler.close()
+
+    profiler = PhaseProfiler(path, append=True, block_size=2)
+    for iteration in range(4, 9):
+        run_iteration(profiler, iteration)
+    summary = profiler.close().splitlines()
+
+    # Only the iterations of this profiler are summarized, and none of them stay in memory
+    assert summary[0] == "Phase durations in ms over 5 iterations:"
+    assert profiler.row == 0
+    assert len(read_rows(path)) == 9
@@ -137,3 +137,26 @@ def test_between_attack_apply_false(trigger_between_attack, mock_plc1):
     assert trigger_between_attack.apply(mock_plc1) is None
     mock_plc1.get_tag.assert_called_with('T1')
     mock_plc1.set_tag.assert_not_called()
+
+
+@pytest.mark.parametrize("clock, expected", [(10, 10), (20, 21), (30, 11), (40, 1), (41, float('inf'))])
+def test_time_attack_horizon(time_attack, mock_plc1, clock, expected):
+    assert time_attack.horizon(mock_plc1, clock) == expected
+
+
+def test_trigger_attack_horizon(trigger_attack_above, trigger_attack_below, mock_plc1):
+    mock_plc1.get_rate.return_value = 0.04
+    assert trigger_attack_above.horizon(mock_plc1, 30) == 3
+    assert trigger_attack_below.horizon(mock_plc1, 30) == 3
+    mock_plc1.get_rate.assert_called_with('T1')
+
+    mock_plc1.get_rate.return_value = None
+    assert trigger_attack_above.horizon(mock_plc1, 30) == 0
+
+
+def test_between_attack_horizon(trigger_between_attack, mock_plc2):
+    mock_plc2.get_rate.return_value = 0.004
+    assert trigger_between_attack.horizon(mock_plc2, 10) == 2
+
+    mock_plc2.get_rate.return_value = 0
+    assert trigger_between_attack.horizon(mock_plc2, 10) == float('inf')
@@ -4,6 +4,7 @@ import sys
 import pytest
 
 from dhalsim.python2.entities.control import AboveControl, BelowControl, TimeControl
+from dhalsim.python2.entities.lookahead import safe_horizon
 
 
 def test_python_version():
@@ -115,4 +116,30 @@ def test_apply_false_TimeControl(time_fixture, mock_plc2):
     assert time_fixture.apply(mock_plc2) is None
     # Assert call.get tag called, and above value was true
     mock_plc2.get_master_clock.assert_called_with()
-    mock_plc2.set_tag.assert_not_called()
\ No newline at end of file
+    mock_plc2.set_tag.assert_not_called()
+
+def test_horizon_BelowControl(below_fixture, mock_plc1):
+    mock_plc1.get_rate.return_value = 4
+    assert below_fixture.horizon(mock_plc1, 43) == 5
+    mock_plc1.get_tag.assert_called_with('testTank1')
+    mock_plc1.get_rate.assert_called_with('testTank1')
+
+
+def test_horizon_AboveControl_without_rate(above_fixture, mock_plc2):
+    mock_plc2.get_rate.return_value = None
+    assert above_fixture.horizon(mock_plc2, 10) == 0
+
+
+@pytest.mark.parametrize("clock, expected", [(40, 3), (42, 1), (43, 1), (50, float('inf'))])
+def test_horizon_TimeControl(time_fixture, mock_plc1, clock, expected):
+    assert time_fixture.horizon(mock_plc1, clock) == expected
+
+
+def test_safe_horizon_TimeControl_with_BelowControl(mock_plc1):
+    mock_plc1.get_rate.return_value = 0.1
+    mock_plc1.controls = [BelowControl("P1", "OPEN", "T1", 5), TimeControl("P1", "CLOSED", 10)]
+    mock_plc1.attacks = []
+    assert safe_horizon(mock_plc1, 9, 100) == 1
+    # The scan after the time control fires has to run, so the below control can undo its action
+    assert safe_horizon(mock_plc1, 10, 100) == 1
+    assert safe_horizon(mock_plc1, 11, 100) == 100
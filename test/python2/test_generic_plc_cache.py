@@ -1,4 +1,5 @@
 import sys
+import threading
 from pathlib import Path
 
 import pytest
@@ -15,8 +16,10 @@ def magic_mock_network():
     mock.get.return_value = u'42'
     mock.set.return_value = u'42'
     mock.receive.return_value = u'0.15'
+    mock.receive_multiple.return_value = [u'0.15']
+    mock.send_system_state.return_value = None
     # database
-    mock.get_sync.return_value = 0
+    mock.get_sync.return_value = True
     mock.set_sync.return_value = None
     return mock
 
@@ -25,7 +28,6 @@ def magic_mock_network():
 def magic_mock_init():
     mock = MagicMock()
     mock.do_super_construction.return_value = None
-    mock.initialize_db.return_value = None
     return mock
 
 
@@ -70,10 +72,6 @@ def yaml_file(tmpdir):
 
 def patch_methods(magic_mock_init, magic_mock_network, mocker):
     # Init mocker patches
-    mocker.patch(
-        'dhalsim.python2.generic_plc.GenericPLC.initialize_db',
-        magic_mock_init.initialize_db
-    )
     mocker.patch(
         'dhalsim.python2.generic_plc.GenericPLC.do_super_construction',
         magic_mock_init.do_super_construction
@@ -91,6 +89,14 @@ def patch_methods(magic_mock_init, magic_mock_network, mocker):
         'dhalsim.python2.generic_plc.GenericPLC.receive',
         magic_mock_network.receive
     )
+    mocker.patch(
+        'dhalsim.python2.generic_plc.GenericPLC.receive_multiple',
+        magic_mock_network.receive_multiple
+    )
+    mocker.patch(
+        'dhalsim.python2.generic_plc.GenericPLC.send_system_state',
+        magic_mock_network.send_system_state
+    )
     mocker.patch(
         'dhalsim.python2.generic_plc.GenericPLC.get_sync',
         magic_mock_network.get_sync
@@ -112,12 +118,125 @@ def test_python_version():
     assert sys.version_info.minor is 7
 
 
-def test_generic_plc1_cache(generic_plc1, magic_mock_network):
+def test_generic_plc1_cache(generic_plc1, magic_mock_network, mocker):
+    db = mocker.patch('dhalsim.python2.generic_plc.get_database_client').return_value
+    db.fetchall.return_value = [(u'T0', u'0.5'), (u'P_RAW1', u'1'), (None, 12)]
     generic_plc1.main_loop(test_break=True)
-    # Verify network function calls (applying control rule)
-    expected_network_calls = [call.get_sync(),
-                              call.receive(('T2', 1), '192.168.1.2'),  # Only called once
-                              call.set(('P_RAW1', 1), 1),
-                              call.set(('P_RAW1', 1), 0),
-                              call.set_sync(1)]
-    assert magic_mock_network.mock_calls == expected_network_calls
+    generic_plc1.stop_cache_update()
+    generic_plc1.cache_thread.join(5)
+
+    assert not generic_plc1.cache_thread.is_alive()
+    # Verify network function calls (applying control rule), T2 is received with one request at a time
+    assert magic_mock_network.receive_multiple.call_count >= 1
+    assert all(request == call([('T2', 1)], '192.168.1.2')
+               for request in magic_mock_network.receive_multiple.call_args_list)
+    assert magic_mock_network.get_sync.mock_calls == [call(0), call(2)]
+    assert magic_mock_network.set_sync.mock_calls == [call(1), call(3)]
+    assert generic_plc1.cache['T2'] == 0.15
+    # The scan published and evaluated the snapshot of iteration 12
+    magic_mock_network.send_system_state.assert_called_once_with(generic_plc1.snapshot)
+    assert generic_plc1.get_master_clock() == 12
+    assert generic_plc1.snapshot == {'T0': 0.5, 'P_RAW1': 0.0}
+    # Both controls set P_RAW1, only the last value is written
+    db.transaction.assert_called_once_with([(GenericPLC.WRITE_QUERY, [(0, 'P_RAW1')])])
+
+
+def test_generic_plc1_cache_groups(generic_plc1):
+    assert generic_plc1.cache_groups == [('192.168.1.2', ['T2'])]
+
+
+def test_generic_plc1_update_cache(generic_plc1, magic_mock_network, mocker):
+    mocker.patch('dhalsim.python2.generic_plc.GenericPLC.read_master_clock', return_value=7)
+    generic_plc1.update_cache_flag = True
+    magic_mock_network.receive_multiple.side_effect = lambda tags, ip: generic_plc1.stop_cache_update() or [u'0.25']
+    generic_plc1.update_cache(0)
+
+    assert generic_plc1.cache['T2'] == 0.25
+    assert generic_plc1.cache_clock['T2'] == 7
+    assert generic_plc1.tag_fresh['T2']
+    assert generic_plc1.cache_is_fresh()
+
+
+def test_generic_plc1_snapshot(generic_plc1, magic_mock_network, mocker):
+    db = mocker.patch('dhalsim.python2.generic_plc.get_database_client').return_value
+    db.fetchall.return_value = [(u'T0', u'0.5'), (u'P_RAW1', u'1'), (None, 12)]
+    generic_plc1.take_snapshot()
+
+    assert db.fetchall.call_args[0][1] == ['T0', 'P_RAW1']
+    assert generic_plc1.snapshot == {'T0': 0.5, 'P_RAW1': 1.0}
+    assert generic_plc1.get_master_clock() == 12
+    assert generic_plc1.get_tag('T0') == 0.5
+
+    generic_plc1.set_tag('P_RAW1', 'closed')
+    assert generic_plc1.get_tag('P_RAW1') == 0.0
+    # Only the actuator is written, the snapshot is never read again from the database
+    assert magic_mock_network.mock_calls == [call.set(('P_RAW1', 1), 0)]
+
+
+def test_generic_plc1_commit_scan(generic_plc1, magic_mock_network, mocker):
+    db = mocker.patch('dhalsim.python2.generic_plc.get_database_client').return_value
+    generic_plc1.attack_flags = {'attack1': False, 'attack2': False}
+
+    generic_plc1.begin_scan()
+    generic_plc1.set_tag('P_RAW1', 'open')
+    generic_plc1.set_tag('P_RAW1', 'closed')
+    generic_plc1.set_attack_flag(True, 'attack1')
+    generic_plc1.set_attack_flag(False, 'attack2')
+    generic_plc1.commit_scan()
+
+    assert magic_mock_network.mock_calls == []
+    db.transaction.assert_called_once_with([(GenericPLC.WRITE_QUERY, [(0, 'P_RAW1')]),
+                                            (GenericPLC.FLAG_QUERY, [(1, 'attack1')])])
+
+    # Nothing changes in the next scan, so nothing is written
+    generic_plc1.begin_scan()
+    generic_plc1.set_attack_flag(True, 'attack1')
+    generic_plc1.commit_scan()
+    assert db.transaction.call_count == 1
+
+
+def test_generic_plc1_commit_scan_tag_table(generic_plc1, magic_mock_network, mocker):
+    db = mocker.patch('dhalsim.python2.generic_plc.get_database_client').return_value
+    generic_plc1.tag_table = MagicMock()
+
+    generic_plc1.begin_scan()
+    generic_plc1.set_tag('P_RAW1', 'open')
+    generic_plc1.set_tag('P_RAW1', 'closed')
+    generic_plc1.commit_scan()
+
+    generic_plc1.tag_table.update.assert_called_once_with({'P_RAW1': 0})
+    db.transaction.assert_not_called()
+    assert magic_mock_network.mock_calls == []
+
+
+def test_generic_plc1_wait_for_cache_deadline(generic_plc1):
+    generic_plc1.cache_deadline = 0.01
+    generic_plc1.cache_clock['T2'] = 3
+    generic_plc1.logger = MagicMock()
+    generic_plc1.wait_for_cache(5)
+
+    assert not generic_plc1.tag_fresh['T2']
+    assert generic_plc1.stale_scans == 1
+    generic_plc1.logger.info.assert_called_once_with(
+        "Cache deadline passed in iteration 5, using stale values: T2 (iteration 3)")
+
+
+def test_generic_plc1_wait_for_cache_notified(generic_plc1, magic_mock_network, mocker):
+    mocker.patch('dhalsim.python2.generic_plc.GenericPLC.read_master_clock', return_value=5)
+    magic_mock_network.receive_multiple.side_effect = lambda tags, ip: [u'0.25']
+    # A deadline and join timeout make a missing notification fail the test instead of hanging it
+    generic_plc1.cache_deadline = 5
+    generic_plc1.logger = MagicMock()
+    generic_plc1.update_cache_flag = True
+    cache_thread = threading.Thread(target=generic_plc1.update_cache, args=(0,))
+    cache_thread.daemon = True
+    cache_thread.start()
+
+    generic_plc1.wait_for_cache(5)
+    generic_plc1.stop_cache_update()
+    cache_thread.join(5)
+
+    assert not cache_thread.is_alive()
+    assert generic_plc1.tag_fresh['T2']
+    assert generic_plc1.cache['T2'] == 0.25
+    assert generic_plc1.stale_scans == 0
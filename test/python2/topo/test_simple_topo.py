@@ -63,6 +63,20 @@ def test_writeback_yaml(tmpdir, topo_fixture, filled_dict):
     assert dump == filled_dict
 
 
+def test_switch_names_network_index(mocker, tmpdir, unmodified_dict):
+    mocker.patch('mininet.net.Mininet.randMac', return_value="00:1D:9C:C7:B0:70")
+    unmodified_dict['network_index'] = 3
+
+    c = tmpdir.join("intermediate.yaml")
+    with c.open(mode='w') as intermediate_yaml:
+        yaml.dump(unmodified_dict, intermediate_yaml)
+    topo = SimpleTopo(c)
+
+    assert sorted(topo.switches()) == ['s3001', 's3002']
+    assert topo.data['plcs'][0]['switch_name'] == 's3001'
+    assert topo.data['scada']['switch_name'] == 's3002'
+
+
 def test_host_amount_network(topo_fixture):
     # Expecting 4 hosts; 2 PLCs, a router, a scada and a plant
     assert len(topo_fixture.hosts()) == 4
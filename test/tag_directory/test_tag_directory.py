@@ -0,0 +1,66 @@
+import pytest
+
+from dhalsim.tag_directory import TagDirectory, UnknownPLC, get_tag_directory
+
+
+@pytest.fixture
+def plcs():
+    return [
+        {'name': 'PLC1', 'local_ip': '10.0.1.1', 'public_ip': '192.168.1.1', 'sensors': ['T0', 'J1'],
+         'actuators': ['P1', 'V1']},
+        {'name': 'PLC2', 'local_ip': '10.0.2.1', 'public_ip': '192.168.1.2', 'sensors': [''], 'actuators': ['P2']},
+        {'name': 'PLC3', 'local_ip': '10.0.3.1', 'public_ip': '192.168.1.3', 'sensors': ['T1', 'T0'],
+         'actuators': ['V1']},
+        {'name': 'PLC4'},
+    ]
+
+
+@pytest.fixture
+def directory(plcs):
+    return TagDirectory(plcs)
+
+
+def test_names(directory):
+    assert directory.names == ['T0', 'J1', 'P1', 'V1', 'P2', 'T1']
+    assert 'T1' in directory
+    assert '' not in directory
+
+
+def test_tags_of(directory):
+    assert directory.tags_of('PLC1') == {'T0', 'J1', 'P1', 'V1'}
+    assert directory.tags_of('PLC2') == {'P2'}
+    assert directory.tags_of('PLC4') == set()
+    with pytest.raises(UnknownPLC):
+        directory.tags_of('PLC9')
+
+
+def test_owner(directory):
+    owner = directory.owner('T0')
+    assert (owner.name, owner.public_ip, owner.role) == ('PLC1', '192.168.1.1', 'sensor')
+    assert directory.owner('T0', exclude='PLC1').name == 'PLC3'
+    assert directory.owner('J1', exclude='PLC1') is None
+    assert directory.owner('T9') is None
+
+
+def test_actuator_owner(directory):
+    assert directory.actuator_owner('V1').name == 'PLC1'
+    assert directory.actuator_owner('P2').name == 'PLC2'
+    assert directory.actuator_owner('T0') is None
+
+
+def test_address(directory):
+    assert directory.address('T0', 'PLC1') == '10.0.1.1'
+    assert directory.address('T0', 'PLC3') == '192.168.1.1'
+    assert directory.address('P2') == '192.168.1.2'
+    assert directory.address('T9') is None
+
+
+def test_group_by_owner(directory):
+    assert directory.group_by_owner(['T1', 'P2', 'T0', 'V1'], exclude='PLC1') == \
+        [('192.168.1.2', ['P2']), ('192.168.1.3', ['T0', 'V1', 'T1'])]
+    assert directory.group_by_owner(['T0', 'P1', 'T9']) == [('192.168.1.1', ['T0', 'P1'])]
+
+
+def test_get_tag_directory(plcs):
+    assert get_tag_directory({'plcs': plcs}).names == ['T0', 'J1', 'P1', 'V1', 'P2', 'T1']
+    assert get_tag_directory({}).names == []
@@ -0,0 +1,95 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from dhalsim.tag_table import TagTable, TagTableError, get_tag_table
+
+
+@pytest.fixture
+def table_path(tmpdir):
+    return str(tmpdir.join("dhalsim_tags.bin"))
+
+
+@pytest.fixture
+def table(table_path):
+    return TagTable.create(table_path, ["T1", "T2", "P_RAW1"], [0.5, 1.5, 1])
+
+
+def test_create(table):
+    assert table.names == ["T1", "T2", "P_RAW1"]
+    assert table.index == {"T1": 0, "T2": 1, "P_RAW1": 2}
+    np.testing.assert_array_equal(table.read(), [0.5, 1.5, 1.0])
+
+
+def test_create_default_values(table_path):
+    table = TagTable.create(table_path, ["T1", "T2"])
+    np.testing.assert_array_equal(table.read(), [0.0, 0.0])
+
+
+def test_open_existing(table, table_path):
+    other = TagTable(table_path)
+    assert other.names == table.names
+    assert other.get("T2") == 1.5
+
+
+def test_get_set(table):
+    table.set("T1", 0.75)
+    assert table.get("T1") == 0.75
+    assert isinstance(table.get("P_RAW1"), float)
+
+
+def test_unknown_tag(table):
+    with pytest.raises(KeyError):
+        table.get("T3")
+    with pytest.raises(KeyError):
+        table.set("T3", 1)
+
+
+def test_shared_between_tables(table, table_path):
+    other = TagTable(table_path)
+    other.set("T2", 2.5)
+    assert table.get("T2") == 2.5
+
+
+def test_read_slots(table):
+    np.testing.assert_array_equal(table.read(table.slots(["P_RAW1", "T1"])), [1.0, 0.5])
+
+
+def test_update_skips_unknown(table):
+    table.update({"T1": 0.1, "PU1F": 3.0, "T2": 0.2})
+    np.testing.assert_array_equal(table.read(), [0.1, 0.2, 1.0])
+
+
+def test_write_keeps_sequence_even(table):
+    table.write(table.slots(["T1", "T2"]), [1.0, 2.0])
+    assert int(table.sequence[0]) == 2
+
+
+def _write_in_process(table_path):
+    TagTable(table_path).set("T1", 9.0)
+
+
+def test_shared_between_processes(table, table_path):
+    process = multiprocessing.Process(target=_write_in_process, args=(table_path,))
+    process.start()
+    process.join(10)
+    assert table.get("T1") == 9.0
+
+
+def test_not_a_tag_table(tmpdir):
+    path = tmpdir.join("not_a_table.bin")
+    path.write_binary(b"\0" * 64)
+    with pytest.raises(TagTableError):
+        TagTable(str(path))
+
+
+def test_missing_file(tmpdir):
+    with pytest.raises(TagTableError):
+        TagTable(str(tmpdir.join("missing.bin")))
+
+
+def test_get_tag_table(table, table_path):
+    assert get_tag_table({"tag_table_path": table_path}) is None
+    assert get_tag_table({"tag_backend": "sqlite", "tag_table_path": table_path}) is None
+    assert get_tag_table({"tag_backend": "mmap", "tag_table_path": table_path}).names == table.names
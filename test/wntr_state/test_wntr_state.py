@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+import wntr
+
+from dhalsim.wntr_state import WntrState
+
+
+@pytest.fixture
+def wn():
+    wn = wntr.network.WaterNetworkModel(
+        str(Path(__file__).parent.parent / "auxilary_testing_files/wadi_map_pda_original.inp"))
+    wn.options.time.duration = wn.options.time.hydraulic_timestep
+    return wn
+
+
+@pytest.fixture
+def state(wn):
+    return WntrState(wn, wn.tank_name_list, wn.junction_name_list, wn.pump_name_list, wn.valve_name_list)
+
+
+def test_views(state, wn):
+    assert len(state.pump_flows) == len(wn.pump_name_list)
+    assert len(state.valve_statuses) == len(wn.valve_name_list)
+    state.flows[:] = 1
+    assert state.pump_flows.sum() == len(wn.pump_name_list)
+
+
+def test_before_simulation(state, wn):
+    state.update()
+    assert state.tank_levels.tolist() == [wn.get_node(tank).level for tank in wn.tank_name_list]
+    assert np.isnan(state.flows).all()
+
+
+def test_update(state, wn):
+    wntr.sim.WNTRSimulator(wn).run_sim()
+    state.update()
+
+    assert state.tank_levels.tolist() == [wn.get_node(tank).level for tank in wn.tank_name_list]
+    assert state.junction_pressures.tolist() == [wn.get_node(junction).head - wn.get_node(junction).elevation
+                                                 for junction in wn.junction_name_list]
+    assert state.pump_flows.tolist() == [wn.get_link(pump).flow for pump in wn.pump_name_list]
+    assert state.valve_statuses.tolist() == [int(wn.get_link(valve).status) for valve in wn.valve_name_list]
+
+
+def test_junction_indices(state, wn):
+    names = wn.junction_name_list
+    assert state.junction_indices([names[3], names[0]]).tolist() == [3, 0]